@@ -0,0 +1,61 @@
+#coding=utf-8
+"""
+Filtered glyphs as glyph representations, so that RoboFont (defcon) caches them on source glyphs.
+Outside of RoboFont, where defcon has no addRepresentationFactory, filters are applied directly (see PenBallBaseFilter.filterGlyph()).
+"""
+
+from weakref import WeakKeyDictionary
+
+try:
+    from defcon import addRepresentationFactory, removeRepresentationFactory
+    representationsAvailable = True
+except ImportError:
+    representationsAvailable = False
+
+FACTORYKEYPREFIX = 'com.loicsander.glyphFilter.factory'
+MAXFILTERREPRESENTATIONS = 10
+_addedRepresentationFactories = []
+# {glyph: {filterKey: [(filterHash, arguments), ...]}}, oldest first
+_filterRepresentationHistory = WeakKeyDictionary()
+
+
+def makeFilterKey(filterName):
+    return '{0}.{1}'.format(FACTORYKEYPREFIX, filterName)
+
+
+def _makeRepresentationFactory(glyphFilter):
+    """Wrap a glyph filter as a representation factory, the filter hash only serves to key representations."""
+    def representationFactory(glyph, font=None, filterHash=None, **arguments):
+        return glyphFilter(glyph, font, **arguments)
+    return representationFactory
+
+
+def setFilterRepresentationFactory(filterName, glyphFilter):
+    """Register (or replace) the representation factory of a filter."""
+    key = makeFilterKey(filterName)
+    if key in _addedRepresentationFactories:
+        removeRepresentationFactory(key)
+    elif key not in _addedRepresentationFactories:
+        _addedRepresentationFactories.append(key)
+    addRepresentationFactory(key, _makeRepresentationFactory(glyphFilter))
+
+
+def getFilterRepresentation(glyph, filterName, filterHash, arguments):
+    """
+    Return the representation of glyph filtered with arguments.
+    Only the last MAXFILTERREPRESENTATIONS argument sets of a filter stay cached on a glyph,
+    otherwise each step of a slider drag would leave a representation behind.
+    """
+    if hasattr(glyph, 'naked'):
+        glyph = glyph.naked()
+    key = makeFilterKey(filterName)
+    history = _filterRepresentationHistory.setdefault(glyph, {}).setdefault(key, [])
+    filterHashes = [previousHash for previousHash, previousArguments in history]
+    if filterHash in filterHashes:
+        history.append(history.pop(filterHashes.index(filterHash)))
+    else:
+        history.append((filterHash, dict(arguments)))
+        while len(history) > MAXFILTERREPRESENTATIONS:
+            oldFilterHash, oldArguments = history.pop(0)
+            glyph.destroyRepresentation(key, filterHash=oldFilterHash, **oldArguments)
+    return glyph.getRepresentation(key, filterHash=filterHash, **arguments)
@@ -1,5 +1,8 @@
 from robofab.world import RGlyph
+from robofab.objects.objectsBase import BaseGlyph
 from robofab.pens.reverseContourPointPen import ReverseContourPointPen
+from booleanOperations.booleanGlyph import BooleanGlyph
+from penUtils import HashPointPen, RecordingPointPen, replayPointPenData
 
 def passThrough(glyph):
     return glyph
@@ -26,5 +29,64 @@ def removeOverlap(glyph):
     glyphCopy.width = glyph.width
     pointPen = glyphCopy.getPointPen()
     glyph.drawPoints(pointPen)
-    glyphCopy.removeOverlap()
-    return glyphCopy
\ No newline at end of file
+    if hasattr(glyphCopy, 'removeOverlap'):
+        glyphCopy.removeOverlap()
+        return glyphCopy
+    # outside of RoboFont, glyphs can't remove overlap on their own
+    booleanGlyph = BooleanGlyph(glyphCopy).removeOverlap()
+    glyphCopy = RGlyph()
+    glyphCopy.width = glyph.width
+    booleanGlyph.drawPoints(glyphCopy.getPointPen())
+    return glyphCopy
+
+def getLayerGlyph(glyph, layerName):
+    """Return the glyph of the same name in another layer, for RoboFont and defcon glyphs alike, None if there is none."""
+    if hasattr(glyph, 'getLayer'):
+        return glyph.getLayer(layerName)
+    layerSet = getattr(glyph, 'layerSet', None)
+    if layerSet is None:
+        return None
+    layer = layerSet.defaultLayer if layerName == 'foreground' else layerSet[layerName] if layerName in layerSet else None
+    if layer is not None and glyph.name in layer:
+        return layer[glyph.name]
+    return None
+
+def hashGlyph(glyph):
+    """Return a hash of the outlines, width and anchors of a glyph."""
+    hashPen = HashPointPen()
+    glyph.drawPoints(hashPen)
+    anchors = tuple([(anchor.name, anchor.x, anchor.y) for anchor in glyph.anchors])
+    return hash((hashPen.getHash(), glyph.width, anchors))
+
+def getGlyphData(glyph):
+    """Return glyph attributes, outlines and anchors as plain data, fit to be sent to another process."""
+    recordingPen = RecordingPointPen()
+    glyph.drawPoints(recordingPen)
+    points = recordingPen.data
+    # robofab glyphs draw anchors as single point contours, as in UFO2, anchors are recorded on their own
+    if isinstance(glyph, BaseGlyph):
+        anchorPoints = [((anchor.x, anchor.y), anchor.name) for anchor in glyph.anchors]
+        for i in reversed(range(len(points) - 2)):
+            if points[i][0] == 'beginPath' and points[i+1][0] == 'addPoint' and points[i+1][2] == 'move' and points[i+2][0] == 'endPath':
+                anchorPoint = (points[i+1][1], points[i+1][4])
+                if anchorPoint in anchorPoints:
+                    anchorPoints.remove(anchorPoint)
+                    del points[i:i+3]
+    return {
+        'name': glyph.name,
+        'width': glyph.width,
+        'unicode': glyph.unicode,
+        'points': points,
+        'anchors': [(anchor.name, (anchor.x, anchor.y)) for anchor in glyph.anchors]
+    }
+
+def makeGlyphFromData(glyphData):
+    """Return a new RGlyph from data obtained with getGlyphData()."""
+    glyph = RGlyph()
+    glyph.name = glyphData['name']
+    glyph.width = glyphData['width']
+    glyph.unicode = glyphData['unicode']
+    replayPointPenData(glyphData['points'], glyph.getPointPen())
+    for anchorName, position in glyphData['anchors']:
+        glyph.appendAnchor(anchorName, position)
+    return glyph
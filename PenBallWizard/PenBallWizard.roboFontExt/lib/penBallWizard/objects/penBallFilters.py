@@ -3,23 +3,30 @@ import sys
 import imp
 import json
 from collections import OrderedDict
+from itertools import count
 
 from robofab.world import RGlyph
-from defcon import addRepresentationFactory, removeRepresentationFactory
 from booleanOperations.booleanGlyph import BooleanGlyph
 
 from errorGlyph import ErrorGlyph
 from glyphFilter import GlyphFilter
-from glyphUtils import passThrough, removeOverlap, reverseContours
+from glyphUtils import passThrough, removeOverlap, reverseContours, copyContours, hashGlyph, getLayerGlyph
 from penUtils import FilterPointPen
+from filterRepresentations import representationsAvailable, setFilterRepresentationFactory, getFilterRepresentation
 
-FACTORYKEYPREFIX = 'com.loicsander.glyphFilter.factory'
 FILTERARGSEPARATOR = '.'
-_addedRepresentationFactories = []
+_filterDefinitionCounter = count()
 
 
-def makeFilterKey(filterName):
-    return '{0}.{1}'.format(FACTORYKEYPREFIX, filterName)
+def _freezeArgumentValue(value):
+    if isinstance(value, (list, tuple)):
+        return tuple([_freezeArgumentValue(item) for item in value])
+    return value
+
+
+def makeArgumentsHash(arguments):
+    """Return a hash of filter arguments, regardless of their order."""
+    return hash(tuple(sorted([(argumentName, _freezeArgumentValue(value)) for argumentName, value in arguments.items()])))
 
 
 class PenBallBaseFilter(object):
@@ -41,8 +48,20 @@ class PenBallBaseFilter(object):
     index = property(_get_index)
 
     def filterGlyph(self, glyph, arguments={}):
-        key = makeFilterKey(self.name)
-        return glyph.getRepresentation(key, **arguments)
+        """Return a filtered glyph, as a representation of glyph if available (in RoboFont), otherwise filtered directly."""
+        if representationsAvailable and hasattr(glyph, 'getRepresentation'):
+            return getFilterRepresentation(glyph, self.name, self.getFilterHash(arguments), arguments)
+        return self._glyphFilter(glyph, None, **arguments)
+
+
+    def getDefinitionHash(self):
+        """Return a hash identifying the filter’s definition, renewed each time the filter is (re)defined."""
+        return self._definitionIndex
+
+
+    def getFilterHash(self, arguments):
+        """Return a hash of the filter’s definition and arguments, keying its representations."""
+        return hash((self.getDefinitionHash(), makeArgumentsHash(arguments)))
 
 
     def _get_publicName(self):
@@ -85,15 +104,11 @@ class PenBallBaseFilter(object):
         return None
 
 
-    def _filterObjectToRepresentationFactory(self):
-        theFilter = self._makeGlyphFilter()
-
-        key = makeFilterKey(self.name)
-        if key in _addedRepresentationFactories:
-            removeRepresentationFactory(key)
-        elif key not in _addedRepresentationFactories:
-            _addedRepresentationFactories.append(key)
-        addRepresentationFactory(key, theFilter)
+    def _setGlyphFilter(self):
+        self._glyphFilter = self._makeGlyphFilter()
+        self._definitionIndex = next(_filterDefinitionCounter)
+        if representationsAvailable:
+            setFilterRepresentationFactory(self.name, self._glyphFilter)
 
 
 
@@ -118,7 +133,7 @@ class PenBallFilter(PenBallBaseFilter):
         if not hasattr(self, 'filterObjectName') and hasattr(self, 'filterObject'):
             self.filterObjectName = self.filterObject.__name__
         self._loadFilterObject()
-        self._filterObjectToRepresentationFactory()
+        self._setGlyphFilter()
 
 
     def __repr__(self):
@@ -223,7 +238,15 @@ class PenBallFilter(PenBallBaseFilter):
 
 
 class PenBallFilterChain(PenBallBaseFilter):
-    """A shallow filter that accumulates effects from a series of subfilters by referencing them."""
+    """
+    A shallow filter that accumulates effects from a series of subfilters by referencing them.
+
+    The outcome of each step is cached, keyed by the source glyph and everything that led to the step
+    (subfilters, their arguments, order & mode), so that after changing a subfilter’s arguments,
+    a chain only recomputes steps from that subfilter onward.
+    """
+
+    maxCachedSteps = 500
 
 
     def __init__(self, parent, filterName, subfilters=[], arguments={}):
@@ -231,9 +254,10 @@ class PenBallFilterChain(PenBallBaseFilter):
         self._name = filterName
         self.arguments = OrderedDict(arguments)
         self.subfilters = []
+        self._stepsCache = OrderedDict()
         for subfilterName, mode, source in subfilters:
             self.setSubfilter(subfilterName, mode, source, True)
-        self._filterObjectToRepresentationFactory()
+        self._setGlyphFilter()
 
 
     def __repr__(self):
@@ -328,6 +352,30 @@ class PenBallFilterChain(PenBallBaseFilter):
         return self._parent.getFilter(subfilterName)
 
 
+    def _getCachedStep(self, stepKey):
+        if stepKey in self._stepsCache:
+            cachedStep = self._stepsCache.pop(stepKey)
+            self._stepsCache[stepKey] = cachedStep
+            return cachedStep
+        return None
+
+
+    def _setCachedStep(self, stepKey, processedGlyph, canvasGlyph, error):
+        self._stepsCache[stepKey] = processedGlyph, copyContours(canvasGlyph), error
+        while len(self._stepsCache) > self.maxCachedSteps:
+            self._stepsCache.popitem(last=False)
+
+
+    def clearStepsCache(self):
+        self._stepsCache.clear()
+
+
+    def getDefinitionHash(self):
+        """A filter chain’s definition includes the definitions of its subfilters."""
+        subfilters = tuple([(self.getSubfilter(subfilterName).getDefinitionHash(), mode, source) for subfilterName, mode, source in self.subfilters])
+        return hash((self._definitionIndex, subfilters))
+
+
     def getLimits(self, argumentName):
         subfilterName, argumentName, filterOrder = self.splitSubfilterArgumentName(argumentName)
         if (subfilterName, argumentName) != (None, None):
@@ -367,29 +415,44 @@ class PenBallFilterChain(PenBallBaseFilter):
             glyph.draw(canvasPen)
 
             steps = []
+            stepKey = hashGlyph(glyph)
 
             for i, (currentFilter, mode, source) in enumerate(subfilters):
 
                 if error == True:
                     continue
 
+                sourceKey = None
                 if not source:
                     sourceGlyph = canvasGlyph
                 else:
                     try:
                         sourceGlyph = steps[source-1]
                     except:
-                        layerGlyph = glyph.getLayer(source)
-                        if len(layerGlyph) > 0:
+                        layerGlyph = getLayerGlyph(glyph, source)
+                        if layerGlyph is not None and len(layerGlyph) > 0:
                             sourceGlyph = RGlyph()
                             pen = sourceGlyph.getPen()
                             layerGlyph.draw(pen)
+                            sourceKey = hashGlyph(layerGlyph)
                         else:
                             sourceGlyph = canvasGlyph
 
                 sourceGlyph.name = glyph.name
 
                 arguments = {argumentName: globalArguments[(subfilterName, argumentName, filterOrder)] for subfilterName, argumentName, filterOrder in globalArguments if subfilterName == currentFilter.name and filterOrder == i}
+
+                # a step depends on the source glyph and all previous steps, hence the chained key
+                stepKey = (stepKey, currentFilter.name, currentFilter.getFilterHash(arguments), i, mode, source, sourceKey)
+                cachedStep = self._getCachedStep(stepKey)
+                if cachedStep is not None:
+                    processedGlyph, cachedCanvasGlyph, error = cachedStep
+                    steps.append(processedGlyph)
+                    canvasGlyph.clear()
+                    cachedCanvasGlyph.draw(canvasPen)
+                    canvasGlyph.width = cachedCanvasGlyph.width
+                    continue
+
                 processedGlyph = currentFilter.filterGlyph(sourceGlyph, arguments)
 
                 if mode in ['union', 'difference', 'intersection', 'xor']:
@@ -422,6 +485,8 @@ class PenBallFilterChain(PenBallBaseFilter):
                 if processedGlyph.width:
                     canvasGlyph.width = processedGlyph.width
 
+                self._setCachedStep(stepKey, steps[-1], canvasGlyph, error)
+
             if error == True:
                 canvasGlyph = ErrorGlyph()
             elif error == False:
@@ -491,6 +556,17 @@ class PenBallFiltersManager(object):
         return False
 
 
+    def getDependentFilterNames(self, filterName):
+        """Return filterName along with the names of filter chains using it, directly or not."""
+        dependentFilterNames = [filterName]
+        for dependentFilterName in dependentFilterNames:
+            for theFilter in self:
+                if hasattr(theFilter, 'subfilters') and theFilter.name not in dependentFilterNames:
+                    if dependentFilterName in [subfilterName for subfilterName, mode, source in theFilter.subfilters]:
+                        dependentFilterNames.append(theFilter.name)
+        return dependentFilterNames
+
+
     def getFilter(self, key):
         if key in self.filterNames:
             return self.filters[key]
@@ -634,4 +710,29 @@ if __name__ == '__main__':
                 ]
                 )
 
+        def test_filter_hashes(self):
+            self.assertEqual(makeArgumentsHash({'a': 1, 'b': [2, 3]}), makeArgumentsHash(OrderedDict([('b', (2, 3)), ('a', 1)])))
+            manager = PenBallFiltersManager()
+            manager.setFilter('Flatten', {
+                'module': 'robofab.pens.filterPen',
+                'filterObjectName': 'FlattenPen',
+                'arguments': {
+                    'approximateSegmentLength': 5
+                }
+                })
+            manager.setFilterChain('Flatten&Reverse', [('Flatten', None, None), ('reverse', None, None)])
+            self.assertEqual(manager.getDependentFilterNames('Flatten'), ['Flatten', 'Flatten&Reverse'])
+            flattenHash = manager['Flatten'].getFilterHash({'approximateSegmentLength': 5})
+            chainHash = manager['Flatten&Reverse'].getDefinitionHash()
+            self.assertNotEqual(flattenHash, manager['Flatten'].getFilterHash({'approximateSegmentLength': 10}))
+            manager.setFilter('Flatten', {
+                'module': 'robofab.pens.filterPen',
+                'filterObjectName': 'FlattenPen',
+                'arguments': {
+                    'approximateSegmentLength': 5
+                }
+                })
+            self.assertNotEqual(flattenHash, manager['Flatten'].getFilterHash({'approximateSegmentLength': 5}))
+            self.assertNotEqual(chainHash, manager['Flatten&Reverse'].getDefinitionHash())
+
     unittest.main()
@@ -0,0 +1,241 @@
+#coding=utf-8
+from __future__ import division
+
+from math import ceil
+from collections import OrderedDict
+from multiprocessing import Pool, cpu_count
+
+from glyphUtils import getGlyphData, makeGlyphFromData
+from penUtils import replayPointPenData
+from penBallFilters import PenBallFiltersManager
+
+_workerFilters = None
+
+
+def _initWorker(filtersList):
+    global _workerFilters
+    _workerFilters = PenBallFiltersManager(filtersList)
+
+
+def _filterGlyphsData((filterName, arguments, glyphsData)):
+    """Filter glyphs from serialized data within a worker process, return their names and filtered data."""
+    theFilter = _workerFilters[filterName]
+    return [(glyphData['name'], getGlyphData(theFilter.filterGlyph(makeGlyphFromData(glyphData), arguments))) for glyphData in glyphsData]
+
+
+class PenBallGenerator(object):
+    """
+    Applies a filter to a set of glyphs and writes filtered glyphs to a font or layer.
+
+    Glyphs to filter are collected once, along with the base glyphs of their components,
+    they are filtered as serialized point data, in a pool of processes if there is more than one worker (None for the number of cpus),
+    and filtered glyphs are then written back in a single batch.
+    Within RoboFont, glyphs are filtered in the application’s process, a pool is for headless use (penBallWizardRunner.py).
+
+    >>> generator = PenBallGenerator(filtersManager, 'Flatten')
+    >>> glyphNames = generator.collectGlyphNames(font, font.selection)
+    >>> filteredGlyphsData = generator.filterGlyphs(font, glyphNames)
+    >>> generator.writeGlyphs(filteredGlyphsData, targetFont, layerName='filtered')
+
+    Filters that can’t be rebuilt from their definition in another process (filters subscribed by other extensions),
+    and filter chains using layers as source, are applied within the current process.
+    """
+
+    def __init__(self, filtersManager, filterName, arguments=None, workers=1):
+        self.filters = filtersManager
+        self.filterName = filterName
+        self.filter = filtersManager[filterName]
+        self.arguments = dict(self.filter.arguments if arguments is None else arguments)
+        self.workers = cpu_count() if workers is None else workers
+
+    def collectGlyphNames(self, font, glyphNames):
+        """Return unique names of glyphs to filter, glyphNames first, followed by base glyphs of components."""
+        collectedGlyphNames = []
+        glyphNamesToCollect = list(glyphNames)
+        while len(glyphNamesToCollect):
+            glyphName = glyphNamesToCollect.pop(0)
+            if glyphName in font and glyphName not in collectedGlyphNames:
+                collectedGlyphNames.append(glyphName)
+                glyphNamesToCollect += [component.baseGlyph for component in font[glyphName].components]
+        return collectedGlyphNames
+
+    def canFilterInProcesses(self):
+        theFilter = self.filter
+        if hasattr(theFilter, 'subfilters'):
+            for subfilterName, mode, source in theFilter.subfilters:
+                if source and not isinstance(source, int):
+                    return False
+            subfilters = [theFilter.getSubfilter(subfilterName) for subfilterName, mode, source in theFilter.subfilters]
+        else:
+            subfilters = [theFilter]
+        for subfilter in subfilters:
+            if subfilter.name not in self.filters.internalFilters and not hasattr(subfilter, 'module') and not hasattr(subfilter, 'file'):
+                return False
+        return True
+
+    def filterGlyphs(self, font, glyphNames, progressCallback=None):
+        """
+        Return filtered glyphs of font as a {glyphName: glyphData} OrderedDict (see glyphUtils.getGlyphData()),
+        in the order of glyphNames, so that glyphs are written in a stable order.
+        If provided, progressCallback is called without arguments each time a glyph is filtered.
+        """
+        workers = min(self.workers, len(glyphNames))
+        if workers > 1 and self.canFilterInProcesses():
+            return self._filterGlyphsInProcesses(font, glyphNames, workers, progressCallback)
+
+        filteredGlyphsData = OrderedDict()
+        for glyphName in glyphNames:
+            filteredGlyph = self.filter.filterGlyph(font[glyphName], self.arguments)
+            filteredGlyphsData[glyphName] = getGlyphData(filteredGlyph)
+            if progressCallback is not None:
+                progressCallback()
+        return filteredGlyphsData
+
+    def _filterGlyphsInProcesses(self, font, glyphNames, workers, progressCallback=None):
+        glyphsData = [getGlyphData(font[glyphName]) for glyphName in glyphNames]
+        # smaller chunks than one per worker, to balance load and report progress
+        chunkSize = int(ceil(len(glyphsData) / (workers * 4)))
+        tasks = [(self.filterName, self.arguments, glyphsData[i:i+chunkSize]) for i in range(0, len(glyphsData), chunkSize)]
+
+        filteredGlyphsData = {}
+        pool = Pool(workers, _initWorker, (self.filters.asList(),))
+        try:
+            for results in pool.imap_unordered(_filterGlyphsData, tasks):
+                for glyphName, glyphData in results:
+                    filteredGlyphsData[glyphName] = glyphData
+                    if progressCallback is not None:
+                        progressCallback()
+        finally:
+            pool.close()
+            pool.join()
+        return OrderedDict([(glyphName, filteredGlyphsData[glyphName]) for glyphName in glyphNames])
+
+    def writeGlyphs(self, filteredGlyphsData, font, layerName=None, replaceGlyphs=False, appendOutlines=False):
+        """
+        Write filtered glyphs to font, in a layer if layerName is provided.
+        font is either a RoboFont font or a defcon font or layer, the latter are written to without robofab glyphs.
+        With replaceGlyphs, glyphs are inserted as new glyphs (width and unicode included),
+        otherwise, outlines of existing glyphs are replaced, or kept and added to with appendOutlines.
+        """
+        if not hasattr(font, 'naked'):
+            layer = font
+            if layerName is not None:
+                if layerName not in font.layers:
+                    font.newLayer(layerName)
+                layer = font.layers[layerName]
+            self._writeGlyphsToLayer(filteredGlyphsData, layer, replaceGlyphs, appendOutlines)
+            return
+
+        naked = font.naked()
+        holdNotifications = hasattr(naked, 'holdNotifications')
+        if holdNotifications:
+            naked.holdNotifications()
+        try:
+            for glyphName, glyphData in filteredGlyphsData.items():
+                filteredGlyph = makeGlyphFromData(glyphData)
+                if replaceGlyphs == True and layerName is None:
+                    font.insertGlyph(filteredGlyph, glyphName)
+                    continue
+                if glyphName not in font:
+                    font.newGlyph(glyphName)
+                glyph = font[glyphName] if layerName is None else font[glyphName].getLayer(layerName)
+                if appendOutlines == False:
+                    glyph.clearContours()
+                    glyph.clearComponents()
+                glyph.appendGlyph(filteredGlyph)
+        finally:
+            if holdNotifications:
+                naked.releaseHeldNotifications()
+
+    def _writeGlyphsToLayer(self, filteredGlyphsData, layer, replaceGlyphs=False, appendOutlines=False):
+        layer.holdNotifications()
+        try:
+            for glyphName, glyphData in filteredGlyphsData.items():
+                if replaceGlyphs == True or glyphName not in layer:
+                    glyph = layer.newGlyph(glyphName)
+                    glyph.width = glyphData['width']
+                    if glyphData['unicode'] is not None:
+                        glyph.unicodes = [glyphData['unicode']]
+                else:
+                    glyph = layer[glyphName]
+                    if appendOutlines == False:
+                        glyph.clearContours()
+                        glyph.clearComponents()
+                replayPointPenData(glyphData['points'], glyph.getPointPen())
+                for anchorName, (x, y) in glyphData['anchors']:
+                    glyph.appendAnchor(dict(name=anchorName, x=x, y=y))
+        finally:
+            layer.releaseHeldNotifications()
+
+
+if __name__ == '__main__':
+
+    import unittest
+    from defcon import Font
+
+    class PenBallGeneratorTest(unittest.TestCase):
+
+        def setUp(self):
+            self.font = Font()
+            for glyphName in ['a', 'b']:
+                glyph = self.font.newGlyph(glyphName)
+                pen = glyph.getPen()
+                pen.moveTo((10, 10))
+                pen.lineTo((110, 10))
+                pen.lineTo((110, 110))
+                pen.closePath()
+            composite = self.font.newGlyph('c')
+            composite.getPen().addComponent('b', (1, 0, 0, 1, 0, 0))
+            self.manager = PenBallFiltersManager()
+            self.manager.setFilter('Flatten', {
+                'module': 'robofab.pens.filterPen',
+                'filterObjectName': 'FlattenPen',
+                'arguments': {
+                    'approximateSegmentLength': 5
+                }
+                })
+
+        def test_collect_glyphNames(self):
+            generator = PenBallGenerator(self.manager, 'Flatten')
+            self.assertEqual(generator.collectGlyphNames(self.font, ['c', 'a', 'b', 'd']), ['c', 'a', 'b'])
+
+        def test_can_filter_in_processes(self):
+            self.assertTrue(PenBallGenerator(self.manager, 'Flatten').canFilterInProcesses())
+            self.manager.setFilter('External', {'filterObject': lambda glyph: glyph})
+            self.assertFalse(PenBallGenerator(self.manager, 'External').canFilterInProcesses())
+            self.manager.setFilterChain('Layers', [('Flatten', None, None), ('Flatten', 'union', 'background')])
+            self.assertFalse(PenBallGenerator(self.manager, 'Layers').canFilterInProcesses())
+
+        def test_glyph_data_keeps_single_point_contours(self):
+            glyph = self.font['a']
+            pointPen = glyph.getPointPen()
+            pointPen.beginPath()
+            pointPen.addPoint((50, 50), 'move')
+            pointPen.endPath()
+            glyph.appendAnchor(dict(name='top', x=60, y=120))
+            glyphData = getGlyphData(glyph)
+            self.assertEqual([item[0] for item in glyphData['points']].count('beginPath'), 2)
+            self.assertEqual(glyphData['anchors'], [('top', (60, 120))])
+            glyph = makeGlyphFromData(glyphData)
+            self.assertEqual(getGlyphData(glyph)['points'], glyphData['points'])
+
+        def test_write_glyphs_to_defcon_layer(self):
+            generator = PenBallGenerator(self.manager, 'Flatten', workers=1)
+            glyphNames = generator.collectGlyphNames(self.font, ['c'])
+            filteredGlyphsData = generator.filterGlyphs(self.font, glyphNames)
+            generator.writeGlyphs(filteredGlyphsData, self.font, 'filtered', replaceGlyphs=True)
+            layer = self.font.layers['filtered']
+            self.assertEqual(sorted(layer.keys()), ['b', 'c'])
+            self.assertEqual(len(layer['b'][0]), 3)
+            self.assertEqual(set([component.baseGlyph for component in layer['c'].components]), set(['b']))
+            generator.writeGlyphs(filteredGlyphsData, layer, appendOutlines=True)
+            self.assertEqual(len(layer['b']), 2)
+
+        def test_filtered_glyphs_follow_glyphNames_order(self):
+            generator = PenBallGenerator(self.manager, 'Flatten', workers=2)
+            glyphNames = ['c', 'a', 'b']
+            self.assertEqual(generator.filterGlyphs(self.font, glyphNames).keys(), glyphNames)
+            generator.workers = 1
+            self.assertEqual(generator.filterGlyphs(self.font, glyphNames).keys(), glyphNames)
+
+    unittest.main()
@@ -1,6 +1,15 @@
+from array import array
+
 from fontTools.pens.basePen import BasePen
 from robofab.pens.pointPen import AbstractPointPen
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MINIMUMCONTOURAREA = 25
+
 def calcArea(points):
     l = len(points)
     area = 0
@@ -10,29 +19,65 @@ def calcArea(points):
         area += (x1*y2)-(x2*y1)
     return area / 2
 
+def calcContourAreas(coordinates, contourEnds):
+    """
+    Return signed areas of contours, all at once (shoelace formula),
+    from their points as flat coordinates (x0, y0, x1, y1...) and the index following the last point of each contour.
+    """
+    if numpy is not None and len(coordinates):
+        points = numpy.frombuffer(coordinates, dtype=float).reshape(-1, 2)
+        ends = numpy.array(contourEnds, dtype=int)
+        starts = numpy.concatenate(([0], ends[:-1]))
+        filled = ends > starts
+        # the point following the last point of a contour is its first point
+        nextIndices = numpy.arange(1, len(points) + 1)
+        nextIndices[ends[filled] - 1] = starts[filled]
+        x, y = points[:, 0], points[:, 1]
+        crossProducts = x * y[nextIndices] - x[nextIndices] * y
+        areas = numpy.zeros(len(ends))
+        if filled.any():
+            areas[filled] = numpy.add.reduceat(crossProducts, starts[filled]) / 2.0
+        return areas.tolist()
+
+    areas = []
+    start = 0
+    for end in contourEnds:
+        xs, ys = coordinates[start*2:end*2:2], coordinates[start*2+1:end*2:2]
+        nextXs, nextYs = xs[1:] + xs[:1], ys[1:] + ys[:1]
+        areas.append(sum([x1*y2 - x2*y1 for x1, y1, x2, y2 in zip(xs, ys, nextXs, nextYs)]) / 2.0)
+        start = end
+    return areas
+
 class FilterPointPen(AbstractPointPen):
+    """
+    Collects outlines, to be replayed into another point pen with .extract(), without contours smaller than 25 units square.
+
+    Points are stored in flat lists and coordinates in a flat array,
+    areas of all contours are computed in a single pass when extracting.
+    """
 
     def __init__(self, glyphSet=None):
         self.glyphSet = glyphSet
-        self.contours = []
+        self.coordinates = array('d')
+        self.pts = []
+        self.segmentTypes = []
+        self.smooths = []
+        self.names = []
+        self.contourEnds = []
         self.components = []
 
     def beginPath(self):
-        self.currentContour = []
+        pass
 
     def addPoint(self, pt, segmentType=None, smooth=False, name=None, *args, **kwargs):
-        point = {
-            'pt': pt,
-            'segmentType': segmentType,
-            'smooth': smooth,
-            'name': name
-        }
-        self.currentContour.append(point)
+        self.coordinates.extend(pt)
+        self.pts.append(pt)
+        self.segmentTypes.append(segmentType)
+        self.smooths.append(smooth)
+        self.names.append(name)
 
     def endPath(self):
-        area = calcArea([point['pt'] for point in self.currentContour])
-        if abs(area) >= 25:
-            self.contours.append(self.currentContour)
+        self.contourEnds.append(len(self.pts))
 
     def addComponent(self, baseGlyphName, transformation):
         self.components.append((baseGlyphName, transformation))
@@ -40,11 +85,61 @@ class FilterPointPen(AbstractPointPen):
     def extract(self, pointPen):
         for baseGlyphName, transformation in self.components:
             pointPen.addComponent(baseGlyphName, transformation)
-        for contour in self.contours:
+        pts, segmentTypes, smooths, names = self.pts, self.segmentTypes, self.smooths, self.names
+        start = 0
+        for end, area in zip(self.contourEnds, calcContourAreas(self.coordinates, self.contourEnds)):
+            if abs(area) >= MINIMUMCONTOURAREA:
+                pointPen.beginPath()
+                for i in xrange(start, end):
+                    pointPen.addPoint(pts[i], segmentTypes[i], smooths[i], names[i])
+                pointPen.endPath()
+            start = end
+
+
+
+class RecordingPointPen(AbstractPointPen):
+    """Record point pen calls as plain (picklable) data, that can be replayed into another point pen."""
+
+    def __init__(self):
+        self.data = []
+
+    def beginPath(self):
+        self.data.append(('beginPath',))
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, *args, **kwargs):
+        self.data.append(('addPoint', tuple(pt), segmentType, smooth, name))
+
+    def endPath(self):
+        self.data.append(('endPath',))
+
+    def addComponent(self, baseGlyphName, transformation):
+        self.data.append(('addComponent', baseGlyphName, tuple(transformation)))
+
+    def replay(self, pointPen):
+        replayPointPenData(self.data, pointPen)
+
+
+
+class HashPointPen(RecordingPointPen):
+    """Collect point data of a glyph in a hashable form."""
+
+    def getHash(self):
+        return hash(tuple(self.data))
+
+
+
+def replayPointPenData(data, pointPen):
+    for item in data:
+        command = item[0]
+        if command == 'addPoint':
+            pt, segmentType, smooth, name = item[1:]
+            pointPen.addPoint(pt, segmentType, smooth, name)
+        elif command == 'beginPath':
             pointPen.beginPath()
-            for point in contour:
-                pointPen.addPoint(**point)
+        elif command == 'endPath':
             pointPen.endPath()
+        elif command == 'addComponent':
+            pointPen.addComponent(*item[1:])
 
 
 
@@ -7,6 +7,7 @@ from AppKit import NSMenuItem
 
 from robofab.world import RFont
 from defconAppKit.tools.textSplitter import splitText
+from defconAppKit.windows.progressWindow import ProgressWindow
 from vanilla import *
 from vanilla.dialogs import getFile, message
 from mojo.UI import MultiLineView
@@ -14,6 +15,8 @@ from mojo.extensions import getExtensionDefault, setExtensionDefault
 from mojo.events import addObserver, removeObserver, postEvent
 
 from penBallWizard.objects.penBallFilters import PenBallFiltersManager
+from penBallWizard.objects.filterRepresentations import makeFilterKey
+from penBallWizard.objects.penBallGenerator import PenBallGenerator
 from penBallWizard.parameterObjects.vanillaParameterObjects import ParameterSliderTextInput, VanillaSingleValueParameter
 
 
@@ -117,44 +120,32 @@ class PenBallWizardController(object):
         return displaySettingsMenuItems
 
     def generateGlyphsToFont(self, exportFont=None, layerName=None):
-        font = RFont(showUI=False) if exportFont is None else exportFont
         currentFont = self.currentFont
-        filterName = self.currentFilterName
-        currentFilter = self.filters[filterName]
         if currentFont is not None and len(currentFont.selection):
-            glyphs = [currentFont[glyphName] for glyphName in currentFont.selection if glyphName in currentFont]
-            for glyph in glyphs:
-                if len(glyph.components) > 0:
-                    for comp in glyph.components:
-                        baseGlyphName = comp.baseGlyph
-                        baseGlyph = currentFont[baseGlyphName]
-                        baseFilteredGlyph = currentFilter(baseGlyph)
-                        newFont.insertGlyph(baseFilteredGlyph, baseGlyphName)
-                        newFont[baseGlyphName].unicode = baseFilteredGlyph.unicode
-                filteredGlyph = currentFilter(glyph)
-                if filteredGlyph is not None:
-                    if exportFont is None:
-                        font.insertGlyph(filteredGlyph, glyph.name)
-                    else:
-                        glyph = font[glyph.name] if layerName is None else font[glyph.name].getLayer(layerName)
-                        glyph.clearContours()
-                        glyph.clearComponents()
-                        glyph.appendGlyph(filteredGlyph)
+            font = RFont(showUI=False) if exportFont is None else exportFont
+            if exportFont is None:
+                layerName = None
+            self.generateGlyphs(currentFont, currentFont.selection, font, layerName, replaceGlyphs=exportFont is None)
             font.showUI()
         else:
             message(u'PenBallWizard', 'No selected glyphs to generate')
 
     def generateGlyphsToLayer(self, font, layerName):
-        filterName = self.currentFilterName
-        currentFilter = self.filters[filterName]
         if font is not None:
-            glyphs = [font[glyphName] for glyphName in font.selection if glyphName in font]
-            for glyph in glyphs:
-                if len(glyph.components) == 0:
-                    layerGlyph = glyph.getLayer(layerName)
-                    filteredGlyph = currentFilter(glyph)
-                    if filteredGlyph is not None:
-                        layerGlyph.appendGlyph(filteredGlyph)
+            # composites are left out, filtered outlines are added to those of the layer
+            glyphNames = [glyphName for glyphName in font.selection if glyphName in font and len(font[glyphName].components) == 0]
+            self.generateGlyphs(font, glyphNames, font, layerName, appendOutlines=True)
+
+    def generateGlyphs(self, sourceFont, glyphNames, targetFont, layerName=None, replaceGlyphs=False, appendOutlines=False):
+        """Filter glyphs (and the base glyphs of their components) with the current filter and write them to targetFont."""
+        generator = PenBallGenerator(self.filters, self.currentFilterName)
+        glyphNames = generator.collectGlyphNames(sourceFont, glyphNames)
+        progress = ProgressWindow(u'Filtering {0} glyphs'.format(len(glyphNames)), tickCount=len(glyphNames), parentWindow=self.w)
+        try:
+            filteredGlyphsData = generator.filterGlyphs(sourceFont, glyphNames, progress.update)
+        finally:
+            progress.close()
+        generator.writeGlyphs(filteredGlyphsData, targetFont, layerName, replaceGlyphs, appendOutlines)
 
     def updateFiltersList(self, selectedIndex=0):
         filtersList = self.filters.keys()
@@ -168,17 +159,21 @@ class PenBallWizardController(object):
             value = bool(value)
         key = sender.name
         if self.currentFilterName is not None:
+            # representations are keyed by filter arguments, the last few values remain cached (see getFilterRepresentation())
             self.filters.setArgumentValue(self.currentFilterName, key, value)
-            self.resetRepresentations()
         self.updatePreview()
 
-    def resetRepresentations(self):
+    def resetRepresentations(self, filterName):
+        """Drop representations of a redefined filter and of the filter chains using it."""
         font = self.currentFont
         self.initCachedFont()
         if font is not None:
+            representationKeys = [makeFilterKey(dependentFilterName) for dependentFilterName in self.filters.getDependentFilterNames(filterName)]
             for glyphName in self.glyphNames:
                 if glyphName in font:
-                    font[glyphName].naked().destroyAllRepresentations()
+                    glyph = font[glyphName].naked()
+                    for key in representationKeys:
+                        glyph.destroyRepresentation(key)
 
     def processGlyphs(self):
         font = self.currentFont
@@ -581,7 +576,7 @@ class PenBallWizardController(object):
                     self.closeFilterSheet(sender)
                     self.updateFiltersList(index)
                     self.updateControls()
-                    self.resetRepresentations()
+                    self.resetRepresentations(filterName)
                     self.updatePreview()
                     self.saveFiltersToExtensionDefault()
 
@@ -613,7 +608,7 @@ class PenBallWizardController(object):
         self.closeFilterSheet(sender)
         self.updateFiltersList(index)
         self.updateControls()
-        self.resetRepresentations()
+        self.resetRepresentations(filterName)
         self.updatePreview()
         self.saveFiltersToExtensionDefault()
 
@@ -0,0 +1,121 @@
+#coding=utf-8
+from __future__ import division
+
+"""
+Headless application of PenBallWizard filters to UFOs.
+
+Filters are loaded from a JSON file, as saved by PenBallFiltersManager.saveFiltersToJSON(),
+the chosen filter is applied to glyphs of each UFO, without RoboFont, so that filtered glyphs can be produced on a build server.
+
+    python penBallWizardRunner.py Regular.ufo Bold.ufo --filters filters.json --filter Spike --layer spiked
+    python penBallWizardRunner.py Regular.ufo --filters filters.json --filter Spike --set spikeLength=40 -o Spiked.ufo
+
+Filtered glyphs are either written to a layer of each UFO, which is saved in place,
+or to new UFOs (a single path for a single UFO, otherwise a folder in which UFOs keep their file name).
+Base glyphs of components are filtered along with the glyphs using them.
+"""
+
+import os
+import argparse
+from time import time
+
+from defcon import Font
+
+from penBallWizard.objects.penBallFilters import PenBallFiltersManager
+from penBallWizard.objects.penBallGenerator import PenBallGenerator
+
+fontInfoAttributes = ['familyName', 'styleName', 'unitsPerEm', 'ascender', 'descender', 'xHeight', 'capHeight', 'italicAngle']
+
+
+def parseArgumentValue(value):
+    """Read a command line argument value as PenBallWizard reads values typed in its filter sheet."""
+    if value.lower() == 'true':
+        return True
+    elif value.lower() == 'false':
+        return False
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def getGlyphOrder(font):
+    """Return the names of glyphs in font, in the font’s glyph order, glyphs missing from it come last, sorted."""
+    glyphOrder = []
+    orderedGlyphNames = set()
+    for glyphName in font.glyphOrder + sorted(font.keys()):
+        if glyphName in font and glyphName not in orderedGlyphNames:
+            glyphOrder.append(glyphName)
+            orderedGlyphNames.add(glyphName)
+    return glyphOrder
+
+
+def makeOutputFont(sourceFont):
+    font = Font()
+    for attribute in fontInfoAttributes:
+        setattr(font.info, attribute, getattr(sourceFont.info, attribute))
+    return font
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Apply a PenBallWizard filter to UFOs.')
+    parser.add_argument('fonts', nargs='+', help='UFOs to filter')
+    parser.add_argument('-f', '--filters', required=True, help='JSON file of filters, as saved by PenBallWizard')
+    parser.add_argument('-n', '--filter', required=True, metavar='NAME', help='name of the filter to apply')
+    parser.add_argument('--set', action='append', default=[], metavar='ARGUMENT=VALUE', help='override a filter argument, filter chain arguments are named subfilter.argument.index')
+    parser.add_argument('-g', '--glyphs', nargs='+', metavar='GLYPHNAME', help='glyphs to filter, defaults to all glyphs')
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('-l', '--layer', help='write filtered glyphs to this layer of each UFO, saved in place')
+    output.add_argument('-o', '--output', help='new UFO to write filtered glyphs to, a folder if several UFOs are filtered')
+    parser.add_argument('-w', '--workers', type=int, help='number of filtering processes, defaults to the number of cpus')
+    options = parser.parse_args(args)
+
+    filters = PenBallFiltersManager()
+    filters.loadFiltersFromJSON(options.filters)
+    if options.filter not in filters.keys():
+        parser.error('no filter named {0} in {1}.'.format(options.filter, options.filters))
+
+    theFilter = filters[options.filter]
+    arguments = dict(theFilter.arguments)
+    for override in options.set:
+        try:
+            argumentName, value = override.split('=', 1)
+        except ValueError:
+            parser.error('invalid argument override: {0}, should be ARGUMENT=VALUE.'.format(override))
+        if argumentName not in arguments:
+            parser.error('{0} has no argument named {1}, available arguments: {2}.'.format(options.filter, argumentName, ', '.join(arguments.keys())))
+        arguments[argumentName] = parseArgumentValue(value)
+
+    generator = PenBallGenerator(filters, options.filter, arguments, options.workers)
+    if not generator.canFilterInProcesses():
+        print 'PenBallWizard — {0} can’t be applied in parallel, filtering in process.'.format(options.filter)
+
+    start = time()
+    for path in options.fonts:
+        fontStart = time()
+        font = Font(path)
+        glyphNames = generator.collectGlyphNames(font, options.glyphs if options.glyphs is not None else getGlyphOrder(font))
+        filteredGlyphsData = generator.filterGlyphs(font, glyphNames)
+
+        if options.layer is not None:
+            generator.writeGlyphs(filteredGlyphsData, font, options.layer, replaceGlyphs=True)
+            outputPath = path
+        else:
+            outputFont = makeOutputFont(font)
+            generator.writeGlyphs(filteredGlyphsData, outputFont, replaceGlyphs=True)
+            outputFont.glyphOrder = [glyphName for glyphName in getGlyphOrder(font) if glyphName in outputFont]
+            font = outputFont
+            outputPath = options.output
+            if len(options.fonts) > 1:
+                if not os.path.exists(options.output):
+                    os.makedirs(options.output)
+                outputPath = os.path.join(options.output, os.path.basename(os.path.normpath(path)))
+
+        font.save(outputPath)
+        print 'PenBallWizard — {0}: {1} glyphs in {2:.2f}s, saved to {3}'.format(os.path.basename(os.path.normpath(path)), len(glyphNames), time() - fontStart, outputPath)
+
+    print 'PenBallWizard — Done in {0:.2f}s'.format(time() - start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,504 @@
+#coding=utf-8
+from __future__ import division
+
+"""
+Headless batch generation of ScaleFast presets.
+
+Runs the presets and batch generation list stored in a font’s lib by ScaleFast
+(font.lib['com.loicsander.scaleFast']) with a MutatorScaleEngine,
+without RoboFont’s UI, so that scaled glyphs can be produced on a build server.
+
+    python batchGenerator.py Regular.ufo Bold.ufo -o Scaled.ufo
+    python batchGenerator.py Regular.ufo Bold.ufo -o Scaled.ufo --preset 'Small caps' --glyphs 'ABC' --suffix .sc
+
+Without --preset, every included item of the source font’s batch generation list is generated.
+The source font, holding presets, reference heights and guides, defaults to the first master.
+Measuring masters and removing overlaps rely on the bundled boolean engine, whose pyClipper module is a macOS build.
+"""
+
+import os
+import json
+import argparse
+from time import time
+from math import cos, radians, pi
+
+from defcon import Font
+from fontTools.pens.boundsPen import BoundsPen
+from fontTools.pens.transformPen import TransformPen
+from fontTools.misc.transform import Transform
+
+from mutatorScale.objects.scaler import MutatorScaleEngine
+from mutatorScale.utilities.fontUtils import getDependencyLayers
+
+scaleFastLibKey = 'com.loicsander.scaleFast'
+heightReferences = ['capHeight','xHeight','ascender','descender','unitsPerEm']
+
+
+class ScaleFastPreset(object):
+
+
+    def __init__(self, preset, obsolete=False):
+        if obsolete == True:
+            self.initWithOldPreset(preset)
+        else:
+            name, settings = preset
+            self.init(name, **settings)
+
+
+    def init(self, name, vstem, hstem, stemRapport, isotropic, referenceHeight, targetHeight, width, posX=0, posY=0, stickyPos=('bottom','baseline'), tracking=(0, 'upm'), keepSidebearings=False):
+        self.name = name
+        self.settings = {
+            'vstem': vstem,
+            'hstem': hstem,
+            'stemRapport': stemRapport,
+            'referenceHeight': referenceHeight,
+            'targetHeight': targetHeight,
+            'width': width,
+            'posX': posX,
+            'posY': posY,
+            'stickyPos': stickyPos,
+            'keepSidebearings': keepSidebearings,
+            'tracking': tracking,
+            'isotropic': isotropic
+        }
+
+
+    def initWithOldPreset(self, oldPreset):
+        name, oldSettings = oldPreset
+
+        settings = {}
+
+        value, units = oldSettings['tracking']
+        if units == 'upm':
+            settings['tracking'] = oldSettings['tracking']
+        elif units == '%':
+            settings['tracking'] = ((value-1)*100, '%')
+
+        settings['stemRapport'] = 'absolute'
+        settings['referenceHeight'] = 'capHeight'
+        settings['posY'] = oldSettings['shift']
+        settings['isotropic'] = True if oldSettings['mode'] == 'isotropic' else False
+
+        for key1, key2 in [('targetHeight','height'), ('keepSidebearings','keepSpacing')]:
+            settings[key1] = oldSettings[key2]
+
+        for key in ['vstem','hstem','width']:
+            settings[key] = oldSettings[key]
+
+        self.init(name, **settings)
+
+
+    def setName(self, newName):
+        self.name = newName
+
+
+    def set(self, settings):
+        for key in settings:
+            self.settings[key] = settings[key]
+
+
+
+def getPresets(font):
+    """Return presets stored in a font’s lib as a list of ScaleFastPreset sorted by name, the font’s lib is left untouched."""
+    presets = []
+    if 'com.loicsander.scaleFast.presets' in font.lib:
+        for name, settings in font.lib['com.loicsander.scaleFast.presets']:
+            presets.append(ScaleFastPreset((name, settings), True))
+    if scaleFastLibKey in font.lib and 'presets' in font.lib[scaleFastLibKey]:
+        for name, settings in font.lib[scaleFastLibKey]['presets'].items():
+            presets.append(ScaleFastPreset((name, settings)))
+    presets.sort(key=lambda a: a.name)
+    return presets
+
+
+def getBatchGenerationList(font):
+    if scaleFastLibKey in font.lib and 'batchGenerationList' in font.lib[scaleFastLibKey]:
+        return font.lib[scaleFastLibKey]['batchGenerationList']
+    return []
+
+
+def stringToGlyphNames(string, cmap):
+    """
+    Split a glyph string as typed in ScaleFast into glyph names.
+    Characters are mapped with cmap ({unicode: [glyphNames]}), /name tokens are read as glyph names,
+    a name ends with a space or the next slash, // stands for the slash character.
+    """
+    glyphNames = []
+    string = string.replace('\\n', '\n')
+    index = 0
+    length = len(string)
+
+    while index < length:
+        character = string[index]
+
+        if character == '/' and string[index+1:index+2] != '/':
+            end = index + 1
+            while end < length and string[end] not in ' /\n':
+                end += 1
+            if end > index + 1:
+                glyphNames.append(string[index+1:end])
+            if end < length and string[end] == ' ':
+                end += 1
+            index = end
+            continue
+
+        if character == '/':
+            index += 1
+
+        if character != '\n':
+            names = cmap.get(ord(character))
+            if names:
+                glyphNames.append(names[0])
+        index += 1
+
+    return glyphNames
+
+
+def getAngledMargins(glyph, glyphSet, angle=0):
+    """Return the (left, right) margins of a glyph measured along an italic angle, components are looked up in glyphSet."""
+    boundsPen = BoundsPen(glyphSet)
+    glyph.draw(TransformPen(boundsPen, Transform().skew(radians(angle))))
+    if boundsPen.bounds is None:
+        return 0, glyph.width
+    xMin, yMin, xMax, yMax = boundsPen.bounds
+    return xMin, glyph.width - xMax
+
+
+def setAngledMargins(glyph, glyphSet, leftMargin=None, rightMargin=None, angle=0):
+    """Set the margins of a glyph measured along an italic angle, the whole glyph is moved to fit the left margin."""
+    currentLeftMargin, currentRightMargin = getAngledMargins(glyph, glyphSet, angle)
+    if leftMargin is not None:
+        delta = leftMargin - currentLeftMargin
+        glyph.move((delta, 0))
+        glyph.width += delta
+    if rightMargin is not None:
+        glyph.width += rightMargin - currentRightMargin
+
+
+def transformGlyph(glyph, transformations, getMargins, setMargins, sourceMargins=None, targetHeight=0, referenceHeights={}, guides=[], angle=0):
+    """
+    Apply ScaleFast transformations (sidebearings, tracking, sticky position and offset) to a scaled glyph.
+
+    Margins are read and written with getMargins(glyph) -> (left, right) and setMargins(glyph, left, right),
+    so that both RoboFont glyphs and defcon glyphs can be transformed.
+    sourceMargins are the margins of the unscaled glyph, restored if transformations['keepSidebearings'] is True.
+    targetHeight is looked up in referenceHeights ({name: height}) and guides (ScaleFast guides) when named.
+    """
+    # neutralizing the scaling of sidebearings
+    if transformations['keepSidebearings'] == True and sourceMargins is not None:
+        setMargins(glyph, *sourceMargins)
+
+    # tracking
+    trackingValue, trackingUnits = transformations['tracking']
+    if trackingUnits == 'upm':
+        for items in ['contours', 'anchors','components']:
+            if items in ['contours', 'anchors'] or (items == 'components' and transformations['keepSidebearings'] == True):
+                for item in getattr(glyph, items):
+                    item.move((trackingValue, 0))
+        glyph.width += (trackingValue * 2)
+
+    elif trackingUnits == '%':
+        leftMargin, rightMargin = [round(margin) for margin in getMargins(glyph)]
+        setMargins(glyph, leftMargin * (1 + (trackingValue / 100)), rightMargin * (1 + (trackingValue / 100)))
+        delta = getMargins(glyph)[0] - leftMargin
+        for component in glyph.components:
+            component.move((-delta, 0))
+
+    yDelta = 0
+
+    # sticky position
+    stickyPos = transformations['stickyPos']
+    if stickyPos != ('bottom','baseline'):
+        zone, alignment = stickyPos
+
+        if targetHeight in referenceHeights:
+            targetHeight = referenceHeights[targetHeight]
+        elif targetHeight == 'baseline':
+            targetHeight = 0
+
+        guideNames = [guide['Name'] for guide in guides]
+
+        if alignment in referenceHeights:
+            alignmentHeight = referenceHeights[alignment]
+        elif alignment in guideNames:
+            index = guideNames.index(alignment)
+            try:
+                alignmentHeight = int(guides[index]['Height'])
+            except:
+                alignmentHeight = 0
+        else:
+            alignmentHeight = 0
+
+        if zone == 'bottom':
+            yDelta = alignmentHeight
+        elif zone == 'top':
+            yDelta = alignmentHeight - targetHeight
+        elif zone == 'center':
+            yDelta = alignmentHeight - (targetHeight / 2)
+
+    # additional (x, y) offset
+    posX, posY = transformations['posX'], transformations['posY']
+    xDelta = round((yDelta + posY) * cos(radians(angle)+pi/2))
+
+    posX += xDelta
+    posY += yDelta
+
+    if posX or posY:
+        for contour in glyph.contours:
+            contour.move((posX, posY))
+        for anchor in glyph.anchors:
+            anchor.move((posX, posY))
+
+    return glyph
+
+
+
+class ScaleFastBatchGenerator(object):
+    """
+    Generates scaled glyphs from ScaleFast presets, without UI.
+
+    Masters are fonts, as for the ScaleFast window, their stems are measured unless provided as (vstem, hstem) tuples.
+    The source font is the one whose lib holds presets and guides,
+    its vertical metrics are used as reference heights, it defaults to the first master.
+
+    >>> generator = ScaleFastBatchGenerator([regular, bold])
+    >>> report = generator.generateBatch(outputFont)
+    """
+
+    def __init__(self, masterFonts, sourceFont=None, masterStems=None, workers=None):
+        self.scalingMasters = MutatorScaleEngine()
+        for i, font in enumerate(masterFonts):
+            stems = masterStems[i] if masterStems is not None else None
+            if stems is not None:
+                self.scalingMasters.addMaster(font, stems)
+            else:
+                self.scalingMasters.addMaster(font)
+
+        self.sourceFont = sourceFont if sourceFont is not None else masterFonts[0]
+        self.workers = workers
+        self.scalingGoals = {}
+        self.transformations = {
+            'posX': 0,
+            'posY': 0,
+            'stickyPos': ('bottom','baseline'),
+            'tracking': (0, 'upm'),
+            'keepSidebearings': False
+        }
+        self.stemTarget = None
+        self.presets = getPresets(self.sourceFont)
+
+    def getPreset(self, presetName):
+        for preset in self.presets:
+            if preset.name == presetName:
+                return preset
+        return None
+
+    def applySettings(self, settings):
+        """Set up the scaling engine and glyph transformations from preset settings."""
+        self.scalingGoals = {
+            'width': settings['width'],
+            'targetHeight': settings['targetHeight'],
+            'referenceHeight': settings['referenceHeight'],
+            'referenceHeightValue': getattr(self.sourceFont.info, settings['referenceHeight']) if settings['referenceHeight'] in heightReferences else settings['targetHeight']
+        }
+
+        for key in self.transformations:
+            self.transformations[key] = settings[key]
+
+        if settings['isotropic'] == True and self.scalingMasters.hasTwoAxes() == False:
+            self.stemTarget = settings['vstem']
+        else:
+            self.stemTarget = (settings['vstem'], settings['hstem'])
+
+        self.scalingMasters.set(self.scalingGoals)
+
+    def generateGlyphsToFont(self, font, glyphNames, settings, suffix=None):
+        """Scale glyphNames, and the base glyphs of their components, according to settings and write them to font."""
+        self.applySettings(settings)
+        scaledGlyphs, orderedGlyphNames = self._scaleGlyphs(glyphNames)
+        requestedGlyphNames = set(glyphNames)
+
+        # base glyphs come before their composites, they are only written if missing from font
+        for glyphName in orderedGlyphNames:
+            if glyphName in requestedGlyphNames or self._getOutputGlyphName(glyphName, scaledGlyphs, suffix) not in font:
+                self._insertScaledGlyph(font, glyphName, scaledGlyphs, suffix)
+        return font
+
+    def generatePreset(self, font, presetName, glyphNames, suffix=None):
+        """Generate glyphs with a preset, return a (presetName, number of glyphs, duration in seconds) tuple."""
+        preset = self.getPreset(presetName)
+        if preset is None:
+            raise KeyError('No preset named {0} in {1}.'.format(presetName, self.sourceFont.path))
+        start = time()
+        self.generateGlyphsToFont(font, glyphNames, preset.settings, suffix)
+        return presetName, len(glyphNames), time() - start
+
+    def generateBatch(self, font, batchGenerationList=None):
+        """
+        Generate every included item of a batch generation list (defaults to the source font’s) to font,
+        return a list of (presetName, number of glyphs, duration in seconds) tuples, one per generated item.
+        """
+        if batchGenerationList is None:
+            batchGenerationList = getBatchGenerationList(self.sourceFont)
+
+        cmap = self.sourceFont.unicodeData
+        report = []
+        for generationItem in batchGenerationList:
+            presetName = generationItem['preset']
+            if self.getPreset(presetName) is not None and generationItem.get(u'↳', True) == True:
+                glyphNames = stringToGlyphNames(generationItem['glyphset'], cmap)
+                report.append(self.generatePreset(font, presetName, glyphNames, generationItem['suffix']))
+        return report
+
+    def getMutatorReport(self):
+        return self.scalingMasters.getMutatorReport()
+
+    def _scaleGlyphs(self, glyphNames):
+        """
+        Scale glyphNames and the base glyphs of their components, each of them once,
+        return a {glyphName: scaledGlyph} dict and the glyph names sorted along the component dependency graph.
+        """
+        graph = self.scalingMasters.getComponentGraph(glyphNames)
+        orderedGlyphNames = [name for layer in getDependencyLayers(graph) for name in layer]
+        glyphs = self.scalingMasters.getScaledGlyphs(orderedGlyphNames, self.stemTarget, workers=self.workers)
+        return dict(zip(orderedGlyphNames, glyphs)), orderedGlyphNames
+
+    def _insertScaledGlyph(self, font, glyphName, scaledGlyphs, suffix=None):
+        scaledGlyph = scaledGlyphs[glyphName]
+        outputGlyphName = self._getOutputGlyphName(glyphName, scaledGlyphs, suffix)
+        angle = font.info.italicAngle if font.info.italicAngle is not None else 0
+
+        # glyphs are transformed before they are written,
+        # scaled glyphs can be shared between batch items, work on a copy
+        glyph = scaledGlyph.copy()
+        sourceMargins = None
+        if self.transformations['keepSidebearings'] == True and glyphName in self.sourceFont:
+            sourceMargins = getAngledMargins(self.sourceFont[glyphName], self.sourceFont, angle)
+        try:
+            guides = self.sourceFont.lib[scaleFastLibKey]['guides']
+        except:
+            guides = []
+        transformGlyph(glyph, self.transformations,
+            lambda glyph: getAngledMargins(glyph, scaledGlyphs, angle),
+            lambda glyph, leftMargin, rightMargin: setAngledMargins(glyph, scaledGlyphs, leftMargin, rightMargin, angle),
+            sourceMargins=sourceMargins,
+            targetHeight=self.scalingGoals['targetHeight'],
+            referenceHeights={key: getattr(self.sourceFont.info, key) for key in heightReferences},
+            guides=guides,
+            angle=angle)
+
+        outputGlyph = font.newGlyph(outputGlyphName)
+        outputGlyph.width = glyph.width
+        # several glyphs mapped to the same unicode make for a broken cmap, suffixed glyphs are left unencoded
+        if not suffix:
+            outputGlyph.unicodes = list(glyph.unicodes)
+
+        pointPen = outputGlyph.getPointPen()
+        for contour in glyph.contours:
+            contour.drawPoints(pointPen)
+        for component in glyph.components:
+            (xOffset, yOffset), (xScale, yScale) = component.offset, component.scale
+            pointPen.addComponent(self._getOutputGlyphName(component.baseGlyph, scaledGlyphs, suffix), (xScale, 0, 0, yScale, xOffset, yOffset))
+        for anchor in glyph.anchors:
+            outputGlyph.appendAnchor(dict(x=anchor.x, y=anchor.y, name=anchor.name))
+
+    def _getOutputGlyphName(self, glyphName, scaledGlyphs, suffix=None):
+        # component base glyphs are scaled along with their composites and take the same suffix
+        if suffix and glyphName in scaledGlyphs:
+            return '{0}{1}'.format(glyphName, suffix)
+        return glyphName
+
+
+
+def copyFontProperties(font, fontToCopy):
+    for dimension in ['xHeight','capHeight','ascender','descender','italicAngle','unitsPerEm']:
+        setattr(font.info, dimension, getattr(fontToCopy.info, dimension))
+    if 'com.typemytype.robofont.italicSlantOffset' in fontToCopy.lib:
+        font.lib['com.typemytype.robofont.italicSlantOffset'] = fontToCopy.lib['com.typemytype.robofont.italicSlantOffset']
+
+
+def _parseStems(string):
+    stems = [float(value) for value in string.split(',')]
+    return tuple(stems) if len(stems) > 1 else (stems[0], None)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Generate scaled glyphs from ScaleFast presets.')
+    parser.add_argument('masters', nargs='+', help='master UFOs (at least two)')
+    parser.add_argument('-o', '--output', required=True, help='UFO to write scaled glyphs to, created from the source font’s metrics if it does not exist')
+    parser.add_argument('-s', '--source', help='UFO holding presets and guides, defaults to the first master')
+    parser.add_argument('--stems', action='append', metavar='VSTEM[,HSTEM]', help='stems of each master, in order, measured if omitted')
+    parser.add_argument('-p', '--preset', action='append', metavar='NAME', help='generate these presets instead of the batch generation list')
+    parser.add_argument('-g', '--glyphs', help='glyph string for --preset, defaults to all glyphs of the source font')
+    parser.add_argument('--suffix', default='', help='glyph name suffix for --preset')
+    parser.add_argument('-w', '--workers', type=int, help='number of interpolation processes, defaults to the number of cpus')
+    parser.add_argument('--remove-overlaps', action='store_true', help='remove overlaps on every glyph of the output font before saving it')
+    parser.add_argument('--profile', action='store_true', help='report time spent in each scaling stage')
+    parser.add_argument('--profile-output', metavar='PATH', help='write scaling stage timings, overall and per glyph, to a JSON file')
+    options = parser.parse_args(args)
+
+    if len(options.masters) < 2:
+        parser.error('at least two masters are required.')
+    if options.stems is not None and len(options.stems) != len(options.masters):
+        parser.error('--stems must be given once per master.')
+
+    masterFonts = [Font(path) for path in options.masters]
+    sourceFont = Font(options.source) if options.source is not None else masterFonts[0]
+    masterStems = [_parseStems(stems) for stems in options.stems] if options.stems is not None else None
+
+    if os.path.exists(options.output):
+        font = Font(options.output)
+    else:
+        font = Font()
+        copyFontProperties(font, sourceFont)
+
+    start = time()
+    generator = ScaleFastBatchGenerator(masterFonts, sourceFont, masterStems, options.workers)
+    print 'ScaleFast — Masters ready in {0:.2f}s'.format(time() - start)
+
+    profiling = options.profile or options.profile_output is not None
+    if profiling:
+        generator.scalingMasters.enableProfiling()
+
+    if options.preset is not None:
+        if options.glyphs is not None:
+            glyphNames = stringToGlyphNames(options.glyphs.decode('utf-8'), sourceFont.unicodeData)
+        else:
+            glyphNames = sourceFont.keys()
+        report = [generator.generatePreset(font, presetName, glyphNames, options.suffix) for presetName in options.preset]
+    else:
+        report = generator.generateBatch(font)
+
+    for presetName, glyphCount, duration in report:
+        print 'ScaleFast — {0}: {1} glyphs in {2:.2f}s'.format(presetName, glyphCount, duration)
+
+    errors = generator.getMutatorReport()
+    if len(errors):
+        print 'ScaleFast — {0} glyphs could not be interpolated:'.format(len(errors))
+        for error in errors:
+            print error
+
+    if profiling:
+        print 'ScaleFast — Scaling stages:'
+        print generator.scalingMasters.getProfilingSummary()
+        if options.profile_output is not None:
+            with open(options.profile_output, 'w') as f:
+                json.dump(generator.scalingMasters.getProfilingReport(), f, indent=2, sort_keys=True)
+
+    if options.remove_overlaps:
+        # imported on demand, see the note on pyClipper in the README
+        from mutatorScale.utilities.fontUtils import removeOverlaps
+        overlapStart = time()
+        overlapErrors = removeOverlaps(list(font), options.workers)
+        print 'ScaleFast — Overlaps removed in {0:.2f}s'.format(time() - overlapStart)
+        if len(overlapErrors):
+            print 'ScaleFast — {0} glyphs kept their overlaps:'.format(len(overlapErrors))
+            for glyphName in sorted(overlapErrors):
+                print glyphName, overlapErrors[glyphName]
+
+    font.save(options.output)
+    print 'ScaleFast — Done in {0:.2f}s, saved to {1}'.format(time() - start, options.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+#coding=utf-8
+from __future__ import division
+
+"""
+Benchmarks for mutatorScale, run headless on synthetic fonts built with defcon.
+
+Times MutatorScaleEngine.getScaledGlyph, ScaleFont.getGlyph, getRefStems, freezeGlyph and BooleanGlyph.union
+for each combination of glyph count and master count, and writes results to a JSON file
+so that runs made on different commits can be compared.
+
+From ScaleFast’s lib folder:
+
+    python -m mutatorScale.benchmark -o before.json
+    python -m mutatorScale.benchmark -o after.json --compare before.json
+    python -m mutatorScale.benchmark --glyphs 50 --masters 2 4 --repeat 5
+
+Benchmarks that fail (the boolean engine requires the compiled pyClipper module) are recorded with their error.
+"""
+
+import sys
+import json
+import platform
+import argparse
+import subprocess
+from time import strftime
+from timeit import default_timer
+
+from defcon import Font
+from robofab.world import RGlyph
+
+from mutatorScale.objects.scaler import MutatorScaleEngine
+from mutatorScale.objects.fonts import ScaleFont
+from mutatorScale.utilities.fontUtils import getRefStems, freezeGlyph
+from mutatorScale.booleanOperations.booleanGlyph import BooleanGlyph
+
+defaultGlyphCounts = [50, 500, 5000]
+defaultMasterCounts = [2, 4, 8]
+benchmarkScale = (0.85, 0.8)
+
+
+""" Synthetic fonts """
+
+def _drawRect(pen, xMin, yMin, xMax, yMax):
+    pen.moveTo((xMin, yMin))
+    pen.lineTo((xMin, yMax))
+    pen.lineTo((xMax, yMax))
+    pen.lineTo((xMax, yMin))
+    pen.closePath()
+
+def _drawEllipse(pen, xMin, yMin, xMax, yMax, clockwise=True):
+    k = 0.5523
+    xCenter, yCenter = (xMin + xMax) / 2, (yMin + yMax) / 2
+    points = [(xCenter, yMin), (xMax, yCenter), (xCenter, yMax), (xMin, yCenter)]
+    if not clockwise:
+        points.reverse()
+    pen.moveTo(points[0])
+    for i, (x1, y1) in enumerate(points):
+        x2, y2 = points[(i+1) % 4]
+        # handles follow the axis of their own on-curve point
+        if x1 == xCenter:
+            h1 = (x1 + (x2 - x1) * k, y1)
+            h2 = (x2, y2 + (y1 - y2) * k)
+        else:
+            h1 = (x1, y1 + (y2 - y1) * k)
+            h2 = (x2 + (x1 - x2) * k, y2)
+        pen.curveTo(h1, h2, (x2, y2))
+    pen.closePath()
+
+def _drawStemGlyph(pen, vstem, hstem, height):
+    # stem with overlapping serifs
+    _drawRect(pen, 100, 0, 100+vstem, height)
+    _drawRect(pen, 60, 0, 140+vstem, hstem)
+    _drawRect(pen, 60, height-hstem, 140+vstem, height)
+
+def _drawCrossGlyph(pen, vstem, hstem, height, width):
+    # H like glyph, the bar overlaps both stems
+    _drawRect(pen, 60, 0, 60+vstem, height)
+    _drawRect(pen, width-60-vstem, 0, width-60, height)
+    _drawRect(pen, 60+vstem/2, (height-hstem)/2, width-60-vstem/2, (height+hstem)/2)
+
+def _drawBowlGlyph(pen, vstem, hstem, height, width):
+    _drawEllipse(pen, 40, 0, width-40, height)
+    _drawEllipse(pen, 40+vstem, hstem, width-40-vstem, height-hstem, False)
+
+def makeSyntheticFont(glyphCount, vstem, hstem, styleName='Regular'):
+    """
+    Return a defcon font with glyphCount glyphs drawn with the given stems.
+    Fonts built with the same glyph count are compatible for interpolation,
+    glyphs cycle through stems with serifs, H like crosses (overlapping contours), bowls (curves) and composites.
+    """
+    font = Font()
+    font.info.familyName = 'Benchmark'
+    font.info.styleName = styleName
+    font.info.unitsPerEm = 1000
+    font.info.capHeight = 700
+    font.info.xHeight = 500
+    font.info.ascender = 750
+    font.info.descender = -250
+
+    glyph = font.newGlyph('I')
+    glyph.width = vstem + 200
+    _drawRect(glyph.getPen(), 100, 0, 100+vstem, 700)
+
+    glyph = font.newGlyph('H')
+    glyph.width = 600
+    _drawCrossGlyph(glyph.getPen(), vstem, hstem, 700, 600)
+
+    glyph = font.newGlyph('acute')
+    glyph.width = 300
+    _drawRect(glyph.getPen(), 100, 750, 100+vstem, 750+hstem*2)
+
+    baseGlyphNames = ['I', 'H']
+
+    for i in range(max(0, glyphCount - 3)):
+        glyphName = 'glyph{0:05d}'.format(i)
+        glyph = font.newGlyph(glyphName)
+        kind = i % 4
+        height = [700, 500][(i // 4) % 2]
+        width = 400 + (i % 7) * 40
+        glyph.width = width
+
+        if kind == 0:
+            _drawStemGlyph(glyph.getPen(), vstem, hstem, height)
+        elif kind == 1:
+            _drawCrossGlyph(glyph.getPen(), vstem, hstem, height, width)
+        elif kind == 2:
+            _drawBowlGlyph(glyph.getPen(), vstem, hstem, height, width)
+        elif kind == 3:
+            pointPen = glyph.getPointPen()
+            baseGlyphName = baseGlyphNames[(i // 4) % len(baseGlyphNames)]
+            glyph.width = font[baseGlyphName].width
+            pointPen.addComponent(baseGlyphName, (1, 0, 0, 1, 0, 0))
+            pointPen.addComponent('acute', (1, 0, 0, 1, 40, 0))
+
+        if kind in [0, 2]:
+            baseGlyphNames.append(glyphName)
+
+    return font
+
+def makeSyntheticMasters(glyphCount, masterCount):
+    """
+    Return masterCount compatible fonts, vertical stems spread from 60 to 220 units,
+    horizontal stems alternate between 30 and 50 units so that masters describe two axes as soon as there are more than two.
+    """
+    masters = []
+    for i in range(masterCount):
+        vstem = 60 + round(i * 160 / max(1, masterCount - 1))
+        hstem = 30 + (i % 2) * 20
+        masters.append(makeSyntheticFont(glyphCount, vstem, hstem, 'Master{0} {1}-{2}'.format(i, vstem, hstem)))
+    return masters
+
+
+""" Benchmarks """
+
+def _makeShiftedGlyph(glyph, offset):
+    shiftedGlyph = RGlyph()
+    glyph.draw(shiftedGlyph.getPen())
+    shiftedGlyph.move(offset)
+    return shiftedGlyph
+
+def benchmarkGetScaledGlyph(masters, glyphNames):
+    engine = MutatorScaleEngine(masters)
+    engine.set({'scale': benchmarkScale})
+    vstems = [master.vstem for master in engine]
+    hstems = [master.hstem for master in engine]
+    stemTarget = (sum(vstems) / len(vstems), sum(hstems) / len(hstems))
+
+    def setup():
+        engine.clearMutatorCache()
+        for master in engine:
+            master.clearCache()
+
+    return setup, lambda glyphName: engine.getScaledGlyph(glyphName, stemTarget), glyphNames
+
+def benchmarkGetScaledGlyphCachedMutators(masters, glyphNames):
+    """Scale glyphs with a second stem target, mutators built for the first one are reused."""
+    engine = MutatorScaleEngine(masters)
+    engine.set({'scale': benchmarkScale})
+    stemTargets = [(master.vstem, master.hstem) for master in engine]
+
+    def setup():
+        engine.clearMutatorCache()
+        for glyphName in glyphNames:
+            engine.getScaledGlyph(glyphName, stemTargets[0])
+
+    return setup, lambda glyphName: engine.getScaledGlyph(glyphName, stemTargets[-1]), glyphNames
+
+def benchmarkScaleFontGetGlyph(masters, glyphNames):
+    scaleFont = ScaleFont(masters[0], benchmarkScale)
+    return scaleFont.clearCache, scaleFont.getGlyph, glyphNames
+
+def benchmarkScaleFontGetGlyphCached(masters, glyphNames):
+    scaleFont = ScaleFont(masters[0], benchmarkScale)
+
+    def setup():
+        for glyphName in glyphNames:
+            scaleFont.getGlyph(glyphName)
+
+    return setup, scaleFont.getGlyph, glyphNames
+
+def benchmarkGetRefStems(masters, glyphNames):
+    return None, getRefStems, masters
+
+def benchmarkFreezeGlyph(masters, glyphNames):
+    font = masters[0]
+    return None, freezeGlyph, [font[glyphName] for glyphName in glyphNames]
+
+def benchmarkBooleanGlyphUnion(masters, glyphNames):
+    font = masters[0]
+    pairs = []
+    for glyphName in glyphNames:
+        glyph = font[glyphName]
+        if len(glyph):
+            pairs.append((BooleanGlyph(glyph), BooleanGlyph(_makeShiftedGlyph(glyph, (30, 20)))))
+    return None, lambda (glyph, other): glyph.union(other), pairs
+
+benchmarks = [
+    ('MutatorScaleEngine.getScaledGlyph', benchmarkGetScaledGlyph),
+    ('MutatorScaleEngine.getScaledGlyph (cached mutators)', benchmarkGetScaledGlyphCachedMutators),
+    ('ScaleFont.getGlyph', benchmarkScaleFontGetGlyph),
+    ('ScaleFont.getGlyph (cached)', benchmarkScaleFontGetGlyphCached),
+    ('getRefStems', benchmarkGetRefStems),
+    ('freezeGlyph', benchmarkFreezeGlyph),
+    ('BooleanGlyph.union', benchmarkBooleanGlyphUnion),
+]
+
+
+def timeBenchmark(setup, function, items, repeat=3):
+    """Call function on each item, repeat times, setup() being called before each round. Return the duration of each round."""
+    durations = []
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = default_timer()
+        for item in items:
+            function(item)
+        durations.append(default_timer() - start)
+    return durations
+
+def runBenchmarks(glyphCounts=defaultGlyphCounts, masterCounts=defaultMasterCounts, repeat=3, names=None, log=None):
+    """Run benchmarks for every (glyph count, master count) combination and return a list of result dicts."""
+    results = []
+
+    for glyphCount in glyphCounts:
+        for masterCount in masterCounts:
+            masters = makeSyntheticMasters(glyphCount, masterCount)
+            glyphNames = sorted(masters[0].keys())
+
+            for name, benchmark in benchmarks:
+                if names is not None and name not in names:
+                    continue
+                # benchmarks which do not depend on the number of masters are only run once per glyph count
+                if benchmark in [benchmarkScaleFontGetGlyph, benchmarkScaleFontGetGlyphCached, benchmarkFreezeGlyph, benchmarkBooleanGlyphUnion] and masterCount != masterCounts[0]:
+                    continue
+
+                result = {
+                    'name': name,
+                    'glyphs': glyphCount,
+                    'masters': masterCount
+                }
+                try:
+                    setup, function, items = benchmark(masters, glyphNames)
+                    durations = timeBenchmark(setup, function, items, repeat)
+                    result.update({
+                        'calls': len(items),
+                        'best': min(durations),
+                        'mean': sum(durations) / len(durations),
+                        'perCall': min(durations) / len(items) if len(items) else 0
+                    })
+                except Exception as e:
+                    result['error'] = '{0}: {1}'.format(e.__class__.__name__, e)
+
+                results.append(result)
+                if log is not None:
+                    log(formatResult(result))
+
+    return results
+
+
+""" Reporting """
+
+def getCommit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.STDOUT).strip()
+    except Exception:
+        return None
+
+def formatResult(result):
+    label = '{name} [{glyphs} glyphs, {masters} masters]'.format(**result)
+    if 'error' in result:
+        return '{0:<75} {1}'.format(label, result['error'])
+    return '{0:<75} {1:>9.2f}ms/call {2:>9.3f}s total'.format(label, result['perCall'] * 1000, result['best'])
+
+def compareResults(results, previousResults):
+    """Return lines comparing per call durations of two runs, ratios above 1 mean the current run is slower."""
+    previous = {(r['name'], r['glyphs'], r['masters']): r for r in previousResults if 'perCall' in r}
+    lines = []
+    for result in results:
+        key = (result['name'], result['glyphs'], result['masters'])
+        if 'perCall' not in result or key not in previous or not previous[key]['perCall']:
+            continue
+        ratio = result['perCall'] / previous[key]['perCall']
+        label = '{name} [{glyphs} glyphs, {masters} masters]'.format(**result)
+        lines.append('{0:<75} {1:>9.2f}ms → {2:>9.2f}ms  x{3:.2f}'.format(label, previous[key]['perCall'] * 1000, result['perCall'] * 1000, ratio))
+    return lines
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark mutatorScale on synthetic fonts.')
+    parser.add_argument('-g', '--glyphs', type=int, nargs='+', default=defaultGlyphCounts, help='glyph counts')
+    parser.add_argument('-m', '--masters', type=int, nargs='+', default=defaultMasterCounts, help='master counts')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='rounds per benchmark, the best one is kept')
+    parser.add_argument('-b', '--benchmark', action='append', metavar='NAME', help='only run these benchmarks')
+    parser.add_argument('-o', '--output', default='mutatorScale-benchmark.json', help='JSON file to write results to')
+    parser.add_argument('-c', '--compare', help='JSON results of a previous run to compare with')
+    options = parser.parse_args(args)
+
+    def log(line):
+        print line
+        sys.stdout.flush()
+
+    results = runBenchmarks(options.glyphs, options.masters, options.repeat, options.benchmark, log)
+
+    data = {
+        'date': strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': getCommit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': options.repeat,
+        'results': results
+    }
+    with open(options.output, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    log('Results written to {0}'.format(options.output))
+
+    if options.compare is not None:
+        with open(options.compare) as f:
+            previousData = json.load(f)
+        log('Compared with {0} ({1})'.format(options.compare, previousData.get('commit')))
+        for line in compareResults(results, previousData['results']):
+            log(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -178,7 +178,7 @@ class BooleanGlyph(object):
         func = getattr(manager, operation)
 
         if operation == "union":
-            contours = self.contours
+            contours = list(self.contours)
             if other is not None:
                 contours += other.contours
             func(contours, destination.getPointPen())
@@ -1,12 +1,14 @@
 from fontTools.pens.basePen import BasePen
-from flatten import InputContour, OutputContour
+from flatten import InputContour, OutputContour, FlatContourCache, _getFlatInputPointsLookup, _flatPointsSelfIntersect
+from mutatorScale.utilities.boundsUtils import groupOverlappingBounds
 import pyClipper
 
 
 """
 General Suggestions:
-- Contours should only be sent here if they actually overlap.
-  This can be checked easily using contour bounds.
+- Contours are grouped by overlapping bounds, a contour
+  that overlaps nothing is drawn as is, unless it
+  intersects itself.
 - Only perform operations on closed contours.
 - contours must have an on curve point
 - some kind of a log
@@ -15,10 +17,38 @@ General Suggestions:
 
 class BooleanOperationManager(object):
 
+    def __init__(self, maxCachedContours=None):
+        # flattened input contours are kept around, the same contours tend to come back
+        self.flatCache = FlatContourCache(maxCachedContours)
+
     def _performOperation(self, operation, subjectContours, clipContours, outPen):
         # prep the contours
-        subjectInputContours = [InputContour(contour) for contour in subjectContours if contour and len(contour) > 1]
-        clipInputContours = [InputContour(contour) for contour in clipContours if contour and len(contour) > 1]
+        subjectInputContours = [InputContour(contour, self.flatCache) for contour in subjectContours if contour and len(contour) > 1]
+        clipInputContours = [InputContour(contour, self.flatCache) for contour in clipContours if contour and len(contour) > 1]
+        inputContours = subjectInputContours + clipInputContours
+        subjectCount = len(subjectInputContours)
+        # contours only interact with contours whose bounds overlap theirs,
+        # each group of overlapping contours is clipped on its own
+        outputContours = []
+        for group in groupOverlappingBounds([inputContour.bounds for inputContour in inputContours]):
+            groupSubjectContours = [inputContours[index] for index in group if index < subjectCount]
+            groupClipContours = [inputContours[index] for index in group if index >= subjectCount]
+            # nothing remains of the group
+            if not groupSubjectContours and operation in ["difference", "intersection"]:
+                continue
+            if not groupClipContours and operation == "intersection":
+                continue
+            # a simple contour touching nothing is left untouched
+            if len(group) == 1 and not _flatPointsSelfIntersect(inputContours[group[0]].originalFlat):
+                outputContours.append(OutputContour.fromInputContour(inputContours[group[0]]))
+                continue
+            outputContours += self._clipContours(operation, groupSubjectContours, groupClipContours)
+        # output the results
+        for outputContour in outputContours:
+            outputContour.drawPoints(outPen)
+        return outputContours
+
+    def _clipContours(self, operation, subjectInputContours, clipInputContours):
         inputContours = subjectInputContours + clipInputContours
 
         resultContours = pyClipper.clipExecute([subjectInputContour.originalFlat for subjectInputContour in subjectInputContours], 
@@ -45,11 +75,9 @@ class BooleanOperationManager(object):
             for outputContour in outputContours:
                 outputContour.reCurveFromInputContourSegments(inputContour)
         # curve fit
+        flatInputPointsLookup = _getFlatInputPointsLookup(inputContours)
         for outputContour in outputContours:
-            outputContour.reCurveSubSegments(inputContours)
-        # output the results
-        for outputContour in outputContours:
-            outputContour.drawPoints(outPen)
+            outputContour.reCurveSubSegments(inputContours, flatInputPointsLookup)
         return outputContours
 
     def union(self, contours, outPen):
@@ -67,7 +95,7 @@ class BooleanOperationManager(object):
     def getIntersections(self, contours):
         from flatten import _scalePoints, inverseClipperScale
         # prep the contours
-        inputContours = [InputContour(contour) for contour in contours if contour and len(contour) > 1]
+        inputContours = [InputContour(contour, self.flatCache) for contour in contours if contour and len(contour) > 1]
 
         inputFlatPoints = set()
         for contour in inputContours:
@@ -1,10 +1,17 @@
 import math
+from collections import OrderedDict
+from threading import Lock
 from fontTools.pens.basePen import BasePen
 from fontTools.misc import bezierTools
 from fontTools.pens.basePen import decomposeQuadraticSegment
 from robofab.pens.reverseContourPointPen import ReverseContourPointPen
 from robofab.pens.adapterPens import PointToSegmentPen
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 """
 To Do:
 - the stuff listed below
@@ -62,14 +69,23 @@ _approximateSegmentLength = 5.3
 
 class InputContour(object):
 
-    def __init__(self, contour):
+    __slots__ = ["segments", "reversedSegments", "clockwise", "clockwiseSegments", "counterClockwiseSegments", "used"]
+
+    def __init__(self, contour, flatCache=None):
         # gather the point data
         pointPen = ContourPointDataPen()
         contour.drawPoints(pointPen)
         points = pointPen.getData()
         reversedPoints = _reversePoints(points)
         # gather segments
-        self.segments = _convertPointsToSegments(points)
+        # reuse the flat points of an identical contour if there is a cache
+        flats = None
+        if flatCache is not None:
+            flatCacheKey = flatCache.getKey(points)
+            flats = flatCache.get(flatCacheKey)
+        self.segments = _convertPointsToSegments(points, flats=flats)
+        if flatCache is not None and flats is None:
+            flatCache.set(flatCacheKey, [segment.flat for segment in self.segments])
         # only calculate once all the flat points.
         # it seems to have some tiny difference and its a lot faster
         # if the flat points are calculated from the reversed input points.
@@ -128,6 +144,14 @@ class InputContour(object):
 
     counterClockwiseFlat = property(_get_counterClockwiseFlat)
 
+    # the bounds of the flat segments (in clipper scale)
+
+    def _get_bounds(self):
+        xs, ys = zip(*self.originalFlat)
+        return min(xs), min(ys), max(xs), max(ys)
+
+    bounds = property(_get_bounds)
+
     def hasOnCurve(self):
         for inputSegment in self.segments:
             if not inputSegment.used and inputSegment.segmentType != "line":
@@ -137,9 +161,9 @@ class InputContour(object):
 
 class InputSegment(object):
 
-    #__slots__ = ["points", "previousOnCurve", "scaledPreviousOnCurve", "flat", "used"]
+    __slots__ = ["points", "previousOnCurve", "scaledPreviousOnCurve", "flat", "used"]
 
-    def __init__(self, points=None, previousOnCurve=None, willBeReversed=False):
+    def __init__(self, points=None, previousOnCurve=None, willBeReversed=False, flat=None, flatten=True):
         if points is None:
             points = []
         self.points = points
@@ -165,10 +189,23 @@ class InputSegment(object):
         # its a reversed segment the flat points will be set later on in the InputContour
         if willBeReversed:
             return
-        pointsToFlatten = []
+        # the flat points are already known (cached)
+        if flat is not None:
+            self.flat = flat
+        # flatten now, unless all segments of a contour are flattened at once afterwards
+        elif flatten:
+            _flattenInputSegments([self])
+
+    def _getCurvesToFlatten(self):
+        """
+        Return the segment as a list of cubic curves (on, off, off, on) to flatten,
+        None if it is a line.
+        """
+        points = self.points
+        previousOnCurve = self.previousOnCurve
         if self.segmentType == "qcurve":
             assert len(points) >= 0
-            flat = []
+            curves = []
             currentOnCurve = previousOnCurve
             pointCoordinates = [point.coordinates for point in points]
             for pt1, pt2 in decomposeQuadraticSegment(pointCoordinates[1:]):
@@ -181,25 +218,16 @@ class InputSegment(object):
                 mid2y = pt2y + 0.66666666666666667 * (pt1y - pt2y)
                 
                 convertedQuadPointToFlatten = [currentOnCurve, (mid1x, mid1y), (mid2x, mid2y), pt2]
-                flat.extend(_flattenSegment(convertedQuadPointToFlatten))
+                curves.append(convertedQuadPointToFlatten)
                 currentOnCurve = pt2
-            self.flat = flat
             # this shoudl be easy.
             # copy the quad to cubic from fontTools.pens.basePen
+            return curves
         elif self.segmentType == "curve":
-            pointsToFlatten = [previousOnCurve] + [point.coordinates for point in points]
+            return [[previousOnCurve] + [point.coordinates for point in points]]
         else:
             assert len(points) == 1
-            self.flat = [point.coordinates for point in points]
-        if pointsToFlatten:
-            self.flat = _flattenSegment(pointsToFlatten)
-        # if len(self.flat) == 1 and self.segmentType == "curve":
-        #     oncurve = self.points[-1]
-        #     oncurve.segmentType = "line"
-        #     self.points = [oncurve]
-        self.flat = _scalePoints(self.flat, scale=clipperScale)
-        self.flat = _checkFlatPoints(self.flat)
-        self.used = False
+            return None
 
     def _get_segmentType(self):
         return self.points[-1].segmentType
@@ -345,6 +373,59 @@ class ContourPointDataPen:
     def addComponent(self, baseGlyphName, transformation):
         raise NotImplementedError
 
+class FlatContourCache(object):
+
+    """
+    Bounded cache of the flattened segments of input contours,
+    keyed by the normalized point data of a contour (coordinates and segment types).
+    An unchanged contour is never flattened twice,
+    the least recently used entries are dropped when the cache is full.
+    """
+
+    maxCachedContours = 2000
+
+    def __init__(self, maxCachedContours=None):
+        if maxCachedContours is not None:
+            self.maxCachedContours = maxCachedContours
+        self._flats = OrderedDict()
+        self._lock = Lock()
+        self.cacheHits = 0
+        self.cacheMisses = 0
+
+    def __len__(self):
+        return len(self._flats)
+
+    def getKey(self, points):
+        return tuple([(tuple(point.coordinates), point.segmentType) for point in points])
+
+    def get(self, key):
+        with self._lock:
+            flats = self._flats.pop(key, None)
+            if flats is None:
+                self.cacheMisses += 1
+                return None
+            self.cacheHits += 1
+            # most recently used contours go last
+            self._flats[key] = flats
+            return flats
+
+    def set(self, key, flats):
+        with self._lock:
+            if key not in self._flats and len(self._flats) >= self.maxCachedContours:
+                self._flats.popitem(last=False)
+            self._flats[key] = flats
+
+    def clear(self):
+        with self._lock:
+            self._flats.clear()
+
+    def getCacheStats(self):
+        return {
+            'hits': self.cacheHits,
+            'misses': self.cacheMisses,
+            'size': len(self._flats)
+        }
+
 def _prepPointsForSegments(points):
     """
     Move any off curves at the end of the contour
@@ -361,37 +442,28 @@ def _prepPointsForSegments(points):
             continue
         break
 
-def _copyPoints(points):
-    """
-    Make a shallow copy of the points.
-    """
-    copied = [point.copy() for point in points]
-    return copied
-
 def _reversePoints(points):
     """
     Reverse the points. This differs from the
     reversal point pen in RoboFab in that it doesn't
     worry about maintaing the start point position.
     That has no benefit within the context of this module.
+    Off curves are never modified, so only the on curves,
+    which get a new segment type, are copied.
     """
-    # copy the points
-    points = _copyPoints(points)
     # find the first on curve type and recycle
     # it for the last on curve type
-    firstOnCurve = None
-    for index, point in enumerate(points):
+    lastSegmentType = None
+    for point in points:
         if point.segmentType is not None:
-            firstOnCurve = index
+            lastSegmentType = point.segmentType
             break
-    lastSegmentType = points[firstOnCurve].segmentType
-    # reverse the points
-    points = reversed(points)
-    # work through the reversed remaining points
+    # work through the reversed points
     final = []
-    for point in points:
+    for point in reversed(points):
         segmentType = point.segmentType
         if segmentType is not None:
+            point = point.copy()
             point.segmentType = lastSegmentType
             lastSegmentType = segmentType
         final.append(point)
@@ -401,9 +473,10 @@ def _reversePoints(points):
     # done
     return final
 
-def _convertPointsToSegments(points, willBeReversed=False):
+def _convertPointsToSegments(points, willBeReversed=False, flats=None):
     """
     Compile points into InputSegment objects.
+    Optionally pass in the already flattened points of each segment.
     """
     # get the last on curve
     previousOnCurve = None
@@ -423,14 +496,44 @@ def _convertPointsToSegments(points, willBeReversed=False):
             segment = InputSegment(
                 points=offCurves + [point],
                 previousOnCurve=previousOnCurve,
-                willBeReversed=willBeReversed
+                willBeReversed=willBeReversed,
+                flat=flats[len(segments)] if flats is not None else None,
+                flatten=False
             )
             segments.append(segment)
             offCurves = []
             previousOnCurve = point.coordinates
     assert not offCurves
+    # flatten all the curves of the contour in one go
+    if not willBeReversed and flats is None:
+        _flattenInputSegments(segments)
     return segments
 
+def _flattenInputSegments(segments):
+    """
+    Set the scaled flat points of InputSegment objects,
+    all curves are flattened at once.
+    """
+    segmentCurves = [segment._getCurvesToFlatten() for segment in segments]
+    curves = []
+    for curvesToFlatten in segmentCurves:
+        if curvesToFlatten is not None:
+            curves.extend(curvesToFlatten)
+    flattenedCurves = iter(_flattenSegments(curves))
+    for segment, curvesToFlatten in zip(segments, segmentCurves):
+        if curvesToFlatten is None:
+            flat = [point.coordinates for point in segment.points]
+        else:
+            flat = []
+            for curve in curvesToFlatten:
+                flat.extend(next(flattenedCurves))
+        # if len(self.flat) == 1 and self.segmentType == "curve":
+        #     oncurve = self.points[-1]
+        #     oncurve.segmentType = "line"
+        #     self.points = [oncurve]
+        flat = _scalePoints(flat, scale=clipperScale)
+        segment.flat = _checkFlatPoints(flat)
+
 
 # --------------
 # Output Objects
@@ -438,6 +541,8 @@ def _convertPointsToSegments(points, willBeReversed=False):
 
 class OutputContour(object):
 
+    __slots__ = ["clockwise", "segments"]
+
     def __init__(self, pointList):
         if pointList[0] == pointList[-1]:
             del pointList[-1]
@@ -449,6 +554,17 @@ class OutputContour(object):
             ) for point in pointList
         ]
 
+    @classmethod
+    def fromInputContour(cls, inputContour):
+        """
+        Return a final output contour drawing the input contour as is,
+        for contours that don't interact with any other.
+        """
+        outputContour = cls.__new__(cls)
+        outputContour.clockwise = inputContour.clockwise
+        outputContour.segments = [_getFinalOutputSegment(inputSegment) for inputSegment in inputContour.segments]
+        return outputContour
+
     def _scalePoint(self, point):
         x, y = point
         x = x * inverseClipperScale
@@ -517,22 +633,7 @@ class OutputContour(object):
             else:
                 inputSegments = inputContour.counterClockwiseSegments
             for inputSegment in inputSegments:
-                self.segments.append(
-                    OutputSegment(
-                        segmentType=inputSegment.segmentType,
-                        points=[
-                            OutputPoint(
-                                coordinates=point.coordinates,
-                                segmentType=point.segmentType,
-                                smooth=point.smooth,
-                                name=point.name,
-                                kwargs=point.kwargs
-                            )
-                            for point in inputSegment.points
-                        ],
-                        final=True
-                    )
-                )
+                self.segments.append(_getFinalOutputSegment(inputSegment))
                 inputSegment.used = True
             # reset the direction of the final contour
             self.clockwise = inputContour.clockwise
@@ -630,44 +731,29 @@ class OutputContour(object):
         #         return True
         # return False
 
-    def reCurveSubSegments(self, inputContours):
+    def reCurveSubSegments(self, inputContours, flatInputPointsLookup=None):
+        """
+        Curve fit the remaining flat segments.
+        flatInputPointsLookup is the result of _getFlatInputPointsLookup(inputContours),
+        it can be passed in to share it between all the output contours.
+        """
         if not self.segments:
             # its all done
             return 
         # the inputContours has some curved segments
         # if not it all the segments will be converted at the end
         if self.reCurveSubSegmentsCheckInputContoursOnHasCurve(inputContours):
-            # collect all flat points in a dict of unused inputContours
-            # collect both clockwise segment and counterClockwise segments
             # it happens a lot that the directions turns around
             # the clockwise attribute can help but testing the directions is always needed
-            # collect all oncurve points as well
-            flatInputPointsSegmentDict = dict()
-            reversedFlatInputPointsSegmentDict = dict()
-            flatIntputOncurves = set()
-            for inputContour in inputContours:
-                if inputContour.used:
-                    continue
-                if self.clockwise:
-                    inputSegments = inputContour.clockwiseSegments
-                    reversedSegments = inputContour.counterClockwiseSegments
-                else:
-                    inputSegments = inputContour.counterClockwiseSegments
-                    reversedSegments = inputContour.clockwiseSegments
-                for inputSegment in inputSegments:
-                    if inputSegment.used:
-                        continue
-                    for p in inputSegment.flat:
-                        flatInputPointsSegmentDict[p] = inputSegment
-                    flatIntputOncurves.add(inputSegment.scaledPreviousOnCurve)
-                    
-                for inputSegment in reversedSegments:
-                    if inputSegment.used:
-                        continue
-                    for p in inputSegment.flat:
-                        reversedFlatInputPointsSegmentDict[p] = inputSegment
-                    flatIntputOncurves.add(inputSegment.scaledPreviousOnCurve)
-            flatInputPoints = set(flatInputPointsSegmentDict.keys())
+            if flatInputPointsLookup is None:
+                flatInputPointsLookup = _getFlatInputPointsLookup(inputContours)
+            clockwiseFlatInputPointsSegmentDict, counterClockwiseFlatInputPointsSegmentDict, flatIntputOncurves = flatInputPointsLookup
+            if self.clockwise:
+                flatInputPointsSegmentDict = clockwiseFlatInputPointsSegmentDict
+                reversedFlatInputPointsSegmentDict = counterClockwiseFlatInputPointsSegmentDict
+            else:
+                flatInputPointsSegmentDict = counterClockwiseFlatInputPointsSegmentDict
+                reversedFlatInputPointsSegmentDict = clockwiseFlatInputPointsSegmentDict
             # reset the starting point to a known point.
             # not somewhere in the middle of a flatten point list
             firstSegment = self.segments[0]
@@ -718,7 +804,7 @@ class OutputContour(object):
                     continue
                 # get al inputSegments, this is an unorderd list of all points no in the the flatInputPoints
                 segmentPointsSet = set(segment.points)
-                intersectionPoints = segmentPointsSet - flatInputPoints
+                intersectionPoints = set([p for p in segmentPointsSet if p not in flatInputPointsSegmentDict])
                 # merge both oncurves and intersectionPoints as known points
                 possibleStartingPoints = flatIntputOncurves | intersectionPoints
                 hasOncurvePoints = segmentPointsSet & flatIntputOncurves
@@ -749,7 +835,7 @@ class OutputContour(object):
                     fp = segmentedFlatPoints[0][0]
                     lp = segmentedFlatPoints[-1][-1]
                     mergeFirstSegments = False
-                    if fp in flatInputPoints and lp in flatInputPoints:
+                    if fp in flatInputPointsSegmentDict and lp in flatInputPointsSegmentDict:
                         firstInputSegment = flatInputPointsSegmentDict[fp]
                         lastInputSegment = flatInputPointsSegmentDict[lp]
                         reversedFirstInputSegment = reversedFlatInputPointsSegmentDict[fp]
@@ -975,13 +1061,60 @@ class OutputSegment(object):
         self.final = final
 
 
-class OutputPoint(InputPoint): pass
+class OutputPoint(InputPoint):
+
+    __slots__ = []
 
 
 # -------------
 # Ouput Support
 # -------------
 
+def _getFinalOutputSegment(inputSegment):
+    """
+    Return a final output segment with the points of an input segment.
+    """
+    return OutputSegment(
+        segmentType=inputSegment.segmentType,
+        points=[
+            OutputPoint(
+                coordinates=point.coordinates,
+                segmentType=point.segmentType,
+                smooth=point.smooth,
+                name=point.name,
+                kwargs=point.kwargs
+            )
+            for point in inputSegment.points
+        ],
+        final=True
+    )
+
+def _getFlatInputPointsLookup(inputContours):
+    """
+    Collect all flat points of the unused input segments,
+    mapped to their segment, in both directions,
+    and all the oncurve points as well.
+    This only depends on the input contours, so it can be
+    collected once for all the output contours.
+    """
+    clockwiseFlatInputPointsSegmentDict = dict()
+    counterClockwiseFlatInputPointsSegmentDict = dict()
+    flatIntputOncurves = set()
+    for inputContour in inputContours:
+        if inputContour.used:
+            continue
+        for inputSegments, flatInputPointsSegmentDict in [
+                (inputContour.clockwiseSegments, clockwiseFlatInputPointsSegmentDict),
+                (inputContour.counterClockwiseSegments, counterClockwiseFlatInputPointsSegmentDict)
+            ]:
+            for inputSegment in inputSegments:
+                if inputSegment.used:
+                    continue
+                for p in inputSegment.flat:
+                    flatInputPointsSegmentDict[p] = inputSegment
+                flatIntputOncurves.add(inputSegment.scaledPreviousOnCurve)
+    return clockwiseFlatInputPointsSegmentDict, counterClockwiseFlatInputPointsSegmentDict, flatIntputOncurves
+
 def _getClockwise(points):
     """
     Very quickly get the direction for points.
@@ -996,6 +1129,62 @@ def _getClockwise(points):
     area = sum([x0 * y1 - x1 * y0 for ((x0, y0), (x1, y1)) in segments])
     return area <= 0
 
+def _flatPointsSelfIntersect(points):
+    """
+    Tell if the closed polygon of flat points is not a simple polygon:
+    if it crosses or touches itself, doubles back on itself or has no area.
+    Such a contour has to go through clipper even if it overlaps no other contour.
+    Segments are swept along the x axis, only segments whose bounds overlap are tested against each other.
+    """
+    # repeated points make zero length segments
+    points = [point for index, point in enumerate(points) if point != points[index - 1]]
+    count = len(points)
+    if count < 3:
+        return True
+    segments = zip(points, points[1:] + points[:1])
+    area = 0
+    for index, ((x0, y0), (x1, y1)) in enumerate(segments):
+        area += x0 * y1 - x1 * y0
+        # a spike: a segment going back along the previous one
+        (px, py), (qx, qy) = segments[index - 1]
+        if (qx - px) * (y1 - y0) == (qy - py) * (x1 - x0) and (qx - px) * (x1 - x0) + (qy - py) * (y1 - y0) < 0:
+            return True
+    if area == 0:
+        return True
+
+    xMins = [min(x0, x1) for (x0, y0), (x1, y1) in segments]
+    xMaxs = [max(x0, x1) for (x0, y0), (x1, y1) in segments]
+    active = []
+    for index in sorted(range(count), key=xMins.__getitem__):
+        xMin = xMins[index]
+        active = [activeIndex for activeIndex in active if xMaxs[activeIndex] >= xMin]
+        for activeIndex in active:
+            # neighbouring segments share a point
+            if abs(index - activeIndex) in (1, count - 1):
+                continue
+            if _segmentsIntersect(segments[index], segments[activeIndex]):
+                return True
+        active.append(index)
+    return False
+
+def _segmentsIntersect(((x0, y0), (x1, y1)), ((x2, y2), (x3, y3))):
+    """Tell if two segments cross or touch each other."""
+    if max(y0, y1) < min(y2, y3) or max(y2, y3) < min(y0, y1):
+        return False
+    def orientation(ax, ay, bx, by, cx, cy):
+        cross = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+        return (cross > 0) - (cross < 0)
+    o1 = orientation(x0, y0, x1, y1, x2, y2)
+    o2 = orientation(x0, y0, x1, y1, x3, y3)
+    o3 = orientation(x2, y2, x3, y3, x0, y0)
+    o4 = orientation(x2, y2, x3, y3, x1, y1)
+    if o1 != o2 and o3 != o4:
+        return True
+    # collinear segments, bounds overlap on both axes (x overlap is given by the sweep)
+    if o1 == o2 == 0:
+        return max(x0, x1) >= min(x2, x3) and max(x2, x3) >= min(x0, x1)
+    return False
+
 # ----------
 # Misc. Math
 # ----------
@@ -1127,6 +1316,64 @@ def _flattenSegment(segment, approximateSegmentLength=_approximateSegmentLength)
     flat.append(onCurve2)
     return flat
 
+def _flattenSegments(segments, approximateSegmentLength=_approximateSegmentLength):
+    """
+    Flatten a list of curve segments, see _flattenSegment.
+    With numpy all segments are evaluated at once.
+    """
+    if numpy is None or not segments:
+        return [_flattenSegment(segment, approximateSegmentLength) for segment in segments]
+    return _flattenSegmentsArray(segments, approximateSegmentLength)
+
+def _getCubicBernsteinMatrix(tValues):
+    """
+    Return the cubic Bernstein basis for an array of t values, one row per t value.
+    """
+    mt = 1 - tValues
+    return numpy.column_stack((mt * mt * mt, 3 * mt * mt * tValues, 3 * mt * tValues * tValues, tValues * tValues * tValues))
+
+def _flattenSegmentsArray(segments, approximateSegmentLength=_approximateSegmentLength, precision=10):
+    """
+    numpy version of _flattenSegment for a list of segments.
+    Curve lengths are estimated for all segments at once, the number
+    of points per curve follows from that length, then all points of
+    all curves are computed with a single Bernstein matrix product.
+    """
+    controlPoints = numpy.array(segments, dtype=float)
+    onCurves1, offCurves1, offCurves2, onCurves2 = controlPoints[:, 0], controlPoints[:, 1], controlPoints[:, 2], controlPoints[:, 3]
+    # curves with off curves on the line between the on curves are lines
+    distance = lambda pts1, pts2: numpy.hypot(*(pts1 - pts2).T)
+    onCurvesDistance = distance(onCurves1, onCurves2)
+    isLine = (numpy.abs(distance(onCurves1, offCurves1) + distance(offCurves1, onCurves2) - onCurvesDistance) < epsilon) & \
+             (numpy.abs(distance(onCurves1, offCurves2) + distance(offCurves2, onCurves2) - onCurvesDistance) < epsilon)
+    # estimate all curve lengths: (samples, 4) x (segments, 4, 2) -> (segments, samples, 2)
+    estimatePoints = numpy.einsum("ij,sjk->sik", _getCubicBernsteinMatrix(numpy.linspace(0, 1, precision + 1)), controlPoints)
+    lengths = numpy.hypot(*numpy.diff(estimatePoints, axis=1).T).sum(axis=0)
+    # adaptive number of points per curve, same steps as _flattenSegment
+    minStep = 0.1564
+    lengths[isLine] = 1
+    steps = approximateSegmentLength / lengths
+    steps[steps > .3] = minStep
+    counts = numpy.ceil(1.0 / steps).astype(int) - 1
+    counts[isLine] = 0
+    # t values of all curves: step, 2 * step, ... < 1
+    total = counts.sum()
+    segmentIndexes = numpy.repeat(numpy.arange(len(segments)), counts)
+    stepIndexes = numpy.arange(1, total + 1) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    tValues = stepIndexes * steps[segmentIndexes]
+    # (points, 4) x (points, 4, 2) -> (points, 2)
+    points = numpy.einsum("ij,ijk->ik", _getCubicBernsteinMatrix(tValues), controlPoints[segmentIndexes])
+    points = zip(points[:, 0].tolist(), points[:, 1].tolist())
+    # split per curve, the last on curve is always added as is
+    flats = []
+    start = 0
+    for segment, count in zip(segments, counts.tolist()):
+        flat = points[start:start + count]
+        flat.append(segment[-1])
+        flats.append(flat)
+        start += count
+    return flats
+
 def _distance(pt1, pt2):
     return math.sqrt((pt1[0] - pt2[0]) ** 2 + (pt1[1] - pt2[1]) ** 2)
 
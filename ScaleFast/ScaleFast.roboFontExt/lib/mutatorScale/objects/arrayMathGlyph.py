@@ -0,0 +1,148 @@
+#coding=utf-8
+from __future__ import division
+
+from math import tan
+
+import numpy
+
+from robofab.objects.objectsBase import addPt, subPt, mulPt
+from mutatorScale.objects.mathGlyph import MathGlyph, divPt
+
+'''
+MathGlyph variant storing contour coordinates in a single float64 (N, 2) numpy array.
+Point structure (segment types, smooth flags and names) is kept apart and shared between glyphs built from one another,
+so that glyph math and skewing on contours amount to one array operation each.
+'''
+
+_arrayFunctions = {
+    addPt: numpy.add,
+    subPt: numpy.subtract,
+    mulPt: numpy.multiply,
+    divPt: numpy.true_divide,
+}
+
+
+def _getCoordinateArray(glyph):
+    """Return contour coordinates of any MathGlyph as a (N, 2) array."""
+    if isinstance(glyph, ArrayMathGlyph):
+        return glyph._coordinates
+    return numpy.array([pt for contour in glyph.contours for segmentType, pt, smooth, name in contour], dtype=numpy.float64).reshape(-1, 2)
+
+
+class ArrayMathGlyph(MathGlyph):
+
+    """
+    A MathGlyph with array backed contours.
+
+    It behaves exactly like a MathGlyph: contours can still be read and set as
+    lists of (segmentType, (x, y), smooth, name) tuples, they are simply converted from/to the array on access.
+    Components and anchors are handled as in MathGlyph.
+    """
+
+    def _get_contours(self):
+        coordinates = self._coordinates.tolist()
+        contours = []
+        index = 0
+        for contourStructure in self._pointStructure:
+            contour = []
+            for segmentType, smooth, name in contourStructure:
+                contour.append((segmentType, tuple(coordinates[index]), smooth, name))
+                index += 1
+            contours.append(contour)
+        return contours
+
+    def _set_contours(self, contours):
+        self._pointStructure = tuple([tuple([(segmentType, smooth, name) for segmentType, pt, smooth, name in contour]) for contour in contours])
+        self._coordinates = numpy.array([pt for contour in contours for segmentType, pt, smooth, name in contour], dtype=numpy.float64).reshape(-1, 2)
+
+    contours = property(_get_contours, _set_contours, doc="list of contours as lists of (segmentType, (x, y), smooth, name) tuples")
+
+    def _get_structure(self):
+        if self._structure is not None:
+            return self._structure
+        contourStructure = [[segmentType for segmentType, smooth, name in contour] for contour in self._pointStructure]
+        componentStructure = [baseName for baseName, transformation in self.components]
+        anchorStructure = [name for pt, name in self.anchors]
+        return contourStructure, componentStructure, anchorStructure
+
+    structure = property(_get_structure, doc="returns a tuple of (contour structure, component structure, anchor structure)")
+
+    def _processContoursMathOne(self, copiedGlyph, otherGlyph, funct):
+        otherCoordinates = _getCoordinateArray(otherGlyph)
+        if otherCoordinates.shape != self._coordinates.shape:
+            raise ValueError('Incompatible contours: {0} and {1}'.format(self.name, otherGlyph.name))
+        copiedGlyph._pointStructure = self._pointStructure
+        copiedGlyph._coordinates = _arrayFunctions[funct](self._coordinates, otherCoordinates)
+
+    def _processContoursMathTwo(self, copiedGlyph, factor, funct):
+        copiedGlyph._pointStructure = self._pointStructure
+        copiedGlyph._coordinates = _arrayFunctions[funct](self._coordinates, numpy.array(factor, dtype=numpy.float64))
+
+    def _skewContoursX(self, a):
+        coordinates = self._coordinates.copy()
+        coordinates[:, 0] += coordinates[:, 1] * tan(a)
+        self._coordinates = coordinates
+
+    def drawPoints(self, pointPen):
+        """draw self using pointPen"""
+        coordinates = self._coordinates.tolist()
+        index = 0
+        for contourStructure in self._pointStructure:
+            pointPen.beginPath()
+            for segmentType, smooth, name in contourStructure:
+                pointPen.addPoint(pt=tuple(coordinates[index]), segmentType=segmentType, smooth=smooth, name=name)
+                index += 1
+            pointPen.endPath()
+        for baseName, transformation in self.components:
+            pointPen.addComponent(baseName, transformation)
+        for pt, name in self.anchors:
+            pointPen.beginPath()
+            pointPen.addPoint(pt=pt, segmentType="move", smooth=False, name=name)
+            pointPen.endPath()
+
+
+if __name__ == '__main__':
+
+    import os
+    import unittest
+    from defcon import Font
+    from robofab.world import RGlyph
+
+    class ArrayMathGlyphTests(unittest.TestCase):
+
+        def setUp(self):
+            libFolder = os.path.dirname(os.path.dirname((os.path.dirname(os.path.abspath(__file__)))))
+            fontPath = os.path.join(libFolder, u'testFonts/two-axes/regular-low-contrast.ufo')
+            self.font = Font(fontPath)
+            self.glyphNames = ['H', 'Aacute', 'A', 'O', 'B']
+
+        def _compare(self, glyph, arrayGlyph):
+            self.assertEqual(len(glyph.contours), len(arrayGlyph.contours))
+            for contour, arrayContour in zip(glyph.contours, arrayGlyph.contours):
+                for (segmentType, (x, y), smooth, name), (arraySegmentType, (ax, ay), arraySmooth, arrayName) in zip(contour, arrayContour):
+                    self.assertEqual((segmentType, smooth, name), (arraySegmentType, arraySmooth, arrayName))
+                    self.assertAlmostEqual(x, ax)
+                    self.assertAlmostEqual(y, ay)
+            self.assertEqual(glyph.width, arrayGlyph.width)
+
+        def test_math_matches_MathGlyph(self):
+            for glyphName in self.glyphNames:
+                glyph = MathGlyph(self.font[glyphName])
+                arrayGlyph = ArrayMathGlyph(self.font[glyphName])
+                self._compare(glyph, arrayGlyph)
+                self._compare(glyph * (0.5, 0.4), arrayGlyph * (0.5, 0.4))
+                self._compare(glyph + glyph, arrayGlyph + arrayGlyph)
+                self._compare(glyph - glyph * 0.5, arrayGlyph - arrayGlyph * 0.5)
+                glyph.skewX(12)
+                arrayGlyph.skewX(12)
+                self._compare(glyph, arrayGlyph)
+
+        def test_extractGlyph_matches_MathGlyph(self):
+            for glyphName in self.glyphNames:
+                glyph = MathGlyph(self.font[glyphName]).extractGlyph(RGlyph())
+                arrayGlyph = ArrayMathGlyph(self.font[glyphName]).extractGlyph(RGlyph())
+                self.assertEqual(len(glyph), len(arrayGlyph))
+                for contour, arrayContour in zip(glyph, arrayGlyph):
+                    self.assertEqual([(p.x, p.y, p.type) for p in contour.points], [(p.x, p.y, p.type) for p in arrayContour.points])
+
+    unittest.main()
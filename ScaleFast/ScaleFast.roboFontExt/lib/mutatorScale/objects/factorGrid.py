@@ -0,0 +1,160 @@
+#coding=utf-8
+from __future__ import division
+
+from bisect import bisect_right
+from math import ceil
+
+from mutatorMath.objects.location import Location
+
+_EPSILON = 1e-9
+
+class MutatorFactorGrid(object):
+
+    """
+    Factors of the deltas of a two axes (vstem, hstem) mutator, precomputed on a grid of stem values.
+
+    A mutator’s factors are piecewise linear on each axis, in between master values,
+    so that by adding master values to the grid lines, the factors of any location inside the grid
+    are bilinearly interpolated from the four surrounding grid nodes without error.
+    An instance is then produced by a single weighted sum of the mutator’s deltas, without searching location limits.
+
+    Factors only depend on where masters are placed, a grid can serve any mutator
+    with the same master locations (see MutatorFactorGrid.getKey()).
+
+    >>> grid = MutatorFactorGrid(mutator, vstemRange=(0, 200), hstemRange=(0, 100), step=5)
+    >>> instance = grid.makeInstance(mutator, Location(vstem=80, hstem=40))
+    """
+
+    def __init__(self, mutator, vstemRange=None, hstemRange=None, step=5):
+        bias = mutator.getBias()
+        items = sorted(mutator.items())
+        masterLocations = [bias] + [Location(deltaLocationTuple) + bias for deltaLocationTuple, item in items]
+
+        self.key = self.getKey(mutator)
+        self.vstems = self._getAxisValues([location.get('vstem', 0) for location in masterLocations], vstemRange, step)
+        self.hstems = self._getAxisValues([location.get('hstem', 0) for location in masterLocations], hstemRange, step)
+
+        itemIndexes = {id(mathItem): index for index, (deltaLocationTuple, (mathItem, deltaName)) in enumerate(items)}
+        self.factors = []
+        for vstem in self.vstems:
+            row = []
+            for hstem in self.hstems:
+                factors = [0] * len(items)
+                for factor, mathItem, deltaName in mutator.getFactors(Location(vstem=vstem, hstem=hstem) - bias, allFactors=True):
+                    factors[itemIndexes[id(mathItem)]] = factor
+                row.append(factors)
+            self.factors.append(row)
+
+    def __repr__(self):
+        return 'MutatorFactorGrid {0}×{1} vstem({2}, {3}) hstem({4}, {5})'.format(len(self.vstems), len(self.hstems), self.vstems[0], self.vstems[-1], self.hstems[0], self.hstems[-1])
+
+    @staticmethod
+    def getKey(mutator):
+        """Return a key identifying the master locations of a mutator, shared by mutators a grid can serve."""
+        return mutator.getBias().asTuple(), tuple(sorted(mutator.keys()))
+
+    def _getAxisValues(self, masterValues, valueRange, step):
+        """Return grid lines of an axis: regular steps across valueRange plus master values inside of it."""
+        if valueRange is None:
+            valueRange = (0, 2 * max(masterValues))
+        minValue, maxValue = valueRange
+        if not minValue < maxValue:
+            raise ValueError('Invalid factor grid range: {0}'.format(valueRange))
+
+        stepCount = int(ceil((maxValue - minValue) / step))
+        values = [minValue + i * step for i in range(stepCount)] + [maxValue]
+        values += [value for value in masterValues if minValue < value < maxValue]
+        values.sort()
+
+        axisValues = [values[0]]
+        for value in values[1:]:
+            if value - axisValues[-1] > _EPSILON:
+                axisValues.append(value)
+        return axisValues
+
+    def contains(self, vstem, hstem):
+        return self.vstems[0] <= vstem <= self.vstems[-1] and self.hstems[0] <= hstem <= self.hstems[-1]
+
+    def _getCell(self, values, value):
+        index = min(max(bisect_right(values, value) - 1, 0), len(values) - 2)
+        low, high = values[index], values[index + 1]
+        return index, (value - low) / (high - low)
+
+    def getFactors(self, vstem, hstem):
+        """Return the factors of a mutator’s deltas, in sorted(mutator.items()) order, at (vstem, hstem)."""
+        i, tv = self._getCell(self.vstems, vstem)
+        j, th = self._getCell(self.hstems, hstem)
+        factors00, factors01 = self.factors[i][j], self.factors[i][j + 1]
+        factors10, factors11 = self.factors[i + 1][j], self.factors[i + 1][j + 1]
+        w00, w01, w10, w11 = (1 - tv) * (1 - th), (1 - tv) * th, tv * (1 - th), tv * th
+        return [w00 * f00 + w01 * f01 + w10 * f10 + w11 * f11 for f00, f01, f10, f11 in zip(factors00, factors01, factors10, factors11)]
+
+    def makeInstance(self, mutator, location):
+        """
+        Return the instance of mutator at location (input space, as for mutator.makeInstance()),
+        None if location is outside the grid.
+        """
+        vstem, hstem = location.get('vstem', 0), location.get('hstem', 0)
+        if not self.contains(vstem, hstem):
+            return None
+
+        total = None
+        for factor, (deltaLocationTuple, (mathItem, deltaName)) in zip(self.getFactors(vstem, hstem), sorted(mutator.items())):
+            if -_EPSILON < factor < _EPSILON:
+                continue
+            if total is None:
+                total = factor * mathItem
+            else:
+                total += factor * mathItem
+        neutral = mutator.getNeutral()
+        if total is None:
+            total = 0 * neutral
+        return total + neutral
+
+
+if __name__ == '__main__':
+
+    import unittest
+    import random
+    from mutatorMath.objects.mutator import buildMutator
+
+    class MutatorFactorGridTests(unittest.TestCase):
+
+        def setUp(self):
+            self.mutator = buildMutator([
+                (Location(vstem=20, hstem=10), 0.),
+                (Location(vstem=60, hstem=10), 100.),
+                (Location(vstem=20, hstem=30), 40.),
+                (Location(vstem=60, hstem=30), 170.),
+                (Location(vstem=110, hstem=25), 300.),
+            ])[1]
+
+        def test_grid_matches_mutator(self):
+            grid = MutatorFactorGrid(self.mutator, step=7)
+            for i in range(200):
+                location = Location(vstem=random.uniform(0, 220), hstem=random.uniform(0, 60))
+                self.assertAlmostEqual(grid.makeInstance(self.mutator, location), self.mutator.makeInstance(location))
+            for vstem, hstem in [(20, 10), (60, 30), (110, 25), (0, 0), (220, 60)]:
+                location = Location(vstem=vstem, hstem=hstem)
+                self.assertAlmostEqual(grid.makeInstance(self.mutator, location), self.mutator.makeInstance(location))
+
+        def test_grid_lines_and_range(self):
+            grid = MutatorFactorGrid(self.mutator, vstemRange=(10, 100), hstemRange=(0, 40), step=20)
+            self.assertEqual(grid.vstems, [10, 20, 30, 50, 60, 70, 90, 100])
+            self.assertIsNone(grid.makeInstance(self.mutator, Location(vstem=110, hstem=20)))
+            self.assertRaises(ValueError, MutatorFactorGrid, self.mutator, (10, 10))
+
+        def test_key(self):
+            otherMutator = buildMutator([(location, value * 2) for location, value in [
+                (Location(vstem=20, hstem=10), 0.),
+                (Location(vstem=60, hstem=10), 100.),
+                (Location(vstem=20, hstem=30), 40.),
+                (Location(vstem=60, hstem=30), 170.),
+                (Location(vstem=110, hstem=25), 300.),
+            ]])[1]
+            self.assertEqual(MutatorFactorGrid.getKey(self.mutator), MutatorFactorGrid.getKey(otherMutator))
+            grid = MutatorFactorGrid(self.mutator)
+            location = Location(vstem=75, hstem=22)
+            self.assertAlmostEqual(grid.makeInstance(otherMutator, location), otherMutator.makeInstance(location))
+
+    unittest.main()
@@ -1,8 +1,11 @@
 #coding=utf-8
 from __future__ import division
 
+from collections import OrderedDict
+from threading import RLock
+
 from mutatorScale.objects.mathGlyph import MathGlyph
-from mutatorScale.utilities.fontUtils import makeListFontName, getRefStems, getSlantAngle
+from mutatorScale.utilities.fontUtils import makeListFontName, getCachedRefStems, getCachedSlantAngle, getLiveRefStems, supportsRepresentations
 
 from fontTools.pens.boundsPen import BoundsPen
 
@@ -17,13 +20,29 @@ class ScaleFont(object):
     Or:
         smallFont = ScaleFont(font)
         smallFont.setScale((1.05, 490, 'capHeight'))
+
+    Scaled glyphs are MathGlyph instances by default, any MathGlyph subclass can be used instead (ArrayMathGlyph for instance).
+    Scaled glyphs are cached per glyph name and scale, the cache is cleared when the scale changes
+    and entries are dropped when their source glyph posts a change notification (defcon based glyphs only).
+    Changes are also counted per glyph (see .getGlyphChangeCount()), so that data derived from source glyphs can be keyed on their state.
+    The cache is guarded by a lock: glyphs can be scaled on a background thread while change notifications come in on the main thread.
     """
-    def __init__(self, font, scale=None):
+
+    maxCachedGlyphs = 2000
+
+    def __init__(self, font, scale=None, mathGlyphClass=MathGlyph):
+        self.mathGlyphClass = mathGlyphClass
         self.glyphSet = {glyph.name:glyph for glyph in font}
         self.scale = scale
+        self._scaledGlyphsCache = OrderedDict()
+        self._cacheLock = RLock()
+        self._observedGlyphs = set()
+        self._glyphChangeCounts = {}
+        self.cacheHits = 0
+        self.cacheMisses = 0
         self.heights = { heightName:getattr(font.info, heightName) for heightName in ['capHeight','ascender','xHeight','descender'] }
         self.name = makeListFontName(font)
-        self.italicAngle = -getSlantAngle(font, True)
+        self.italicAngle = -getCachedSlantAngle(font, True)
 
         if scale is not None:
             self.setScale(scale)
@@ -62,6 +81,8 @@ class ScaleFont(object):
             – targetHeight should be an int or float;
             – referenceHeight can be either a string or float/int.
         """
+        previousScale = self.scale
+
         if len(scale) == 2:
             self.scale = scale
 
@@ -99,6 +120,9 @@ class ScaleFont(object):
             finally:
                 self.scale = (x * xy, xy)
 
+        if self.scale != previousScale:
+            self.clearCache()
+
     def _getGlyphHeight(self, glyphName):
         box = self._getGlyphBounds(glyphName)
         if box is not None:
@@ -115,13 +139,65 @@ class ScaleFont(object):
     def getGlyph(self, glyphName):
         """Return a scaled glyph as a MathGlyph instance."""
         if glyphName in self.glyphSet:
-            glyph = self.glyphSet[glyphName]
-            scale = self.scale
-            scaledGlyph = self._scaleGlyph(glyph, scale)
-            return scaledGlyph
+            # scaling happens within the lock, a change notification posted meanwhile drops the glyph once it is cached
+            with self._cacheLock:
+                scale = self.scale
+                key = (glyphName, tuple(scale) if scale is not None else None)
+                cache = self._scaledGlyphsCache
+
+                if key in cache:
+                    self.cacheHits += 1
+                    scaledGlyph = cache.pop(key)
+                else:
+                    self.cacheMisses += 1
+                    glyph = self.glyphSet[glyphName]
+                    scaledGlyph = self._scaleGlyph(glyph, scale)
+                    self._observeGlyph(glyph)
+                    if len(cache) >= self.maxCachedGlyphs:
+                        cache.popitem(last=False)
+
+                # most recently used glyphs go last
+                cache[key] = scaledGlyph
+            # callers are free to alter the glyph they get (skewing for instance), hand out a copy
+            return self.mathGlyphClass.fromPointData(scaledGlyph.getPointData())
         else:
             return KeyError
 
+    def clearCache(self, glyphName=None):
+        """Drop cached scaled glyphs, all of them or only those of a given glyph."""
+        with self._cacheLock:
+            if glyphName is None:
+                self._scaledGlyphsCache.clear()
+            else:
+                for key in [key for key in self._scaledGlyphsCache if key[0] == glyphName]:
+                    del self._scaledGlyphsCache[key]
+
+    def getCacheStats(self):
+        return {
+            'hits': self.cacheHits,
+            'misses': self.cacheMisses,
+            'size': len(self._scaledGlyphsCache)
+        }
+
+    def _observeGlyph(self, glyph):
+        """Subscribe to change notifications of a source glyph, if it can post any."""
+        if glyph.name in self._observedGlyphs:
+            return
+        naked = glyph.naked() if hasattr(glyph, 'naked') else glyph
+        if hasattr(naked, 'addObserver'):
+            naked.addObserver(self, '_sourceGlyphChanged', 'Glyph.Changed')
+        self._observedGlyphs.add(glyph.name)
+
+    def getGlyphChangeCount(self, glyphName):
+        """Return how many change notifications a source glyph posted since it was first scaled."""
+        return self._glyphChangeCounts.get(glyphName, 0)
+
+    def _sourceGlyphChanged(self, notification):
+        glyph = notification.object
+        with self._cacheLock:
+            self._glyphChangeCounts[glyph.name] = self.getGlyphChangeCount(glyph.name) + 1
+            self.clearCache(glyph.name)
+
     def extractGlyph(self, glyphName, glyph):
         scaledGlyph = self.getGlyph(glyphName)
         for attribute in ['name','unicodes','width']:
@@ -134,7 +210,7 @@ class ScaleFont(object):
         Return a glyph scaled according to the font’s scale settings,
         if glyph has components, reset scaling on each component but keep scaled offset coordinates.
         """
-        glyph = MathGlyph(glyph)
+        glyph = self.mathGlyphClass(glyph)
         italicAngle = self.italicAngle
         # Skew to an upright position to prevent the slant angle from changing because of scaling
         if italicAngle:
@@ -155,11 +231,19 @@ class ScaleFont(object):
         return glyph
 
 class MutatorScaleFont(ScaleFont):
-    """ Subclass extending a ScaleFont and adding reference stem values to be used inside a MutatorScaleEngine."""
+    """
+    Subclass extending a ScaleFont and adding reference stem values to be used inside a MutatorScaleEngine.
+
+    If no stem values are provided, they are measured on the I and H glyphs.
+    With defcon based glyphs, measurements are glyph representations:
+    current stems are read at almost no cost and follow changes made to the I and H glyphs,
+    until stem values are set explicitly.
+    """
 
-    def __init__(self, font, scale=(1, 1), vstem=None, hstem=None, stemsWithSlantedSection=False):
-        super(MutatorScaleFont, self).__init__(font, scale)
+    def __init__(self, font, scale=(1, 1), vstem=None, hstem=None, stemsWithSlantedSection=False, mathGlyphClass=MathGlyph):
+        super(MutatorScaleFont, self).__init__(font, scale, mathGlyphClass)
         self._refVstem, self._refHstem = None, None
+        self._liveStems = False
         self.stemsWithSlantedSection = stemsWithSlantedSection
         self.processDimensions(font, vstem, hstem)
 
@@ -167,8 +251,13 @@ class MutatorScaleFont(ScaleFont):
         return '<{className} {fontName} v:{vstem} h:{hstem}>'.format(className=self.__class__.__name__, fontName=self.name, vstem=self._refVstem, hstem=self._refHstem)
 
     def processDimensions(self, font, vstem, hstem):
+        self._liveStems = False
         if vstem is None and hstem is None:
-            refVstem, refHstem = getRefStems(font, self.stemsWithSlantedSection)
+            if supportsRepresentations(font):
+                self._liveStems = True
+                refVstem, refHstem = getLiveRefStems(self.glyphSet, self.stemsWithSlantedSection)
+            else:
+                refVstem, refHstem = getCachedRefStems(font, self.stemsWithSlantedSection)
             self._refVstem, self._refHstem = refVstem, refHstem
         elif hstem is None:
             self._refVstem = vstem
@@ -186,18 +275,32 @@ class MutatorScaleFont(ScaleFont):
         self.vstem = vstem
         self.hstem = hstem
 
+    def _updateLiveStems(self):
+        """Read current measured stems, if they are live."""
+        if self._liveStems:
+            self._refVstem, self._refHstem = getLiveRefStems(self.glyphSet, self.stemsWithSlantedSection)
+
+    def _freezeStems(self):
+        """Stop following measured stems, values set explicitly take over."""
+        self._updateLiveStems()
+        self._liveStems = False
+
     @property
     def vstem(self):
+        self._updateLiveStems()
         return self._refVstem
     @vstem.setter
     def vstem(self, stem):
+        self._freezeStems()
         self._refVstem = stem
 
     @property
     def hstem(self):
+        self._updateLiveStems()
         return self._refHstem
     @hstem.setter
     def hstem(self, stem):
+        self._freezeStems()
         self._refHstem = stem
 
 if __name__ == '__main__':
@@ -215,6 +318,8 @@ if __name__ == '__main__':
             singleFontPath = u'testFonts/two-axes/regular-low-contrast.ufo'
             fontPath = os.path.join(libFolder, singleFontPath)
             font = Font(fontPath)
+            # glyphs only post notifications while their font is around
+            self.font = font
             self.smallFont = ScaleFont(font, (0.5, 0.4))
             self.stemedSmallFont = MutatorScaleFont(font, (0.5, 0.4))
             self.stemedSmallFont = MutatorScaleFont(font, (0.5, 0.4), stemsWithSlantedSection=True)
@@ -261,6 +366,28 @@ if __name__ == '__main__':
                     testFont.extractGlyph(glyphName, scaledGlyph)
                     self.assertIsInstance(scaledGlyph, RGlyph)
 
+        def test_scaled_glyphs_are_cached(self):
+            """Test that scaled glyphs are cached and the cache is cleared on scale change."""
+            testFont = self.smallFont
+            testFont.getGlyph('H')
+            misses = testFont.cacheMisses
+            scaledGlyph = testFont.getGlyph('H')
+            scaledGlyph.skewX(10)
+            self.assertEqual(testFont.cacheMisses, misses)
+            self.assertEqual(testFont.getGlyph('H').contours, testFont._scaledGlyphsCache.values()[-1].contours)
+            testFont.setScale((0.85, 0.79))
+            self.assertEqual(testFont.getCacheStats()['size'], 0)
+
+        def test_cache_follows_source_glyph_changes(self):
+            """Test that a change notification drops cached versions of a glyph and is counted."""
+            testFont = self.smallFont
+            width = testFont.getGlyph('H').width
+            self.assertEqual(testFont.getGlyphChangeCount('H'), 0)
+            testFont.glyphSet['H'].width += 100
+            self.assertTrue(testFont.getGlyphChangeCount('H') > 0)
+            self.assertEqual(testFont.getCacheStats()['size'], 0)
+            self.assertEqual(testFont.getGlyph('H').width, width + 50)
+
         def test_set_stems(self):
             """Test setting stems on a MutatorScaleFont."""
             self.stemedSmallFont.setStems((100, 40))
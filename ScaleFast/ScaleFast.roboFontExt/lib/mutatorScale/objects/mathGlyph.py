@@ -274,7 +274,7 @@ class MathGlyph(object):
 
     def copy(self):
         """return a new MathGlyph containing all data in self"""
-        return MathGlyph(self)
+        return self.__class__(self)
 
     def copyWithoutIterables(self):
         """
@@ -285,7 +285,7 @@ class MathGlyph(object):
 
         this is used mainly for internal glyph math.
         """
-        n = MathGlyph(None)
+        n = self.__class__(None)
         n.generationCount = self.generationCount + 1
         #
         n.name = self.name
@@ -297,6 +297,36 @@ class MathGlyph(object):
             n.lib[k] = v
         return n
 
+    def getPointData(self):
+        """
+        return a plain, picklable representation of self,
+        made of builtin types only so that it can be sent across processes.
+        """
+        return {
+            'name': self.name,
+            'unicodes': self.unicodes,
+            'width': self.width,
+            'note': self.note,
+            'lib': dict(self.lib),
+            'contours': [list(contour) for contour in self.contours],
+            'components': list(self.components),
+            'anchors': list(self.anchors),
+        }
+
+    @classmethod
+    def fromPointData(cls, data):
+        """return a new MathGlyph built from data returned by getPointData()"""
+        n = cls(None)
+        n.name = data['name']
+        n.unicodes = data['unicodes']
+        n.width = data['width']
+        n.note = data['note']
+        n.lib = dict(data['lib'])
+        n.contours = [list(contour) for contour in data['contours']]
+        n.components = list(data['components'])
+        n.anchors = list(data['anchors'])
+        return n
+
     def _anchorCompare(self, other):
         # gather compatible anchors
         #
@@ -371,16 +401,7 @@ class MathGlyph(object):
         # used by: __add__, __sub__
         #
         # contours
-        copiedGlyph.contours = []
-        if len(self.contours) > 0:
-            for contourIndex in range(len(self.contours)):
-                copiedGlyph.contours.append([])
-                selfContour = self.contours[contourIndex]
-                otherContour = otherGlyph.contours[contourIndex]
-                for pointIndex in range(len(selfContour)):
-                    segType, pt, smooth, name = selfContour[pointIndex]
-                    newX, newY = funct(selfContour[pointIndex][1], otherContour[pointIndex][1])
-                    copiedGlyph.contours[-1].append((segType, (newX, newY), smooth, name))
+        self._processContoursMathOne(copiedGlyph, otherGlyph, funct)
         # anchors
         copiedGlyph.anchors = []
         if len(self.anchors) > 0:
@@ -416,13 +437,7 @@ class MathGlyph(object):
         # used by: __mul__, __div__
         #
         # contours
-        copiedGlyph.contours = []
-        if len(self.contours) > 0:
-            for selfContour in self.contours:
-                copiedGlyph.contours.append([])
-                for segType, pt, smooth, name in selfContour:
-                    newX, newY = funct(pt, factor)
-                    copiedGlyph.contours[-1].append((segType, (newX, newY), smooth, name))
+        self._processContoursMathTwo(copiedGlyph, factor, funct)
         # anchors
         copiedGlyph.anchors = []
         if len(self.anchors) > 0:
@@ -439,8 +454,29 @@ class MathGlyph(object):
                 newXYScale, newYXScale = funct((xyScale, yxScale), factor)
                 copiedGlyph.components.append((baseName, (newXScale, newXYScale, newYXScale, newYScale, newXOffset, newYOffset)))
 
+    def _processContoursMathOne(self, copiedGlyph, otherGlyph, funct):
+        copiedGlyph.contours = []
+        if len(self.contours) > 0:
+            for contourIndex in range(len(self.contours)):
+                copiedGlyph.contours.append([])
+                selfContour = self.contours[contourIndex]
+                otherContour = otherGlyph.contours[contourIndex]
+                for pointIndex in range(len(selfContour)):
+                    segType, pt, smooth, name = selfContour[pointIndex]
+                    newX, newY = funct(selfContour[pointIndex][1], otherContour[pointIndex][1])
+                    copiedGlyph.contours[-1].append((segType, (newX, newY), smooth, name))
+
+    def _processContoursMathTwo(self, copiedGlyph, factor, funct):
+        copiedGlyph.contours = []
+        if len(self.contours) > 0:
+            for selfContour in self.contours:
+                copiedGlyph.contours.append([])
+                for segType, pt, smooth, name in selfContour:
+                    newX, newY = funct(pt, factor)
+                    copiedGlyph.contours[-1].append((segType, (newX, newY), smooth, name))
+
     def __repr__(self):
-        return "<MathGlyph %s>" % self.name
+        return "<%s %s>" % (self.__class__.__name__, self.name)
 
     def __cmp__(self, other):
         flag = False
@@ -567,15 +603,11 @@ class MathGlyph(object):
     def skewX(self, a):
         a = radians(a)
 
-        contours = self.contours
+        self._skewContoursX(a)
+
         anchors = self.anchors
         components = self.components
 
-        for contour in contours:
-            for i, (segment, (x, y), smooth, name) in enumerate(contour):
-                x = self._skewXByAngle(x, y, a)
-                contour[i] = (segment, (x, y), smooth, name)
-
         for j, (baseGlyph, matrix) in enumerate(components):
             xx, yx, xy, yy, x, y = matrix
             x = self._skewXByAngle(x, y, a)
@@ -585,9 +617,18 @@ class MathGlyph(object):
             x = self._skewXByAngle(x, y, a)
             anchors[k] = ((x, y), name)
 
-        self.contours = contours
         self.anchors = anchors
         self.components = components
 
+    def _skewContoursX(self, a):
+        contours = self.contours
+
+        for contour in contours:
+            for i, (segment, (x, y), smooth, name) in enumerate(contour):
+                x = self._skewXByAngle(x, y, a)
+                contour[i] = (segment, (x, y), smooth, name)
+
+        self.contours = contours
+
     def _skewXByAngle(self, x, y, angle):
         return x + (y * tan(angle))
\ No newline at end of file
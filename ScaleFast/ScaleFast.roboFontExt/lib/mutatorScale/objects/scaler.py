@@ -1,14 +1,61 @@
 #coding=utf-8
 from __future__ import division
 
+from multiprocessing import Pool, cpu_count
+from threading import RLock
+from functools import wraps
+from timeit import default_timer
+
 from robofab.world import RGlyph
 from mutatorMath.objects.location import Location
 from mutatorMath.objects.mutator import buildMutator
 
 from mutatorScale.objects.fonts import MutatorScaleFont
+from mutatorScale.objects.mathGlyph import MathGlyph
 from mutatorScale.objects.errorGlyph import ErrorGlyph
-from mutatorScale.utilities.fontUtils import makeListFontName, joinFontName
+from mutatorScale.objects.factorGrid import MutatorFactorGrid
+from mutatorScale.utilities.fontUtils import makeListFontName, joinFontName, getComponentGraph
 from mutatorScale.utilities.numbersUtils import mapValue
+from mutatorScale.utilities.profiler import StageProfiler, noTimer
+
+def synchronized(method):
+    """Run a MutatorScaleEngine method while holding the engine’s lock."""
+    @wraps(method)
+    def synchronizedMethod(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return synchronizedMethod
+
+
+def _interpolateGlyphData((mastersData, locations, mathGlyphClass)):
+    """
+    Build a mutator from plain master point data and return the point data of an instance for each location.
+    Defined at module level so that it can be sent to worker processes,
+    returns a list of (instanceData, errorMessage) tuples, one per location,
+    along with the time spent in buildMutator and makeInstance, for profiling.
+    """
+    results = []
+    timings = {'buildMutator': 0, 'makeInstance': 0}
+    start = default_timer()
+    try:
+        masters = [(Location(**location), mathGlyphClass.fromPointData(glyphData)) for location, glyphData in mastersData]
+        b, m = buildMutator(masters)
+        timings['buildMutator'] = default_timer() - start
+        if m is None:
+            return [(None, 'No mutator could be built.') for location in locations], timings
+    except Exception as e:
+        return [(None, e.message) for location in locations], timings
+
+    for location in locations:
+        start = default_timer()
+        try:
+            instance = m.makeInstance(Location(**location))
+            results.append((instance.getPointData(), None))
+        except Exception as e:
+            results.append((None, e.message))
+        timings['makeInstance'] += default_timer() - start
+    return results, timings
+
 
 class MutatorScaleEngine:
     """
@@ -42,19 +89,46 @@ class MutatorScaleEngine:
         'scale': (1.03, 0.85)
         })
     >>> scaler.getScaledGlyph('a', ())
+
+    Settings and scaling methods are synchronized, so that glyphs can be scaled on a background thread
+    while parameters are changed on another one.
+
+    Master glyphs are MathGlyph objects by default, pass mathGlyphClass=ArrayMathGlyph
+    (mutatorScale.objects.arrayMathGlyph, requires numpy) to interpolate on numpy coordinate arrays.
+
+    Time spent in each scaling stage (master scaling, skewing, buildMutator, makeInstance, extractGlyph, rounding)
+    can be recorded, overall and per glyph:
+
+    >>> scaler.enableProfiling()
+    >>> scaler.getScaledGlyphs(glyphNames, (80, 60))
+    >>> print scaler.getProfilingSummary()
+
+    With two axes (vstem & hstem), mutator factors can be precomputed on a grid of stem values,
+    instances are then a weighted sum of master glyphs, without solving a mutator for each stem target.
+    Grids are built once per set of master locations and shared by all glyphs,
+    stem targets outside of the grid fall back to regular interpolation (see MutatorFactorGrid):
+
+    >>> scaler.enableFactorGrid(step=5, vstemRange=(0, 200), hstemRange=(0, 100))
+    >>> scaler.getScaledGlyph('a', (80, 60))
     """
 
     errorGlyph = ErrorGlyph()
 
-    def __init__(self, masterFonts=[], stemsWithSlantedSection=False):
+    def __init__(self, masterFonts=[], stemsWithSlantedSection=False, mathGlyphClass=MathGlyph):
         self.masters = {}
+        self._lock = RLock()
+        self.mathGlyphClass = mathGlyphClass
         self._currentScale = None
         self._workingStems = None
         self.stemsWithSlantedSection = stemsWithSlantedSection
         self._availableGlyphs = []
+        self._mutatorCache = {}
+        self._factorGridSettings = None
+        self._factorGrids = {}
+        self.mutatorErrors = []
+        self.profiler = None
         for font in masterFonts:
             self.addMaster(font)
-        self.mutatorErrors = []
 
     def __repr__(self):
         return 'MutatorScaleEngine w/ {0} masters\n- {1}\n'.format(len(self.masters), '\n- '.join([repr(master) for master in self.masters.values()]))
@@ -100,6 +174,20 @@ class MutatorScaleEngine:
         """Checking for glyph availability in all masters."""
         return glyphName in self._availableGlyphs
 
+    @synchronized
+    def getComponentGraph(self, glyphNames):
+        """
+        Return the component dependency graph ({glyphName: [baseGlyphNames]}) of glyphNames,
+        covering glyphs found in any master, as they can be interpolated from the masters that have them.
+        Components of a glyph are read from the first master that has it.
+        """
+        glyphSet = {}
+        for master in self.masters.values():
+            for glyphName in master.keys():
+                if glyphName not in glyphSet:
+                    glyphSet[glyphName] = master.glyphSet[glyphName]
+        return getComponentGraph(glyphSet, glyphNames)
+
     def getReferenceGlyphNames(self):
         """Returning a list of glyphNames for valid reference glyphs,
         i.e., glyphs that are not empty so they can serve as height reference.
@@ -109,6 +197,7 @@ class MutatorScaleEngine:
         validGlyphs_names = reduce(lambda a, b: list(set(a) & set(b)), [[glyphName for glyphName in glyphNames if len(master.glyphSet[glyphName])] for master in masters])
         return validGlyphs_names
 
+    @synchronized
     def set(self, scalingParameters):
         """Define scaling parameters.
 
@@ -136,9 +225,12 @@ class MutatorScaleEngine:
             master.setScale(scale)
 
         self._currentScale = scale
+        self.clearMutatorCache()
 
+    @synchronized
     def update(self):
         self._determineWorkingStems()
+        self.clearMutatorCache()
 
     def _parseStemsInput(self, stems):
         if stems is None:
@@ -152,9 +244,10 @@ class MutatorScaleEngine:
     def _makeMaster(self, font, vstem, hstem):
         """Return a MutatorScaleFont."""
         name = makeListFontName(font)
-        master = MutatorScaleFont(font, vstem=vstem, hstem=hstem, stemsWithSlantedSection=self.stemsWithSlantedSection)
+        master = MutatorScaleFont(font, vstem=vstem, hstem=hstem, stemsWithSlantedSection=self.stemsWithSlantedSection, mathGlyphClass=self.mathGlyphClass)
         return name, master
 
+    @synchronized
     def addMaster(self, font, stems=None):
         """Add a MutatorScaleFont to masters."""
 
@@ -175,6 +268,7 @@ class MutatorScaleEngine:
         self.masters[name] = master
         self.update()
 
+    @synchronized
     def removeMaster(self, font):
         """Remove a MutatorScaleFont from masters."""
         name = makeListFontName(font)
@@ -182,13 +276,11 @@ class MutatorScaleEngine:
             self.masters.pop(name, 0)
         self.update()
 
+    @synchronized
     def getScaledGlyph(self, glyphName, stemTarget, slantCorrection=True, attributes=None):
         """Return an interpolated & scaled glyph according to set parameters and given masters."""
         masters = self.masters.values()
         workingStems = self._workingStems
-        mutatorMasters = []
-        yScales = []
-        angles = []
 
         """
         Gather master glyphs for interpolation:
@@ -196,93 +288,258 @@ class MutatorScaleEngine:
         it is then inserted in a mutator design space with scaled down stem values.
         Asking for the initial stem values of a scaled down glyphName
         will result in an scaled glyph which will retain specified stem widths.
+        The resulting mutator is cached so that other stem targets for the same glyph can reuse it.
         """
 
         if len(masters) > 1 and workingStems is not None:
 
-            medianYscale = 1
-            medianAngle = 0
+            mutatorData = self._getMutatorData(glyphName, slantCorrection)
+            mutator = mutatorData['mutator']
+            mutatorMasters = mutatorData['masters']
+            medianAngle = mutatorData['medianAngle']
+            xScale, medianYscale = mutatorData['scale']
 
-            for master in masters:
+            targetLocation = self._getTargetLocation(stemTarget, masters, workingStems, (xScale, medianYscale))
+            instanceGlyph = self._getInstanceGlyph(targetLocation, mutator, glyphName)
 
-                xScale, yScale = master.getScale()
-                vstem, hstem = master.getStems()
-                yScales.append(yScale)
+            return self._finalizeInstanceGlyph(instanceGlyph, glyphName, mutatorMasters, medianAngle, slantCorrection, attributes)
+        return ErrorGlyph('None')
 
-                if glyphName in master and vstem is not None and hstem is not None:
-                    masterGlyph = master[glyphName]
+    @synchronized
+    def getScaledGlyphs(self, glyphNames, stemTargets, slantCorrection=True, attributes=None, workers=1):
+        """
+        Return a list of interpolated & scaled glyphs, in the order of glyphNames.
 
-                    if workingStems == 'both':
-                        axis = {
-                            'vstem': vstem * xScale,
-                            'hstem': hstem * yScale
-                            }
-                    else:
-                        if workingStems == 'vstem':
-                            stem = vstem
-                        elif workingStems == 'hstem':
-                            stem = hstem
-
-                        if slantCorrection == True:
-                            # if interpolation is an/isotropic
-                            # skew master glyphs to upright angle to minimize deformations
-                            angle = master.italicAngle
-
-                            if angle:
-                                masterGlyph.skewX(angle)
-                                angles.append(angle)
+        stemTargets can either be a single stem target, as for .getScaledGlyph(),
+        in which case a flat list of glyphs is returned,
+        or a list of stem targets, in which case each item of the returned list is a list of glyphs, one per stem target.
 
-                        axis = { 'stem': stem * xScale }
+        Master glyphs are gathered once and converted to plain point data,
+        with more than one worker (None for the number of cpus), interpolation is then spread across a pool of processes.
+        Don’t use a pool within RoboFont, forking a running application isn’t safe; it is meant for headless scripts.
+        A glyph that fails to interpolate is returned as an ErrorGlyph and reported in .getMutatorReport().
+        """
+        masters = self.masters.values()
+        workingStems = self._workingStems
+        multipleTargets = isinstance(stemTargets, list)
+        if not multipleTargets:
+            stemTargets = [stemTargets]
+
+        if len(masters) < 2 or workingStems is None:
+            scaledGlyphs = [[ErrorGlyph('None') for stemTarget in stemTargets] for glyphName in glyphNames]
+            return scaledGlyphs if multipleTargets else [targetGlyphs[0] for targetGlyphs in scaledGlyphs]
+
+        jobs = []
+        jobsData = []
+
+        for glyphName in glyphNames:
+            mutatorMasters, medianAngle, (xScale, medianYscale) = self._getMutatorMasters(glyphName, slantCorrection)
+            locations = [dict(self._getTargetLocation(stemTarget, masters, workingStems, (xScale, medianYscale))) for stemTarget in stemTargets]
+            mastersData = [(dict(location), masterGlyph.getPointData()) for location, masterGlyph in mutatorMasters]
+            jobs.append((mastersData, locations, self.mathGlyphClass))
+            jobsData.append((glyphName, mutatorMasters, medianAngle))
+
+        if workers is None:
+            workers = cpu_count()
+
+        with self._measure('process pool'):
+            if workers > 1 and len(jobs) > 1:
+                pool = Pool(min(workers, len(jobs)))
+                try:
+                    results = pool.map(_interpolateGlyphData, jobs)
+                finally:
+                    pool.close()
+                    pool.join()
+            else:
+                results = map(_interpolateGlyphData, jobs)
+
+        scaledGlyphs = []
+
+        for (glyphName, mutatorMasters, medianAngle), (instances, timings) in zip(jobsData, results):
+            if self.profiler is not None:
+                # stages run by workers are timed there, time spent in the pool is reported apart
+                self.profiler.add('buildMutator', timings['buildMutator'], glyphName)
+                self.profiler.add('makeInstance', timings['makeInstance'], glyphName, len(instances))
+            glyphs = []
+            for instanceData, errorMessage in instances:
+                if instanceData is not None:
+                    with self._measure('extractGlyph', glyphName):
+                        instanceGlyph = self.mathGlyphClass.fromPointData(instanceData).extractGlyph(RGlyph())
+                else:
+                    self.mutatorErrors.append({'error':errorMessage})
+                    instanceGlyph = ErrorGlyph('Interpolation', errorMessage)
+                glyphs.append(self._finalizeInstanceGlyph(instanceGlyph, glyphName, mutatorMasters, medianAngle, slantCorrection, attributes))
+            scaledGlyphs.append(glyphs)
+
+        return scaledGlyphs if multipleTargets else [targetGlyphs[0] for targetGlyphs in scaledGlyphs]
+
+    def _finalizeInstanceGlyph(self, instanceGlyph, glyphName, mutatorMasters, medianAngle, slantCorrection=True, attributes=None):
+        """Report errors, revert slant correction, round and set attributes on an interpolated glyph."""
+        if instanceGlyph.name == '_error_':
+            if self.hasGlyph(glyphName):
+                instanceGlyph.unicodes = self.masters.values()[0][glyphName].unicodes
+            self.mutatorErrors[-1]['glyph'] = glyphName
+            self.mutatorErrors[-1]['masters'] = mutatorMasters
+
+        if medianAngle and slantCorrection == True:
+            # if masters were skewed to upright position
+            # skew instance back to probable slant angle
+            with self._measure('skewing', glyphName):
+                instanceGlyph.skew(-medianAngle)
 
-                    mutatorMasters.append((Location(**axis), masterGlyph))
+        with self._measure('rounding', glyphName):
+            instanceGlyph.round()
 
-            if len(angles) and slantCorrection == True:
-                # calculate a median slant angle
-                # in case there are variations among masters
-                # shouldn’t happen, most of the time
-                medianAngle = sum(angles) / len(angles)
+        if attributes is not None:
+            for attributeName in attributes:
+                value = attributes[attributeName]
+                setattr(instanceGlyph, attributeName, value)
 
-            medianYscale = sum(yScales) / len(yScales)
+        return instanceGlyph
 
+    def _getMutatorData(self, glyphName, slantCorrection=True):
+        """
+        Return cached mutator data for a glyph, building it if need be.
+        The cache key covers everything a mutator depends on, so that it is safe to reuse it for any stem target,
+        source glyphs included: an edited master glyph (defcon based fonts) changes the key.
+        """
+        key = self._getMutatorCacheKey(glyphName, slantCorrection)
+        if key in self._mutatorCache:
+            return self._mutatorCache[key]
 
-            targetLocation = self._getTargetLocation(stemTarget, masters, workingStems, (xScale, medianYscale))
-            instanceGlyph = self._getInstanceGlyph(targetLocation, mutatorMasters)
+        mutatorMasters, medianAngle, scale = self._getMutatorMasters(glyphName, slantCorrection)
 
-            if instanceGlyph.name == '_error_':
-                if self.hasGlyph(glyphName):
-                    instanceGlyph.unicodes = masters[0][glyphName].unicodes
-                self.mutatorErrors[-1]['glyph'] = glyphName
-                self.mutatorErrors[-1]['masters'] = mutatorMasters
+        mutatorData = {
+            'mutator': self._getMutator(mutatorMasters, glyphName),
+            'masters': mutatorMasters,
+            'medianAngle': medianAngle,
+            'scale': scale
+        }
 
-            if medianAngle and slantCorrection == True:
-                # if masters were skewed to upright position
-                # skew instance back to probable slant angle
-                instanceGlyph.skew(-medianAngle)
+        # failed mutators are not cached, their error has to be reported on each request
+        if mutatorData['mutator'] is not None:
+            self._mutatorCache[key] = mutatorData
 
-            instanceGlyph.round()
+        return mutatorData
+
+    def _getMutatorMasters(self, glyphName, slantCorrection=True):
+        """
+        Return scaled master glyphs placed in a design space of scaled down stem values,
+        along with the median slant angle and (x, median y) scale of the masters.
+        """
+        masters = self.masters.values()
+        workingStems = self._workingStems
+        mutatorMasters = []
+        yScales = []
+        angles = []
+        medianAngle = 0
 
-            if attributes is not None:
-                for attributeName in attributes:
-                    value = attributes[attributeName]
-                    setattr(instanceGlyph, attributeName, value)
+        for master in masters:
 
-            return instanceGlyph
-        return ErrorGlyph('None')
+            xScale, yScale = master.getScale()
+            vstem, hstem = master.getStems()
+            yScales.append(yScale)
+
+            if glyphName in master and vstem is not None and hstem is not None:
+                with self._measure('master scaling', glyphName):
+                    masterGlyph = master[glyphName]
+
+                if workingStems == 'both':
+                    axis = {
+                        'vstem': vstem * xScale,
+                        'hstem': hstem * yScale
+                        }
+                else:
+                    if workingStems == 'vstem':
+                        stem = vstem
+                    elif workingStems == 'hstem':
+                        stem = hstem
+
+                    if slantCorrection == True:
+                        # if interpolation is an/isotropic
+                        # skew master glyphs to upright angle to minimize deformations
+                        angle = master.italicAngle
+
+                        if angle:
+                            with self._measure('skewing', glyphName):
+                                masterGlyph.skewX(angle)
+                            angles.append(angle)
+
+                    axis = { 'stem': stem * xScale }
+
+                mutatorMasters.append((Location(**axis), masterGlyph))
+
+        if len(angles) and slantCorrection == True:
+            # calculate a median slant angle
+            # in case there are variations among masters
+            # shouldn’t happen, most of the time
+            medianAngle = sum(angles) / len(angles)
+
+        medianYscale = sum(yScales) / len(yScales)
+
+        return mutatorMasters, medianAngle, (xScale, medianYscale)
+
+    def _getMutatorCacheKey(self, glyphName, slantCorrection):
+        masterSet = tuple(sorted([(name, master.vstem, master.hstem, master.getGlyphChangeCount(glyphName)) for name, master in self.masters.items()]))
+        return glyphName, self._currentScale, self._workingStems, slantCorrection, masterSet
+
+    def clearMutatorCache(self):
+        self._mutatorCache = {}
+        self._factorGrids = {}
+
+    @synchronized
+    def enableFactorGrid(self, enabled=True, step=5, vstemRange=None, hstemRange=None):
+        """
+        Precompute mutator factors on a grid of stem values for two axes interpolation, or stop doing so if enabled is False.
+        Stem ranges are expressed as stem targets, they default to 0 to twice the highest (scaled) master stem.
+        """
+        if enabled == True:
+            self._factorGridSettings = {'step': step, 'vstemRange': vstemRange, 'hstemRange': hstemRange}
+        else:
+            self._factorGridSettings = None
+        self._factorGrids = {}
 
-    def _getInstanceGlyph(self, location, masters):
-        I = self._getInstance(location, masters)
+    def _getFactorGrid(self, mutator, glyphName=None):
+        if self._factorGridSettings is None or self._workingStems != 'both':
+            return None
+        key = MutatorFactorGrid.getKey(mutator)
+        if key not in self._factorGrids:
+            with self._measure('buildFactorGrid', glyphName):
+                self._factorGrids[key] = MutatorFactorGrid(mutator, **self._factorGridSettings)
+        return self._factorGrids[key]
+
+    def _getInstanceGlyph(self, location, mutator, glyphName=None):
+        I = self._getInstance(location, mutator, glyphName)
         if I is not None:
-            return I.extractGlyph(RGlyph())
+            with self._measure('extractGlyph', glyphName):
+                return I.extractGlyph(RGlyph())
         else:
             errorMessage = self.mutatorErrors[-1]['error']
             return ErrorGlyph('Interpolation', errorMessage)
 
-    def _getInstance(self, location, masters):
+    def _getMutator(self, masters, glyphName=None):
         try:
-            b, m = buildMutator(masters)
+            with self._measure('buildMutator', glyphName):
+                b, m = buildMutator(masters)
             if m is not None:
-                instance = m.makeInstance(location)
-                return instance
+                return m
+            self.mutatorErrors.append({'error':'No mutator could be built.'})
+        except Exception as e:
+            self.mutatorErrors.append({'error':e.message})
+        return None
+
+    def _getInstance(self, location, mutator, glyphName=None):
+        if mutator is None:
+            return None
+        try:
+            factorGrid = self._getFactorGrid(mutator, glyphName)
+            with self._measure('makeInstance', glyphName):
+                instance = None
+                if factorGrid is not None:
+                    instance = factorGrid.makeInstance(mutator, location)
+                if instance is None:
+                    instance = mutator.makeInstance(location)
+            return instance
         except Exception as e:
             self.mutatorErrors.append({'error':e.message})
             return None
@@ -415,6 +672,24 @@ class MutatorScaleEngine:
     def getMutatorReport(self):
         return self.mutatorErrors
 
+    def enableProfiling(self, enabled=True):
+        """Start recording time spent in each scaling stage, anew, or stop recording if enabled is False."""
+        self.profiler = StageProfiler() if enabled == True else None
+
+    def getProfilingReport(self):
+        """Return timings recorded since profiling was enabled (see StageProfiler.getReport()), None if profiling is off."""
+        if self.profiler is not None:
+            return self.profiler.getReport()
+
+    def getProfilingSummary(self, glyphCount=10):
+        if self.profiler is not None:
+            return self.profiler.getSummary(glyphCount)
+
+    def _measure(self, stage, glyphName=None):
+        if self.profiler is None:
+            return noTimer
+        return self.profiler.measure(stage, glyphName)
+
 
 if __name__ == '__main__':
 
@@ -430,6 +705,7 @@ if __name__ == '__main__':
             libFolder = os.path.join(libFolder, 'testFonts/')
             self.scalers = []
             self.loadedFonts = []
+            self.masterFonts = []
             self.glyphNames = ['H','I']
             for fontsFolder in ['two-axes','isotropic-anisotropic']:
                 fonts = []
@@ -442,6 +718,7 @@ if __name__ == '__main__':
                         self.loadedFonts.append(font)
                 scaler = MutatorScaleEngine(fonts)
                 self.scalers.append(scaler)
+                self.masterFonts.append(fonts)
 
         def test_if_scalingEngine_has_glyph(self):
             """Checking if glyph is present among all scaling masters."""
@@ -483,6 +760,58 @@ if __name__ == '__main__':
                     for glyphName in self.glyphNames:
                         scaler.getScaledGlyph(glyphName, (100, 40))
 
+        def test_mutator_cache_is_reused_and_invalidated(self):
+            """Test that a mutator is built once per glyph and dropped when scale changes."""
+            for scaler in self.scalers:
+                scaler.set({'scale':(0.5, 0.4)})
+                scaler.getScaledGlyph('H', (100, 40))
+                cacheLength = len(scaler._mutatorCache)
+                scaler.getScaledGlyph('H', (80, 30))
+                self.assertEqual(len(scaler._mutatorCache), cacheLength)
+                scaler.set({'scale':(0.6, 0.4)})
+                self.assertEqual(len(scaler._mutatorCache), 0)
+
+        def test_mutator_cache_follows_master_glyph_changes(self):
+            """Test that editing a master glyph (not a stem reference glyph) shows in glyphs scaled from a cached mutator."""
+            for scaler, fonts in zip(self.scalers, self.masterFonts):
+                scaler.set({'scale':(0.5, 0.4)})
+                glyph = scaler.getScaledGlyph('O', (80, 30))
+                for font in fonts:
+                    font['O'].move((100, 0))
+                editedGlyph = scaler.getScaledGlyph('O', (80, 30))
+                self.assertEqual([c.points[-1].x for c in editedGlyph], [c.points[-1].x + 50 for c in glyph])
+
+        def test_factor_grid_matches_interpolation(self):
+            """Test that glyphs interpolated from a factor grid match regular interpolation."""
+            for scaler in self.scalers:
+                scaler.set({'scale':(0.5, 0.4)})
+                for stemTarget in [(100, 40), (73.5, 21.2), (1000, 40)]:
+                    scaler.enableFactorGrid(False)
+                    glyph = scaler.getScaledGlyph('H', stemTarget)
+                    scaler.enableFactorGrid(step=10)
+                    gridGlyph = scaler.getScaledGlyph('H', stemTarget)
+                    self.assertEqual([c.points[-1].x for c in gridGlyph], [c.points[-1].x for c in glyph])
+
+        def test_batch_scaling_matches_single_scaling(self):
+            """Test that batch scaling returns the same glyphs, in order, as single glyph scaling."""
+            for scaler in self.scalers:
+                scaler.set({'scale':(0.5, 0.4)})
+                batchGlyphs = scaler.getScaledGlyphs(self.glyphNames, (100, 40), workers=2)
+                for glyphName, batchGlyph in zip(self.glyphNames, batchGlyphs):
+                    singleGlyph = scaler.getScaledGlyph(glyphName, (100, 40))
+                    self.assertEqual(batchGlyph.name, glyphName)
+                    self.assertEqual([c.points[-1].x for c in batchGlyph], [c.points[-1].x for c in singleGlyph])
+                multipleTargets = scaler.getScaledGlyphs(self.glyphNames, [(100, 40), (80, 30)], workers=1)
+                self.assertEqual([len(glyphs) for glyphs in multipleTargets], [2] * len(self.glyphNames))
+
+        def test_component_graph_covers_glyphs_missing_from_a_master(self):
+            fonts = self.masterFonts[0]
+            composite = fonts[0].newGlyph('H.alt')
+            composite.getPointPen().addComponent('H', (1, 0, 0, 1, 0, 0))
+            scaler = MutatorScaleEngine(fonts)
+            self.assertFalse(scaler.hasGlyph('H.alt'))
+            self.assertEqual(scaler.getComponentGraph(['H.alt', 'missing']), {'H.alt': ['H'], 'H': []})
+
         def test_adding_master(self):
             libFolder = os.path.dirname(os.path.dirname((os.path.dirname(os.path.abspath(__file__)))))
             libFolder = os.path.join(libFolder, 'testFonts/')
@@ -516,4 +845,19 @@ if __name__ == '__main__':
             g = scaler.getScaledGlyph('A', 45)
             self.assertNotEqual(g.name, '_error_')
 
+        def test_profiling(self):
+            for scaler in self.scalers:
+                self.assertIsNone(scaler.getProfilingReport())
+                scaler.enableProfiling()
+                scaler.set({ 'scale':(0.5, 0.4) })
+                scaler.getScaledGlyph('A', (100, 40))
+                scaler.getScaledGlyphs(['H', 'O'], (100, 40), workers=1)
+                report = scaler.getProfilingReport()
+                for stage in ['master scaling', 'buildMutator', 'makeInstance', 'extractGlyph', 'rounding']:
+                    self.assertIn(stage, report['stages'])
+                self.assertEqual(set(report['glyphs'].keys()), set(['A', 'H', 'O']))
+                self.assertEqual(report['glyphs']['A']['makeInstance']['calls'], 1)
+                scaler.enableProfiling(False)
+                self.assertIsNone(scaler.getProfilingReport())
+
     unittest.main()
\ No newline at end of file
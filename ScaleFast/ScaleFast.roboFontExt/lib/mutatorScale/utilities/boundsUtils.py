@@ -0,0 +1,74 @@
+#coding=utf-8
+from __future__ import division
+
+def boundsOverlap(bounds1, bounds2):
+    """Return True if two (xMin, yMin, xMax, yMax) rectangles overlap or touch."""
+    xMin1, yMin1, xMax1, yMax1 = bounds1
+    xMin2, yMin2, xMax2, yMax2 = bounds2
+    return xMin1 <= xMax2 and xMin2 <= xMax1 and yMin1 <= yMax2 and yMin2 <= yMax1
+
+
+def groupOverlappingBounds(boundsList):
+    """
+    Sort a list of (xMin, yMin, xMax, yMax) rectangles into groups of rectangles that overlap, directly or through other rectangles.
+    Return a list of groups, each group being a sorted list of indices in boundsList, groups are sorted by their first index.
+    None bounds (empty contours) end up in a group of their own.
+
+    Overlapping pairs are found with a sweep and prune along the x axis:
+    rectangles are visited by increasing xMin and only tested against those still ‘active’, i.e. whose xMax was not passed yet.
+    """
+    parents = range(len(boundsList))
+
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    def merge(index1, index2):
+        root1, root2 = find(index1), find(index2)
+        if root1 != root2:
+            parents[max(root1, root2)] = min(root1, root2)
+
+    order = sorted([index for index, bounds in enumerate(boundsList) if bounds is not None], key=lambda index: boundsList[index][0])
+    active = []
+
+    for index in order:
+        xMin, yMin, xMax, yMax = boundsList[index]
+        active = [activeIndex for activeIndex in active if boundsList[activeIndex][2] >= xMin]
+        for activeIndex in active:
+            activeYMin, activeYMax = boundsList[activeIndex][1], boundsList[activeIndex][3]
+            if yMin <= activeYMax and activeYMin <= yMax:
+                merge(index, activeIndex)
+        active.append(index)
+
+    groups = {}
+    for index in range(len(boundsList)):
+        groups.setdefault(find(index), []).append(index)
+
+    return [groups[root] for root in sorted(groups)]
+
+
+if __name__ == '__main__':
+
+    import unittest
+
+    class BoundsUtilsTests(unittest.TestCase):
+
+        def test_disjoint_bounds_stay_apart(self):
+            boundsList = [(0, 0, 10, 10), (20, 0, 30, 10), (0, 20, 10, 30)]
+            self.assertEqual(groupOverlappingBounds(boundsList), [[0], [1], [2]])
+
+        def test_chained_overlaps_are_grouped(self):
+            boundsList = [(0, 0, 10, 10), (50, 50, 60, 60), (5, 5, 15, 15), (12, 12, 20, 20)]
+            self.assertEqual(groupOverlappingBounds(boundsList), [[0, 2, 3], [1]])
+
+        def test_empty_bounds(self):
+            boundsList = [None, (0, 0, 10, 10), (5, 5, 15, 15)]
+            self.assertEqual(groupOverlappingBounds(boundsList), [[0], [1, 2]])
+
+        def test_boundsOverlap(self):
+            self.assertTrue(boundsOverlap((0, 0, 10, 10), (10, 10, 20, 20)))
+            self.assertFalse(boundsOverlap((0, 0, 10, 10), (11, 0, 20, 10)))
+
+    unittest.main()
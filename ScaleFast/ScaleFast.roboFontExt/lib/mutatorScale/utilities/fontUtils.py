@@ -1,18 +1,32 @@
 #coding=utf-8
 from __future__ import division
 from math import atan2, tan, hypot, cos, degrees, radians
+from hashlib import md5
+from multiprocessing import Pool, cpu_count
 
 from robofab.world import RGlyph
 
 import fontTools
 import fontTools.misc.bezierTools as bezierTools
-import fontTools.misc.arrayTools as arrayTools
 import fontTools.misc.transform as transform
 from fontTools.pens.boundsPen import BoundsPen
 
-from mutatorScale.booleanOperations.booleanGlyph import BooleanGlyph
 from mutatorScale.pens.utilityPens import CollectSegmentsPen
+from mutatorScale.utilities.boundsUtils import groupOverlappingBounds
 
+# font lib key under which measured stems and slant angle are stored
+measurementsLibKey = 'com.loicsander.mutatorScale.measurements'
+
+# glyph representations of measured stems and slant angle
+stemMeasurementRepresentationKey = 'com.loicsander.mutatorScale.stemMeasurement'
+slantAngleRepresentationKey = 'com.loicsander.mutatorScale.slantAngle'
+
+try:
+    from defcon import addRepresentationFactory as _registerRepresentationFactory
+except ImportError:
+    # recent defcon versions register factories per object class
+    from defcon import Glyph, registerRepresentationFactory
+    _registerRepresentationFactory = lambda key, factory: registerRepresentationFactory(Glyph, key, factory)
 
 
 def makeListFontName(font):
@@ -34,82 +48,215 @@ def joinFontName(familyName, styleName):
     return '{familyName} {separator} {styleName}'.format(familyName=familyName, separator=separator, styleName=styleName)
 
 
-def getRefStems(font, slantedSection=False):
+def getRefStems(font, slantedSection=False, angle=None):
     """
     Looks for stem values to serve as reference for a font in an interpolation scheme,
     only one typical value is returned for both horizontal and vertical stems.
     The method intersets the thick stem of a capital I and thin stem of a capital H.
+    If the slant angle of the font (in degrees) is already known, it can be passed as angle.
     """
     stems = []
-    angle = getSlantAngle(font, True)
+    if angle is None:
+        angle = getSlantAngle(font, True)
 
-    for i, glyphName in enumerate(['I','H']):
+    for glyphName, isHorizontal in [('I', True), ('H', False)]:
 
         if glyphName in font:
+            stems.append(measureGlyphStem(font[glyphName], angle, isHorizontal))
 
-            baseGlyph = font[glyphName]
+        elif glyphName not in font:
+            stems.append(None)
 
-            # removing overlap
-            glyph = freezeGlyph(baseGlyph)
-            width = glyph.width
+    if slantedSection == True and stems[0] is not None:
+        stems[0] *= cos(radians(angle))
 
-            glyph.skew(-angle)
+    return stems
 
-            xMin, yMin, xMax, yMax = getGlyphBox(glyph)
-            xCenter = width / 2
-            yCenter = (yMax - yMin) / 2
 
-            # glyph I, cut thick stem
-            if i == 0:
-                intersections = intersect(glyph, yCenter, True)
+def measureGlyphStem(baseGlyph, angle=0, isHorizontal=True):
+    """
+    Measure the stem of a glyph, upright (angle in degrees),
+    cutting the glyph horizontally at half its height (thick stem of an I)
+    or vertically at half its width (thin stem of an H).
+    """
+    # removing overlap
+    glyph = freezeGlyph(baseGlyph)
+    width = glyph.width
 
-            # glyph H, cut thin stem
-            elif i == 1:
-                intersections = intersect(glyph, xCenter, False)
+    glyph.skew(-angle)
 
-            if len(intersections) > 1:
-                (x1,y1), (x2,y2) = (intersections[0], intersections[-1])
+    xMin, yMin, xMax, yMax = getGlyphBox(glyph)
+    xCenter = width / 2
+    yCenter = (yMax - yMin) / 2
 
-                stemWidth = hypot(x2-x1, y2-y1)
-                stems.append(round(stemWidth))
-            else:
-                stems.append(None)
+    # glyph I, cut thick stem
+    if isHorizontal == True:
+        intersections = intersectLine(glyph, yCenter, True)
 
-        elif glyphName not in font:
-            stems.append(None)
+    # glyph H, cut thin stem
+    else:
+        intersections = intersectLine(glyph, xCenter, False)
 
-    if slantedSection == True and stems[0] is not None:
-        stems[0] *= cos(radians(angle))
+    if len(intersections) > 1:
+        (x1,y1), (x2,y2) = (intersections[0][0], intersections[-1][0])
 
-    return stems
+        stemWidth = hypot(x2-x1, y2-y1)
+        return round(stemWidth)
+    return None
 
 
 def getSlantAngle(font, returnDegrees=False):
     """Returns the probable slant/italic angle of a font measuring the slant of a capital I."""
 
     if 'I' in font:
-        testGlyph = font['I']
-        xMin, yMin, xMax, yMax = getGlyphBox(testGlyph)
-        hCenter = (yMax - yMin) / 2
-        delta = 10
-        intersections = []
-        glyph = freezeGlyph(testGlyph)
-
-        for i in range(2):
-            horizontal = hCenter + (i * delta)
-            intersections.append(intersect(glyph, horizontal, True))
-
-        if len(intersections) > 1:
-            if len(intersections[0]) > 1 and len(intersections[1]) > 1:
-                (x1,y1), (x2,y2) = (intersections[0][0], intersections[1][0])
-                angle = atan2(x2-x1, y2-y1)
-                if returnDegrees == False:
-                    return angle
-                elif returnDegrees == True:
-                    return round(degrees(angle), 2)
+        return measureGlyphSlantAngle(font['I'], returnDegrees)
     return 0
 
 
+def measureGlyphSlantAngle(testGlyph, returnDegrees=False):
+    """Returns the slant angle of a glyph’s stem, 0 if it can’t be measured."""
+    xMin, yMin, xMax, yMax = getGlyphBox(testGlyph)
+    hCenter = (yMax - yMin) / 2
+    delta = 10
+    intersections = []
+    glyph = freezeGlyph(testGlyph)
+
+    for i in range(2):
+        horizontal = hCenter + (i * delta)
+        intersections.append(intersectLine(glyph, horizontal, True))
+
+    if len(intersections) > 1:
+        if len(intersections[0]) > 1 and len(intersections[1]) > 1:
+            (x1,y1), (x2,y2) = (intersections[0][0][0], intersections[1][0][0])
+            angle = atan2(x2-x1, y2-y1)
+            if returnDegrees == False:
+                return angle
+            elif returnDegrees == True:
+                return round(degrees(angle), 2)
+    return 0
+
+
+def _stemMeasurementFactory(glyph, font=None, angle=0, isHorizontal=True):
+    return measureGlyphStem(glyph, angle, isHorizontal)
+
+
+def _slantAngleFactory(glyph, font=None, returnDegrees=False):
+    return measureGlyphSlantAngle(glyph, returnDegrees)
+
+
+_representationFactories = {
+    stemMeasurementRepresentationKey: _stemMeasurementFactory,
+    slantAngleRepresentationKey: _slantAngleFactory
+}
+
+for key, factory in _representationFactories.items():
+    _registerRepresentationFactory(key, factory)
+
+
+def _getGlyphRepresentation(glyph, key, **kwargs):
+    """Return a representation of a glyph, computed on the spot if the glyph doesn’t support representations."""
+    if hasattr(glyph, 'getRepresentation'):
+        return glyph.getRepresentation(key, **kwargs)
+    return _representationFactories[key](glyph, **kwargs)
+
+
+def supportsRepresentations(font, glyphNames=['I','H']):
+    """Return True if measurements of a font’s reference glyphs are kept as glyph representations (defcon based glyphs)."""
+    return all([hasattr(font[glyphName], 'getRepresentation') for glyphName in glyphNames if glyphName in font])
+
+
+def getLiveSlantAngle(font, returnDegrees=False):
+    """
+    Same as getSlantAngle() but the angle is kept as a representation of the I glyph (defcon based glyphs),
+    it is measured once and measured again only after the glyph changed.
+    """
+    if 'I' in font:
+        return _getGlyphRepresentation(font['I'], slantAngleRepresentationKey, returnDegrees=returnDegrees)
+    return 0
+
+
+def getLiveRefStems(font, slantedSection=False):
+    """
+    Same as getRefStems() but stems are kept as representations of the I and H glyphs (defcon based glyphs),
+    they are measured once and measured again only after these glyphs changed.
+    """
+    stems = []
+    angle = getLiveSlantAngle(font, True)
+
+    for glyphName, isHorizontal in [('I', True), ('H', False)]:
+        if glyphName in font:
+            stems.append(_getGlyphRepresentation(font[glyphName], stemMeasurementRepresentationKey, angle=angle, isHorizontal=isHorizontal))
+        else:
+            stems.append(None)
+
+    if slantedSection == True and stems[0] is not None:
+        stems[0] *= cos(radians(angle))
+
+    return stems
+
+
+def getOutlineHash(font, glyphNames=['I','H']):
+    """Return a hash of the (decomposed) outlines and widths of reference glyphs in a font."""
+    outlines = []
+    for glyphName in glyphNames:
+        if glyphName in font:
+            glyph = font[glyphName]
+            pen = CollectSegmentsPen(font)
+            glyph.draw(pen)
+            outlines.append((glyphName, glyph.width, pen.getSegments()))
+    return md5(repr(outlines)).hexdigest()
+
+
+def _getStoredMeasurements(font, outlineHash):
+    """Return a copy of measurements stored in the font lib if they match outlineHash, fresh measurements otherwise."""
+    if measurementsLibKey in font.lib:
+        measurements = font.lib[measurementsLibKey]
+        if measurements.get('outlineHash') == outlineHash:
+            return dict(measurements)
+    return {'outlineHash': outlineHash}
+
+
+def getCachedSlantAngle(font, returnDegrees=False):
+    """
+    Same as getSlantAngle() but the value is stored in the font lib along with a hash of the I and H outlines,
+    it is only measured again if the outlines changed.
+    """
+    measurements = _getStoredMeasurements(font, getOutlineHash(font))
+
+    if 'slantAngle' not in measurements:
+        measurements['slantAngle'] = getSlantAngle(font, True)
+        font.lib[measurementsLibKey] = measurements
+
+    angle = measurements['slantAngle']
+    if returnDegrees == False:
+        return radians(angle)
+    return angle
+
+
+def getCachedRefStems(font, slantedSection=False):
+    """
+    Same as getRefStems() but values are stored in the font lib along with a hash of the I and H outlines,
+    they are only measured again if the outlines changed.
+    """
+    measurements = _getStoredMeasurements(font, getOutlineHash(font))
+    stemsKey = 'stemsWithSlantedSection' if slantedSection == True else 'stems'
+
+    if stemsKey in measurements:
+        return list(measurements[stemsKey])
+
+    if 'slantAngle' not in measurements:
+        measurements['slantAngle'] = getSlantAngle(font, True)
+
+    stems = getRefStems(font, slantedSection, measurements['slantAngle'])
+
+    # None values can’t be stored in a font lib, incomplete measurements are simply not stored
+    if None not in stems:
+        measurements[stemsKey] = stems
+    font.lib[measurementsLibKey] = measurements
+
+    return stems
+
+
 def freezeGlyph(glyph):
     """Return a copy of a glyph, with components decomposed and all overlap removed."""
 
@@ -126,23 +273,35 @@ def freezeGlyph(glyph):
     singleContourGlyph.name = glyph.name
     pointPen = singleContourGlyph.getPointPen()
 
-    if len(toRFGlyph.contours) > 1:
+    if len(toRFGlyph.contours):
+        # the boolean engine relies on pyClipper, a compiled macOS module, it is only loaded when needed
+        from mutatorScale.booleanOperations.booleanGlyph import BooleanGlyph
 
-        try:
-            booleanGlyphs = []
+        # contours are unioned with those whose bounds overlap theirs,
+        # a contour overlapping nothing still has its own overlap removed (self intersection)
+        contours = [c for c in toRFGlyph.contours if len(c) > 1]
+        groups = groupOverlappingBounds([getGlyphBox(c) for c in contours])
+
+        for group in groups:
 
-            for c in toRFGlyph.contours:
-                if len(c) > 1:
+            try:
+                booleanGlyphs = []
+
+                for index in group:
                     b = BooleanGlyph()
                     pen = b.getPen()
-                    c.draw(pen)
+                    contours[index].draw(pen)
                     booleanGlyphs.append(b)
 
-            finalBooleanGlyph = reduce(lambda g1, g2: g1 | g2, booleanGlyphs)
-            finalBooleanGlyph.drawPoints(pointPen)
+                if len(booleanGlyphs) == 1:
+                    finalBooleanGlyph = booleanGlyphs[0].removeOverlap()
+                else:
+                    finalBooleanGlyph = reduce(lambda g1, g2: g1 | g2, booleanGlyphs)
+                finalBooleanGlyph.drawPoints(pointPen)
 
-        except:
-            toRFGlyph.drawPoints(pointPen)
+            except:
+                for index in group:
+                    contours[index].drawPoints(pointPen)
     else:
         toRFGlyph.drawPoints(pointPen)
 
@@ -176,37 +335,210 @@ def extractComposites(glyph):
     return decomposedComposites
 
 
+def _removeOverlapFromContoursData(contoursData):
+    """
+    Remove overlap from plain contour data: a list of contours, each a list of (segmentType, pt, smooth, name) tuples.
+    Defined at module level so that it can be sent to worker processes,
+    returns a (contoursData, errorMessage) tuple, contoursData is None if the overlap could not be removed.
+    """
+    from mutatorScale.booleanOperations.booleanGlyph import BooleanGlyph
+    try:
+        booleanGlyph = BooleanGlyph()
+        for points in contoursData:
+            contour = booleanGlyph.contourClass()
+            contour._points = points
+            booleanGlyph.contours.append(contour)
+        resultGlyph = booleanGlyph.removeOverlap()
+        return [resultContour._points for resultContour in resultGlyph.contours], None
+    except Exception as e:
+        return None, e.message or repr(e)
+
+
+def removeOverlaps(glyphs, workers=None):
+    """
+    Remove overlap from a list of glyphs, in place.
+
+    Contours are sent as plain data to a pool of processes (workers defaults to the number of cpus),
+    results are written back to the glyphs in the order of the list. Components are left alone.
+    A glyph whose overlap can’t be removed keeps its original outline,
+    return a {glyphName: errorMessage} dict of these glyphs.
+    """
+    from mutatorScale.booleanOperations.booleanGlyph import BooleanGlyph
+    glyphs = [glyph for glyph in glyphs if len(glyph) > 0]
+    jobs = [[contour._points for contour in BooleanGlyph(glyph).contours] for glyph in glyphs]
+
+    if workers is None:
+        workers = cpu_count()
+
+    if workers > 1 and len(jobs) > 1:
+        pool = Pool(min(workers, len(jobs)))
+        try:
+            results = pool.map(_removeOverlapFromContoursData, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = map(_removeOverlapFromContoursData, jobs)
+
+    errors = {}
+
+    for glyph, (contoursData, errorMessage) in zip(glyphs, results):
+        if contoursData is None:
+            errors[glyph.name] = errorMessage
+            continue
+        glyph.clearContours()
+        pointPen = glyph.getPointPen()
+        for points in contoursData:
+            pointPen.beginPath()
+            for segmentType, pt, smooth, name in points:
+                pointPen.addPoint(pt, segmentType=segmentType, smooth=smooth, name=name)
+            pointPen.endPath()
+
+    return errors
+
+
+def getComponentGraph(glyphSet, glyphNames):
+    """
+    Return the component dependency graph of glyphNames as a {glyphName: [baseGlyphNames]} dict,
+    it covers glyphNames and, recursively, the base glyphs of their components.
+    glyphSet is a font or any mapping of glyph names to glyphs, glyphs missing from it are left out.
+    """
+    graph = {}
+    glyphNamesToVisit = [glyphName for glyphName in glyphNames if glyphName in glyphSet]
+
+    while len(glyphNamesToVisit):
+        glyphName = glyphNamesToVisit.pop()
+        if glyphName in graph:
+            continue
+
+        baseGlyphNames = []
+        for component in glyphSet[glyphName].components:
+            baseGlyphName = component.baseGlyph
+            if baseGlyphName in glyphSet and baseGlyphName not in baseGlyphNames:
+                baseGlyphNames.append(baseGlyphName)
+                glyphNamesToVisit.append(baseGlyphName)
+        graph[glyphName] = baseGlyphNames
+
+    return graph
+
+
+def getDependencyLayers(graph):
+    """
+    Sort a component graph topologically, in layers: a list of lists of glyph names.
+    Glyphs only depend on glyphs from previous layers, glyphs within a layer are independent from one another.
+    Glyphs caught in circular references can’t be sorted, they are returned last, as a layer of their own.
+    """
+    dependents = {glyphName: [] for glyphName in graph}
+    pendingBases = {}
+
+    for glyphName, baseGlyphNames in graph.items():
+        baseGlyphNames = [baseGlyphName for baseGlyphName in baseGlyphNames if baseGlyphName in graph]
+        pendingBases[glyphName] = len(baseGlyphNames)
+        for baseGlyphName in baseGlyphNames:
+            dependents[baseGlyphName].append(glyphName)
+
+    layers = []
+    layer = sorted([glyphName for glyphName in graph if pendingBases[glyphName] == 0])
+
+    while len(layer):
+        layers.append(layer)
+        nextLayer = []
+        for glyphName in layer:
+            for dependent in dependents[glyphName]:
+                pendingBases[dependent] -= 1
+                if pendingBases[dependent] == 0:
+                    nextLayer.append(dependent)
+        layer = sorted(nextLayer)
+
+    circularGlyphNames = sorted([glyphName for glyphName in graph if pendingBases[glyphName] > 0])
+    if len(circularGlyphNames):
+        layers.append(circularGlyphNames)
+
+    return layers
+
+
 def intersect(glyph, where, isHorizontal):
     """
     Intersect a glyph with a horizontal or vertical line.
-    Intersect each segment of a glyph using fontTools bezierTools.splitCubic and splitLine methods.
+    Return intersection points in the order in which they appear along the glyph’s outline.
     """
-    pen = CollectSegmentsPen(glyph.getParent())
-    glyph.draw(pen)
-    nakedGlyph = pen.getSegments()
-    glyphIntersections = []
+    segments = getFlatSegments(glyph)
+    intersections = intersectSegments(segments, where, isHorizontal)
+    intersections.sort(key=lambda (point, segmentIndex, t): (segmentIndex, t))
+    return [point for point, segmentIndex, t in intersections]
 
-    for i, contour in enumerate(nakedGlyph):
 
-        for segment in contour:
+def intersectLine(glyph, where, isHorizontal):
+    """
+    Intersect a glyph with a horizontal or vertical line.
+    Return a list of (point, t) tuples sorted along the line, t being the position of the point on the segment it was found on.
+    """
+    segments = getFlatSegments(glyph)
+    return [(point, t) for point, segmentIndex, t in intersectSegments(segments, where, isHorizontal)]
 
-            length = len(segment)
 
-            if length == 2:
-                pt1, pt2 = segment
-                returnedSegments = splitLine(pt1, pt2, where, int(isHorizontal))
-            elif length == 4:
-                pt1, pt2, pt3, pt4 = segment
-                returnedSegments = bezierTools.splitCubic(pt1, pt2, pt3, pt4, where, int(isHorizontal))
+def getFlatSegments(glyph):
+    """Return all segments of a glyph in a single list, lines as 2 points tuples, curves as 4 points tuples."""
+    pen = CollectSegmentsPen(glyph.getParent())
+    glyph.draw(pen)
+    return [segment for contour in pen.getSegments() for segment in contour]
+
 
-            if len(returnedSegments) > 1:
-                intersectionPoints = findDuplicatePoints(returnedSegments)
-                if len(intersectionPoints):
-                    box = calcBounds(segment)
-                    intersectionPoints = [point for point in intersectionPoints if arrayTools.pointInRect(point, box)]
-                    glyphIntersections.extend(intersectionPoints)
+def intersectSegments(segments, where, isHorizontal, epsilon=1e-9):
+    """
+    Intersect a flat list of segments with a horizontal (y = where) or vertical (x = where) line.
 
-    return glyphIntersections
+    Segments whose control points all lie on one side of the line are rejected right away,
+    for the others, roots are solved directly: linear equation for lines, cubic equation for curves.
+    Return a list of (point, segmentIndex, t) tuples sorted along the line,
+    points are rounded to 4 decimals, t values are in the [0, 1) range so that on-curve points shared by two segments are only found once.
+    """
+    axis = int(bool(isHorizontal))
+    otherAxis = 1 - axis
+    intersections = []
+    found = set()
+
+    for segmentIndex, segment in enumerate(segments):
+
+        values = [point[axis] for point in segment]
+        if where < min(values) or where > max(values):
+            continue
+
+        length = len(segment)
+
+        if length == 2:
+            (pt1, pt2) = segment
+            delta = pt2[axis] - pt1[axis]
+            if delta == 0:
+                continue
+            tValues = [(where - pt1[axis]) / delta]
+
+        elif length == 4:
+            a, b, c, d = bezierTools.calcCubicParameters(*segment)
+            tValues = bezierTools.solveCubic(a[axis], b[axis], c[axis], d[axis] - where)
+
+        else:
+            continue
+
+        for t in tValues:
+            if -epsilon <= t < 1 - epsilon:
+                if t <= 0:
+                    t = 0
+                if length == 2:
+                    (pt1, pt2) = segment
+                    otherValue = pt1[otherAxis] + (pt2[otherAxis] - pt1[otherAxis]) * t
+                else:
+                    otherValue = ((a[otherAxis] * t + b[otherAxis]) * t + c[otherAxis]) * t + d[otherAxis]
+                point = [0, 0]
+                point[axis] = round(where, 4)
+                point[otherAxis] = round(otherValue, 4)
+                point = tuple(point)
+                if point not in found:
+                    found.add(point)
+                    intersections.append((point, segmentIndex, t))
+
+    intersections.sort(key=lambda (point, segmentIndex, t): point[otherAxis])
+    return intersections
 
 
 def calcBounds(points):
@@ -298,6 +630,7 @@ if __name__ == '__main__':
     import os
     import unittest
     from defcon import Font
+    from mutatorScale.booleanOperations.booleanGlyph import BooleanGlyph
 
     class FontUtilsTests(unittest.TestCase):
 
@@ -325,7 +658,134 @@ if __name__ == '__main__':
             intersections = intersect(glyph, xCenter, False)
             self.assertEqual(intersections, [(426.5, 356.0), (426.5, 396.0)])
 
+        def test_intersectLine_is_sorted(self):
+            glyph = self.font['I']
+            yCenter = self.font.info.capHeight / 2
+            intersections = intersectLine(glyph, yCenter, True)
+            self.assertEqual([point for point, t in intersections], [(134.0, 375.0), (234.0, 375.0)])
+            for point, t in intersections:
+                self.assertTrue(0 <= t < 1)
+
+        def test_freezeGlyph_keeps_disjoint_contours(self):
+            glyph = RGlyph()
+            pen = glyph.getPen()
+            for x in [0, 200]:
+                pen.moveTo((x, 0))
+                pen.lineTo((x, 100))
+                pen.lineTo((x+100, 100))
+                pen.lineTo((x+100, 0))
+                pen.closePath()
+            frozenGlyph = freezeGlyph(glyph)
+            self.assertEqual(len(frozenGlyph.contours), 2)
+
+        def test_freezeGlyph_cleans_self_intersecting_contour(self):
+            glyph = RGlyph()
+            pen = glyph.getPen()
+            pen.moveTo((0, 0))
+            pen.lineTo((100, 100))
+            pen.lineTo((100, 0))
+            pen.lineTo((0, 100))
+            pen.closePath()
+            pen.moveTo((300, 0))
+            pen.lineTo((300, 100))
+            pen.lineTo((400, 100))
+            pen.lineTo((400, 0))
+            pen.closePath()
+            frozenGlyph = freezeGlyph(glyph)
+            self.assertEqual(len(frozenGlyph.contours), 3)
+            glyph.removeContour(1)
+            frozenGlyph = freezeGlyph(glyph)
+            self.assertEqual(len(frozenGlyph.contours), 2)
+
+        def test_removeOverlap_splits_self_intersecting_contour(self):
+            glyph = RGlyph()
+            pen = glyph.getPen()
+            pen.moveTo((0, 0))
+            pen.lineTo((100, 100))
+            pen.lineTo((100, 0))
+            pen.lineTo((0, 100))
+            pen.closePath()
+            booleanGlyph = BooleanGlyph(glyph).removeOverlap()
+            self.assertEqual(len(booleanGlyph.contours), 2)
+            self.assertEqual(sorted([len(contour) for contour in booleanGlyph.contours]), [3, 3])
+
+        def test_removeOverlaps(self):
+            glyphs = []
+            for offset in [0, 50, 200]:
+                glyph = RGlyph()
+                glyph.name = 'offset%s' % offset
+                pen = glyph.getPen()
+                for x in [0, offset]:
+                    pen.moveTo((x, 0))
+                    pen.lineTo((x, 100))
+                    pen.lineTo((x+100, 100))
+                    pen.lineTo((x+100, 0))
+                    pen.closePath()
+                glyphs.append(glyph)
+            bowtie = RGlyph()
+            bowtie.name = 'bowtie'
+            pen = bowtie.getPen()
+            pen.moveTo((0, 0))
+            pen.lineTo((100, 100))
+            pen.lineTo((100, 0))
+            pen.lineTo((0, 100))
+            pen.closePath()
+            glyphs.append(bowtie)
+            errors = removeOverlaps(glyphs, workers=2)
+            # overlapping squares are merged, or left as they were if clipping failed
+            for glyph in glyphs[:2]:
+                self.assertEqual(len(glyph.contours), 1 if glyph.name not in errors else 2)
+            self.assertEqual(len(glyphs[2].contours), 2)
+            self.assertNotIn('offset200', errors)
+            # a single self-intersecting contour is split
+            self.assertNotIn('bowtie', errors)
+            self.assertEqual(len(bowtie.contours), 2)
+
         def test_getRefStems(self):
             stems = getRefStems(self.font)
 
+        def test_getCachedRefStems(self):
+            stems = getRefStems(self.font)
+            self.assertEqual(getCachedRefStems(self.font), stems)
+            self.assertIn(measurementsLibKey, self.font.lib)
+            self.assertEqual(getCachedRefStems(self.font), stems)
+            self.assertEqual(getCachedSlantAngle(self.font, True), getSlantAngle(self.font, True))
+
+        def test_cached_measurements_are_dropped_on_outline_change(self):
+            getCachedRefStems(self.font)
+            outlineHash = self.font.lib[measurementsLibKey]['outlineHash']
+            self.font['I'].move((0, 10))
+            getCachedRefStems(self.font)
+            self.assertNotEqual(self.font.lib[measurementsLibKey]['outlineHash'], outlineHash)
+
+        def test_getLiveRefStems(self):
+            stems = getLiveRefStems(self.font)
+            self.assertEqual(stems, getRefStems(self.font))
+            self.assertEqual(getLiveSlantAngle(self.font, True), getSlantAngle(self.font, True))
+            glyph = self.font['I']
+            glyph.move((0, 10))
+            pen = glyph.getPen()
+            pen.moveTo((0, 0))
+            pen.lineTo((0, 300))
+            pen.lineTo((1000, 300))
+            pen.lineTo((1000, 0))
+            pen.closePath()
+            self.assertNotEqual(getLiveRefStems(self.font), stems)
+
+        def test_getDependencyLayers(self):
+            graph = {'Aacute': ['A', 'acute'], 'A': [], 'acute': [], 'Aringacute': ['Aring', 'acute'], 'Aring': ['A', 'ring'], 'ring': []}
+            self.assertEqual(getDependencyLayers(graph), [['A', 'acute', 'ring'], ['Aacute', 'Aring'], ['Aringacute']])
+
+        def test_getDependencyLayers_circular_references(self):
+            graph = {'a': ['b'], 'b': ['a'], 'c': []}
+            self.assertEqual(getDependencyLayers(graph), [['c'], ['a', 'b']])
+
+        def test_getComponentGraph(self):
+            glyphNames = [glyph.name for glyph in self.font if len(glyph.components)]
+            graph = getComponentGraph(self.font, glyphNames)
+            for glyphName in glyphNames:
+                for component in self.font[glyphName].components:
+                    self.assertIn(component.baseGlyph, graph[glyphName])
+                    self.assertIn(component.baseGlyph, graph)
+
     unittest.main()
@@ -0,0 +1,132 @@
+#coding=utf-8
+from __future__ import division
+
+from timeit import default_timer
+
+class _StageTimer(object):
+
+    __slots__ = ['profiler', 'stage', 'glyphName', 'start']
+
+    def __init__(self, profiler, stage, glyphName):
+        self.profiler = profiler
+        self.stage = stage
+        self.glyphName = glyphName
+
+    def __enter__(self):
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.add(self.stage, default_timer() - self.start, self.glyphName)
+        return False
+
+
+class _NoTimer(object):
+
+    """Stands in for a _StageTimer when profiling is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+noTimer = _NoTimer()
+
+
+class StageProfiler(object):
+
+    """
+    Records cumulative wall time and call counts per stage, overall and per glyph.
+
+    >>> profiler = StageProfiler()
+    >>> with profiler.measure('makeInstance', 'A'):
+    ...     instance = mutator.makeInstance(location)
+    >>> profiler.getReport()
+    >>> print profiler.getSummary()
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self.glyphs = {}
+
+    def measure(self, stage, glyphName=None):
+        """Return a context manager timing its block as a call of stage, attributed to glyphName if provided."""
+        return _StageTimer(self, stage, glyphName)
+
+    def add(self, stage, duration, glyphName=None, calls=1):
+        self._add(self.stages, stage, duration, calls)
+        if glyphName is not None:
+            if glyphName not in self.glyphs:
+                self.glyphs[glyphName] = {}
+            self._add(self.glyphs[glyphName], stage, duration, calls)
+
+    def _add(self, stages, stage, duration, calls):
+        if stage in stages:
+            stages[stage]['time'] += duration
+            stages[stage]['calls'] += calls
+        else:
+            stages[stage] = {'time': duration, 'calls': calls}
+
+    def getReport(self):
+        """
+        Return recorded timings as a dict (JSON serializable):
+        {'stages': {stage: {'time': seconds, 'calls': count}}, 'glyphs': {glyphName: {stage: {'time': seconds, 'calls': count}}}}
+        """
+        copyStages = lambda stages: {stage: dict(stages[stage]) for stage in stages}
+        return {
+            'stages': copyStages(self.stages),
+            'glyphs': {glyphName: copyStages(self.glyphs[glyphName]) for glyphName in self.glyphs}
+        }
+
+    def getSummary(self, glyphCount=10):
+        """Return a human readable summary: time spent per stage and the glyphCount slowest glyphs."""
+        lines = []
+        lines.append('{0:<20} {1:>10} {2:>10} {3:>10}'.format('stage', 'time (s)', 'calls', 'ms/call'))
+
+        for stage, timing in sorted(self.stages.items(), key=lambda item: -item[1]['time']):
+            timePerCall = timing['time'] / timing['calls'] if timing['calls'] else 0
+            lines.append('{0:<20} {1:>10.3f} {2:>10} {3:>10.3f}'.format(stage, timing['time'], timing['calls'], timePerCall * 1000))
+
+        if len(self.glyphs) and glyphCount:
+            glyphTimes = [(sum([timing['time'] for timing in stages.values()]), glyphName) for glyphName, stages in self.glyphs.items()]
+            glyphTimes.sort(reverse=True)
+            lines.append('')
+            lines.append('slowest glyphs ({0} profiled)'.format(len(glyphTimes)))
+            for glyphTime, glyphName in glyphTimes[:glyphCount]:
+                lines.append('{0:<20} {1:>10.3f}'.format(glyphName, glyphTime))
+
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+
+    import unittest
+
+    class StageProfilerTests(unittest.TestCase):
+
+        def test_measure(self):
+            profiler = StageProfiler()
+            for glyphName in ['A', 'B', 'A']:
+                with profiler.measure('makeInstance', glyphName):
+                    pass
+            with profiler.measure('process pool'):
+                pass
+            report = profiler.getReport()
+            self.assertEqual(report['stages']['makeInstance']['calls'], 3)
+            self.assertEqual(report['glyphs']['A']['makeInstance']['calls'], 2)
+            self.assertEqual(report['stages']['process pool']['calls'], 1)
+            self.assertNotIn(None, report['glyphs'])
+
+        def test_add_and_summary(self):
+            profiler = StageProfiler()
+            profiler.add('buildMutator', 0.5, 'A')
+            profiler.add('makeInstance', 0.25, 'B', 4)
+            summary = profiler.getSummary()
+            self.assertTrue(summary.index('buildMutator') < summary.index('makeInstance'))
+            self.assertEqual(profiler.getReport()['stages']['makeInstance'], {'time': 0.25, 'calls': 4})
+
+    unittest.main()
@@ -0,0 +1,86 @@
+#coding=utf-8
+import threading
+import traceback
+from time import sleep
+
+from PyObjCTools.AppHelper import callAfter
+
+class PreviewWorker(object):
+    """
+    Runs preview jobs on a background thread, one at a time.
+
+    Jobs submitted while another one is pending replace it: after a short delay,
+    only the newest job is run, so that rapid parameter changes (slider drags) are coalesced.
+    A job is a function taking one argument, isCancelled, a function it can call between steps
+    to know whether a newer job was submitted in the meantime and its work is no longer needed.
+    Results of jobs that became stale are dropped, the others are handed to their callback on the main thread.
+
+    >>> worker = PreviewWorker()
+    >>> worker.submit(job, callback)
+    >>> worker.stop()
+    """
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self._condition = threading.Condition()
+        self._pending = None
+        self._generation = 0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, job, callback):
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, job, callback)
+            self._condition.notify()
+
+    def cancel(self):
+        """Drop pending jobs and results of the running one."""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._pending = None
+            self._condition.notify()
+
+    def isCurrent(self, generation):
+        return generation == self._generation and not self._stopped
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+
+            # leave some time for newer jobs to come in and replace the pending one
+            sleep(self.delay)
+
+            with self._condition:
+                if self._pending is None:
+                    continue
+                generation, job, callback = self._pending
+                self._pending = None
+
+            isCancelled = lambda: not self.isCurrent(generation)
+
+            try:
+                result = job(isCancelled)
+            except Exception:
+                print u'ScaleFast — Preview error:'
+                traceback.print_exc()
+                continue
+
+            if not isCancelled():
+                callAfter(self._deliver, generation, callback, result)
+
+    def _deliver(self, generation, callback, result):
+        # a newer job may have been submitted while this result was on its way to the main thread
+        if self.isCurrent(generation):
+            callback(result)
@@ -20,7 +20,10 @@ through interpolation, powered by Erik van Blokland’s MutatorMath.
 Thanks to Frederik Berlaen for the inspiration.
 """
 from mutatorScale.objects.scaler import MutatorScaleEngine
-from mutatorScale.utilities.fontUtils import makeListFontName, getRefStems
+from mutatorScale.utilities.fontUtils import makeListFontName, getLiveRefStems, getDependencyLayers
+
+from previewWorker import PreviewWorker
+from batchGenerator import ScaleFastPreset, transformGlyph
 
 import parameters.vanillaParameterObjects
 from parameters.vanillaParameterObjects import VanillaSingleValueParameter, ParameterTextInput
@@ -34,7 +37,6 @@ from mojo.drawingTools import *
 from AppKit import NSColor, NSBoxCustom
 # NSTableViewAnimationSlideLeft, NSIndexSet, NSAnimationTriggerOrderOut
 from defconAppKit.tools.textSplitter import splitText
-from math import cos, sin, radians, pi
 
 
 def parsesToNumber(string):
@@ -51,70 +53,6 @@ def extractSelectedItem(popUpButton):
 
 
 
-class ScaleFastPreset(object):
-
-
-    def __init__(self, preset, obsolete=False):
-        if obsolete == True:
-            self.initWithOldPreset(preset)
-        else:
-            name, settings = preset
-            self.init(name, **settings)
-
-
-    def init(self, name, vstem, hstem, stemRapport, isotropic, referenceHeight, targetHeight, width, posX=0, posY=0, stickyPos=('bottom','baseline'), tracking=(0, 'upm'), keepSidebearings=False):
-        self.name = name
-        self.settings = {
-            'vstem': vstem,
-            'hstem': hstem,
-            'stemRapport': stemRapport,
-            'referenceHeight': referenceHeight,
-            'targetHeight': targetHeight,
-            'width': width,
-            'posX': posX,
-            'posY': posY,
-            'stickyPos': stickyPos,
-            'keepSidebearings': keepSidebearings,
-            'tracking': tracking,
-            'isotropic': isotropic
-        }
-
-
-    def initWithOldPreset(self, oldPreset):
-        name, oldSettings = oldPreset
-
-        settings = {}
-
-        value, units = oldSettings['tracking']
-        if units == 'upm':
-            settings['tracking'] = oldSettings['tracking']
-        elif units == '%':
-            settings['tracking'] = ((value-1)*100, '%')
-
-        settings['stemRapport'] = 'absolute'
-        settings['referenceHeight'] = 'capHeight'
-        settings['posY'] = oldSettings['shift']
-        settings['isotropic'] = True if oldSettings['mode'] == 'isotropic' else False
-
-        for key1, key2 in [('targetHeight','height'), ('keepSidebearings','keepSpacing')]:
-            settings[key1] = oldSettings[key2]
-
-        for key in ['vstem','hstem','width']:
-            settings[key] = oldSettings[key]
-
-        self.init(name, **settings)
-
-
-    def setName(self, newName):
-        self.name = newName
-
-
-    def set(self, settings):
-        for key in settings:
-            self.settings[key] = settings[key]
-
-
-
 class ScaleFastController(object):
 
     includedGlyph = u'↳'
@@ -362,6 +300,8 @@ class ScaleFastController(object):
         self.currentFont = None
 
         self.cachedFonts = {}
+        self.cachedGlyphKeys = {}
+        self.previewWorker = PreviewWorker()
         self.previewStrings = {'pre':'', 'scaled':'', 'post':''}
         self.newLineGlyph = self.preview.createNewLineGlyph()
 
@@ -459,6 +399,7 @@ class ScaleFastController(object):
         batch.addLine = Button((10, -22, 50, 22), 'Add', sizeStyle='small', callback=self._addBatchGenerationLine)
         batch.removeLine = Button((65, -22, 60, 22), 'Remove', sizeStyle='small', callback=self._removeBatchGenerationLine)
 
+        self.sheet.inner.timingReport = CheckBox((10, -27, 150, 22), 'Timing report', value=False, sizeStyle='small')
         self.sheet.inner.generate = Button((-125, -27, 120, 22), 'Generate', callback=self._generationCallback)
         self.sheet.inner.cancel = Button((-215, -27, 80, 22), 'Cancel', callback=self._closeGenerationSheet)
         self.sheet.open()
@@ -508,6 +449,10 @@ class ScaleFastController(object):
         self.sheet.progress = ProgressBar((15, 11, 190, 16), isIndeterminate=True)
         self.sheet.progress.start()
 
+        timingReport = bool(self.sheet.inner.timingReport.get())
+        if timingReport == True:
+            self.scalingMasters.enableProfiling()
+
         if newFont:
             self._copyFontProperties(font, self.currentFont, extensive=True)
 
@@ -540,6 +485,11 @@ class ScaleFastController(object):
             font.showUI()
         font.update()
 
+        if timingReport == True:
+            print u'ScaleFast — Generation timing report:'
+            print self.scalingMasters.getProfilingSummary()
+            self.scalingMasters.enableProfiling(False)
+
         self._applySettingsWithUI(initialSettings)
 
         self.sheet.progress.stop()
@@ -548,7 +498,7 @@ class ScaleFastController(object):
 
     def _setScalingGoals(self):
         self.scalingMasters.set(self.scalingGoals)
-        self._updatePreview(True)
+        self._updatePreview()
 
 
     def _setReferenceHeight(self, sender):
@@ -623,7 +573,7 @@ class ScaleFastController(object):
         try:
             value = int(sender.get())
             self.transformations[key] = value
-            self._updatePreview(True)
+            self._updatePreview()
         except:
             pass
 
@@ -640,7 +590,7 @@ class ScaleFastController(object):
 
         if alignment in self.alignmentGuides:
             self.transformations['stickyPos'] = (zone, alignment)
-            self._updatePreview(True)
+            self._updatePreview()
 
 
     def _changeTracking(self, sender):
@@ -651,20 +601,20 @@ class ScaleFastController(object):
             trackingValue = 0
         _, trackingUnits = self.transformations['tracking']
         self.transformations['tracking'] = (trackingValue, trackingUnits)
-        self._updatePreview(True)
+        self._updatePreview()
 
 
     def _changeTrackingUnits(self, sender):
         trackingUnits = extractSelectedItem(sender)
         trackingValue, _ = self.transformations['tracking']
         self.transformations['tracking'] = (trackingValue, trackingUnits)
-        self._updatePreview(True)
+        self._updatePreview()
 
 
     def _keepSidebearings(self, sender):
         value = sender.get()
         self.transformations['keepSidebearings'] = value
-        self._updatePreview(True)
+        self._updatePreview()
 
 
     def _switchIsotropicCallback(self, sender):
@@ -674,7 +624,7 @@ class ScaleFastController(object):
 
     def _switchIsotropic(self, value):
         self.controls.stemBox.hstem.enable(value)
-        self._updatePreview(True)
+        self._updatePreview()
 
 
     def _switchParameterModeCallback(self, sender):
@@ -705,7 +655,7 @@ class ScaleFastController(object):
 
 
     def _stemsUpdated(self, sender):
-        self._updatePreview(True)
+        self._updatePreview()
 
 
     """ Generation """
@@ -730,131 +680,123 @@ class ScaleFastController(object):
 
     """ Glyph scaling """
 
-    def _buildScaledGlyphs(self, font, glyphNames, suffix=None, useCachedGlyphs=False):
-
+    def _getStemTarget(self):
         if self.isotropic == True and self.scalingMasters.hasTwoAxes() == False:
-            stems = self.definedStems['vstem'].get()
+            return self.definedStems['vstem'].get()
         else:
-            stems = tuple([self.definedStems['vstem'].get(), self.definedStems['hstem'].get()])
+            return tuple([self.definedStems['vstem'].get(), self.definedStems['hstem'].get()])
+
+
+    def _buildScaledGlyphs(self, font, glyphNames, suffix=None, useCachedGlyphs=False, scaledGlyphs=None):
+
+        stems = self._getStemTarget()
 
         self.trackingOffsets = {}
+        if scaledGlyphs is None:
+            scaledGlyphs = {}
 
-        for name in glyphNames:
+        # requested glyphs and the component base glyphs they need, bases before composites
+        existingGlyphNames = set(font.keys())
+        glyphNamesToInsert = self._getGlyphNamesToScale(glyphNames, existingGlyphNames)
+        if useCachedGlyphs == True:
+            glyphNamesToInsert = [name for name in glyphNamesToInsert if name not in existingGlyphNames]
+
+        if useCachedGlyphs == False:
+            # generation: interpolate all glyphs at once, within RoboFont’s process (no process pool in a running app)
+            # composites don’t depend on the scaled version of their base glyphs, dependency layers only matter for insertion
+            scaledGlyphs = dict(zip(glyphNamesToInsert, self.scalingMasters.getScaledGlyphs(glyphNamesToInsert, stems)))
 
-            if (useCachedGlyphs) == False or (name not in font and useCachedGlyphs == True):
-                font = self._retrieveScaledGlyph(font, name, stems, suffix)
+        for name in glyphNamesToInsert:
+            font = self._retrieveScaledGlyph(font, name, stems, suffix, scaledGlyphs)
 
         return font
 
 
-    def _retrieveScaledGlyph(self, font, glyphName, stems, suffix=None):
+    def _getGlyphNamesToScale(self, glyphNames, excludedGlyphNames=set()):
+        """
+        Return glyphNames and the base glyphs of their components,
+        sorted along the component dependency graph: each glyph comes once, after the base glyphs it depends on.
+        Base glyphs listed in excludedGlyphNames are left out, along with the base glyphs only they depend on.
+        Glyphs found in no master come last, so that they show up as error glyphs.
+        """
+        graph = self.scalingMasters.getComponentGraph(glyphNames)
+        includedGlyphNames = set([name for name in glyphNames if name in graph])
+        glyphNamesToVisit = list(includedGlyphNames)
+
+        while len(glyphNamesToVisit):
+            glyphName = glyphNamesToVisit.pop()
+            for baseGlyphName in graph[glyphName]:
+                if baseGlyphName not in includedGlyphNames and baseGlyphName not in excludedGlyphNames:
+                    includedGlyphNames.add(baseGlyphName)
+                    glyphNamesToVisit.append(baseGlyphName)
+
+        unknownGlyphNames = []
+        for name in glyphNames:
+            if name not in graph and name not in unknownGlyphNames:
+                unknownGlyphNames.append(name)
 
-        scaledGlyph = self.scalingMasters.getScaledGlyph(glyphName, stems)
+        return [name for layer in getDependencyLayers(graph) for name in layer if name in includedGlyphNames] + unknownGlyphNames
 
-        if scaledGlyph is not None:
 
-            outputGlyphName = glyphName
+    def _scaleGlyphs(self, glyphNames, stems, excludedGlyphNames=[], isCancelled=None):
+        """
+        Return a {glyphName: scaledGlyph} dict for glyphNames and the base glyphs of their components,
+        except those listed in excludedGlyphNames.
+        Meant to be run in the background: returns None as soon as isCancelled() is True.
+        """
+        scaledGlyphs = {}
 
-            if suffix:
-                outputGlyphName = '{0}{1}'.format(glyphName, suffix)
-            font.insertGlyph(scaledGlyph, outputGlyphName)
+        for glyphName in self._getGlyphNamesToScale(glyphNames, set(excludedGlyphNames)):
 
-            scaledGlyph = font[outputGlyphName]
+            if isCancelled is not None and isCancelled():
+                return None
 
-            if len(scaledGlyph.components):
-                for component in scaledGlyph.components:
-                    baseGlyphName = component.baseGlyph
+            scaledGlyphs[glyphName] = self.scalingMasters.getScaledGlyph(glyphName, stems)
 
-                    if baseGlyphName not in font:
-                        font = self._retrieveScaledGlyph(font, baseGlyphName, stems, suffix)
+        return scaledGlyphs
 
-            # neutralizing the scaling of sidebearings
-            if (self.transformations['keepSidebearings'] == True) and (self.currentFont is not None):
-                sourceGlyph = self.currentFont[glyphName]
-                scaledGlyph.angledLeftMargin = sourceGlyph.angledLeftMargin
-                scaledGlyph.angledRightMargin = sourceGlyph.angledRightMargin
 
-            scaledGlyph = self._transformGlyph(scaledGlyph, self.transformations, font.info.italicAngle if font.info.italicAngle is not None else 0)
+    def _retrieveScaledGlyph(self, font, glyphName, stems, suffix=None, scaledGlyphs={}):
+        """
+        Insert a scaled glyph in font, component base glyphs are expected to be inserted beforehand,
+        see _getGlyphNamesToScale() for the insertion order.
+        """
 
-        return font
+        if glyphName in scaledGlyphs:
+            scaledGlyph = scaledGlyphs[glyphName]
+        else:
+            scaledGlyph = self.scalingMasters.getScaledGlyph(glyphName, stems)
 
+        if scaledGlyph is not None:
 
-    def _transformGlyph(self, glyph, transformations, angle=0):
-
-        # tracking
-        trackingValue, trackingUnits = transformations['tracking']
-        if trackingUnits == 'upm':
-            for items in ['contours', 'anchors','components']:
-                if items in ['contours', 'anchors'] or (items == 'components' and transformations['keepSidebearings'] == True):
-                    for item in getattr(glyph, items):
-                        item.move((trackingValue, 0))
-            glyph.width += (trackingValue * 2)
-
-        elif trackingUnits == '%':
-            leftMargin = round(glyph.angledLeftMargin)
-            glyph.angledLeftMargin = round(glyph.angledLeftMargin) * (1 + (trackingValue / 100))
-            glyph.angledRightMargin = round(glyph.angledRightMargin) * (1 + (trackingValue / 100))
-            delta = glyph.angledLeftMargin - leftMargin
-            # if self.transformations['keepSidebearings'] == False:
-            for component in glyph.components:
-                component.move((-delta, 0))
-
-        yDelta = 0
-        xDelta = 0
-
-        # sticky position
-        stickyPos = transformations['stickyPos']
-        if stickyPos != ('bottom','baseline'):
-            zone, alignment = stickyPos
-            targetHeight = self.scalingGoals['targetHeight']
+            outputGlyphName = glyphName
 
-            if targetHeight in self.heightReferences and self.currentFont is not None:
-                targetHeight = getattr(self.currentFont.info, targetHeight)
-            elif targetHeight == 'baseline':
-                targetHeight = 0
+            if suffix:
+                outputGlyphName = '{0}{1}'.format(glyphName, suffix)
+            font.insertGlyph(scaledGlyph, outputGlyphName)
 
-            referenceHeights = self._getReferenceHeights()
+            scaledGlyph = font[outputGlyphName]
+
+            # neutralizing the scaling of sidebearings
+            sourceMargins = None
+            if (self.transformations['keepSidebearings'] == True) and (self.currentFont is not None) and (glyphName in self.currentFont):
+                sourceGlyph = self.currentFont[glyphName]
+                sourceMargins = sourceGlyph.angledLeftMargin, sourceGlyph.angledRightMargin
             try:
                 guides = self.currentFont.lib['com.loicsander.scaleFast']['guides']
             except:
                 guides = []
-            guideNames = [guide['Name'] for guide in guides]
 
-            if alignment in referenceHeights:
-                alignmentHeight = referenceHeights[alignment]
-            elif alignment in guideNames:
-                index = guideNames.index(alignment)
-                try:
-                    alignmentHeight = guides[index]['Height']
-                    alignmentHeight = int(alignmentHeight)
-                except:
-                    alignmentHeight = 0
-            else:
-                alignmentHeight = 0
-
-            if zone == 'bottom':
-                yDelta = alignmentHeight
-            elif zone == 'top':
-                yDelta = alignmentHeight - targetHeight
-            elif zone == 'center':
-                yDelta = alignmentHeight - (targetHeight / 2)
-
-
-        # additional (x, y) offset
-        posX, posY = transformations['posX'], transformations['posY']
-        xDelta = round((yDelta + posY) * cos(radians(angle)+pi/2))
-
-        posX += xDelta
-        posY += yDelta
-
-        if posX or posY:
-            for contour in glyph.contours:
-                contour.move((posX, posY))
-            for anchor in glyph.anchors:
-                anchor.move((posX, posY))
-
-        return glyph
+            scaledGlyph = transformGlyph(scaledGlyph, self.transformations,
+                self._getAngledMargins,
+                self._setAngledMargins,
+                sourceMargins=sourceMargins,
+                targetHeight=self.scalingGoals['targetHeight'],
+                referenceHeights=self._getReferenceHeights(),
+                guides=guides,
+                angle=font.info.italicAngle if font.info.italicAngle is not None else 0)
 
+        return font
 
 
 
@@ -903,7 +845,7 @@ class ScaleFastController(object):
             if selectedFontName in self.scalingMasters:
                 vstem, hstem = self.scalingMasters[selectedFontName].getStems()
             else:
-                vstem, hstem = getRefStems(self.currentFont)
+                vstem, hstem = getLiveRefStems(self.currentFont)
 
             self.setCurrentStems(vstem, hstem)
 
@@ -1042,7 +984,7 @@ class ScaleFastController(object):
         self.scalingMasters.update()
 
         self.availableFonts = availableFonts
-        self._updatePreview(True)
+        self._updatePreview()
 
 
     def _addAvailableFont(self, notification):
@@ -1128,6 +1070,15 @@ class ScaleFastController(object):
         return []
 
 
+    def _getAngledMargins(self, glyph):
+        return glyph.angledLeftMargin, glyph.angledRightMargin
+
+
+    def _setAngledMargins(self, glyph, leftMargin, rightMargin):
+        glyph.angledLeftMargin = leftMargin
+        glyph.angledRightMargin = rightMargin
+
+
     def _getReferenceHeights(self):
         heights = {}
         if self.currentFont is not None:
@@ -1160,12 +1111,40 @@ class ScaleFastController(object):
 
     """ Preview business """
 
+    def _getPreviewSettingsKey(self):
+        """
+        Return a hash of every setting a scaled preview glyph depends on,
+        glyphs in a cached preview font are only rebuilt when this key changes.
+        """
+        masters = sorted([(master.name, master.vstem, master.hstem) for master in self.scalingMasters])
+        stems = (self.definedStems['vstem'].get(), self.definedStems['hstem'].get())
+        guides = self._collectVerticalGuides(self.currentFont)
+        settings = (
+            self.currentFontName,
+            masters,
+            self.scalingMasters.getCurrentStemBase(),
+            self.isotropic,
+            stems,
+            sorted(self.scalingGoals.items()),
+            sorted(self.transformations.items()),
+            [(guide['Name'], guide['Height']) for guide in guides]
+        )
+        return hash(repr(settings))
+
+
     def _updatePreview(self, reset=False):
+        """
+        Refresh the preview, scaled glyphs are cached per preview font along with the settings they were built with,
+        only glyphs that were built with different settings or not built yet are scaled again.
+        Outdated glyphs stay on display until their replacement is scaled.
+        Passing reset=True drops all cached preview glyphs.
+        """
 
         if self.currentFont is not None:
 
             if reset == True:
                 self.cachedFonts = {}
+                self.cachedGlyphKeys = {}
 
             currentFont = self.currentFont
             twoAxes = self.scalingMasters.hasTwoAxes()
@@ -1182,33 +1161,88 @@ class ScaleFastController(object):
 
             if self.currentFontName in self.cachedFonts:
                 previewFont = self.cachedFonts[self.currentFontName]
+                glyphKeys = self.cachedGlyphKeys[self.currentFontName]
             else:
                 previewFont = RFont(showUI=False)
                 self._copyFontProperties(previewFont, currentFont)
+                glyphKeys = {}
 
             glyphNames = {}
 
             for key in self.previewStrings:
                 glyphNames[key] = self._stringToGlyphNames(self.previewStrings[key])
 
-            previewFont = self._buildScaledGlyphs(previewFont, glyphNames['scaled'], useCachedGlyphs=True)
+            # glyphs built with outdated settings, component base glyphs included, are scaled again if still needed,
+            # they are only replaced once scaled (see _previewGlyphsScaled())
+            settingsKey = self._getPreviewSettingsKey()
+            upToDateGlyphNames = [name for name in previewFont.keys() if glyphKeys.get(name) == settingsKey]
 
-            glyphs = []
+            uniqueGlyphNames = []
+            for name in glyphNames['scaled']:
+                if name != 'newLine' and name not in upToDateGlyphNames and name not in uniqueGlyphNames:
+                    uniqueGlyphNames.append(name)
 
-            for key, font in [('pre', currentFont), ('scaled', previewFont), ('post', currentFont)]:
-                for name in glyphNames[key]:
-                    g = None
-                    if name == 'newLine':
-                        g = self.newLineGlyph
-                    elif name in font:
-                        g = font[name]
-                    if g is not None:
-                        glyphs.append(g)
+            self.cachedFonts[self.currentFontName] = previewFont
+            self.cachedGlyphKeys[self.currentFontName] = glyphKeys
+
+            # show what is already available right away, outdated glyphs included
+            self._setPreviewGlyphs(previewFont, glyphNames)
+
+            if len(uniqueGlyphNames):
+                # scale missing and outdated glyphs in the background, only the latest request is computed
+                fontName = self.currentFontName
+                stems = self._getStemTarget()
+                job = lambda isCancelled: self._scaleGlyphs(uniqueGlyphNames, stems, upToDateGlyphNames, isCancelled)
+                callback = lambda scaledGlyphs: self._previewGlyphsScaled(fontName, settingsKey, scaledGlyphs, uniqueGlyphNames)
+                self.previewWorker.submit(job, callback)
+            else:
+                self.previewWorker.cancel()
 
-            self.preview.setFont(previewFont)
-            self.preview.set(glyphs)
 
-            self.cachedFonts[self.currentFontName] = previewFont
+    def _previewGlyphsScaled(self, fontName, settingsKey, scaledGlyphs, glyphNamesToInsert):
+        """Called on the main thread once background scaling is done, insert scaled glyphs in the preview font and refresh display."""
+        if scaledGlyphs is None or fontName != self.currentFontName or fontName not in self.cachedFonts:
+            return
+        if settingsKey != self._getPreviewSettingsKey():
+            return
+
+        previewFont = self.cachedFonts[fontName]
+        glyphKeys = self.cachedGlyphKeys[fontName]
+
+        # outdated glyphs were kept on display until now, replace them
+        for name in scaledGlyphs:
+            if name in previewFont:
+                previewFont.removeGlyph(name)
+        keptGlyphNames = set(previewFont.keys())
+
+        previewFont = self._buildScaledGlyphs(previewFont, glyphNamesToInsert, useCachedGlyphs=True, scaledGlyphs=scaledGlyphs)
+
+        for name in previewFont.keys():
+            if name not in keptGlyphNames:
+                glyphKeys[name] = settingsKey
+
+        glyphNames = {}
+        for key in self.previewStrings:
+            glyphNames[key] = self._stringToGlyphNames(self.previewStrings[key])
+
+        self._setPreviewGlyphs(previewFont, glyphNames)
+
+
+    def _setPreviewGlyphs(self, previewFont, glyphNames):
+        glyphs = []
+
+        for key, font in [('pre', self.currentFont), ('scaled', previewFont), ('post', self.currentFont)]:
+            for name in glyphNames[key]:
+                g = None
+                if name == 'newLine':
+                    g = self.newLineGlyph
+                elif name in font:
+                    g = font[name]
+                if g is not None:
+                    glyphs.append(g)
+
+        self.preview.setFont(previewFont)
+        self.preview.set(glyphs)
 
 
     def _drawMetrics(self, notification):
@@ -1310,7 +1344,7 @@ class ScaleFastController(object):
             guides.pop(i)
         self.scaleFastSettings.g.verticalGuides.set(guides)
         self._saveVerticalGuides()
-        self._updatePreview(True)
+        self._updatePreview()
 
 
     def _editVerticalGuides(self, sender):
@@ -1323,7 +1357,7 @@ class ScaleFastController(object):
                     self.renameAlignmentGuide(oldGuideName, newGuide['Name'])
 
             self._saveVerticalGuides()
-        self._updatePreview(True)
+        self._updatePreview()
 
 
     def _saveVerticalGuides(self):
@@ -1509,6 +1543,7 @@ class ScaleFastController(object):
 
     def _killObservers(self, notification=None):
         """ Kill all observers. """
+        self.previewWorker.stop()
         for method, event in self.observers:
             removeObserver(self, event)
 